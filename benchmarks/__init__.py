@@ -0,0 +1,4 @@
+"""Offline performance benchmarks for CV extraction, parsing and chatbot queries.
+
+Run with ``python -m benchmarks.run``; see ``python -m benchmarks.run --help``.
+"""
@@ -0,0 +1,190 @@
+"""Deterministic synthetic CV generator
+
+Every candidate is derived from (seed, index) alone, so the same corpus can be
+rebuilt on any machine. Candidates can be rendered as structured sections (for
+loading the database directly), text lines, text-layer PDFs, image-only
+"scanned" PDFs or DOCX files.
+
+    python -m benchmarks.corpus out_dir --count 100 --formats pdf,docx,scanned
+"""
+import argparse
+import io
+import os
+import random
+
+FIRST_NAMES = ['Ann', 'Bob', 'Carla', 'Dev', 'Elif', 'Farah', 'Gus', 'Hana', 'Ivan', 'Jun', 'Kofi', 'Lena',
+               'Mateo', 'Nia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sami', 'Tariq', 'Uma', 'Viktor', 'Wen', 'Yara']
+LAST_NAMES = ['Adams', 'Baker', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Haddad', 'Ito', 'Jones',
+              'Kumar', 'Lopez', 'Moreau', 'Nakamura', 'Okafor', 'Patel', 'Rossi', 'Silva', 'Tanaka', 'Weber']
+SKILLS = ['Python', 'Java', 'JavaScript', 'TypeScript', 'SQL', 'Go', 'Rust', 'C++', 'Kotlin', 'Swift', 'Django',
+          'Flask', 'React', 'Angular', 'Docker', 'Kubernetes', 'AWS', 'Azure', 'GCP', 'Terraform', 'Spark',
+          'Pandas', 'NumPy', 'PyTorch', 'TensorFlow', 'Machine Learning', 'Deep Learning', 'Data Analysis',
+          'Project Management', 'Agile', 'Scrum', 'Excel', 'Tableau', 'Power BI', 'Linux', 'Git', 'CI/CD',
+          'PostgreSQL', 'MongoDB', 'Redis', 'Kafka', 'GraphQL', 'REST APIs', 'Microservices', 'Security']
+INDUSTRIES = ['banking', 'healthcare', 'retail', 'insurance', 'logistics', 'telecommunications', 'energy',
+              'education', 'gaming', 'automotive', 'media', 'government', 'pharmaceuticals', 'travel']
+TITLES = ['Software Engineer', 'Data Scientist', 'Backend Developer', 'DevOps Engineer', 'Data Analyst',
+          'Product Manager', 'ML Engineer', 'Frontend Developer', 'QA Engineer', 'Solutions Architect']
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark', 'Wayne', 'Wonka', 'Cyberdyne', 'Soylent']
+DEGREES = ['Bachelor of Science in Computer Science', 'Master of Science in Data Science', 'PhD in Physics',
+           'Bachelor of Arts in Economics', 'MBA', 'Master of Engineering', 'Associate Degree in IT']
+UNIVERSITIES = ['State University', 'Tech Institute', 'City College', 'National University', 'Polytechnic']
+PROJECT_WORDS = ['recommendation engine', 'fraud detection', 'payments platform', 'inventory system',
+                 'chat assistant', 'analytics dashboard', 'search service', 'mobile app', 'data pipeline']
+CERTIFICATIONS = ['AWS Certified Solutions Architect', 'PMP', 'Certified Scrum Master', 'CKA',
+                  'Google Data Analytics', 'Azure Fundamentals', 'CISSP']
+
+
+class CorpusGenerator:
+    def __init__(self, seed=42):
+        self.seed = seed
+
+    def candidate(self, index, extra_roles=0):
+        """Structured sections for one candidate, in the shape CVProcessor.parse_text produces"""
+        rng = random.Random(f"{self.seed}:{index}")
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        year = rng.randint(2000, 2012)
+        education = []
+        for degree in rng.sample(DEGREES, rng.randint(1, 2)):
+            education.append(f"{degree}, {rng.choice(UNIVERSITIES)}, {year}-{year + rng.randint(1, 4)}")
+            year += 3
+        work_experience = []
+        for role in range(rng.randint(1, 4) + extra_roles):
+            start = year + rng.randint(0, 2)
+            end = start + rng.randint(1, 6)
+            end_text = 'current' if end >= 2024 else str(end)
+            work_experience.append(
+                f"{rng.choice(TITLES)} at {rng.choice(COMPANIES)} ({rng.choice(INDUSTRIES)}), {start}-{end_text}"
+            )
+            year = min(end, 2023)
+        return {
+            'personal_info': {
+                'Name': f"{first} {last}",
+                'Email': f"{first.lower()}.{last.lower()}{index}@example.com",
+                'Phone': f"({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}",
+            },
+            'education': education,
+            'work_experience': work_experience,
+            'skills': [', '.join(rng.sample(SKILLS, rng.randint(3, 10)))],
+            'projects': [f"Built a {rng.choice(PROJECT_WORDS)} for {rng.choice(INDUSTRIES)}"
+                         for _ in range(rng.randint(0, 3))],
+            'certifications': rng.sample(CERTIFICATIONS, rng.randint(0, 2)),
+        }
+
+    def lines(self, index, extra_roles=0):
+        """The candidate as CV text lines with section headings"""
+        sections = self.candidate(index, extra_roles)
+        info = sections['personal_info']
+        lines = [info['Name'], info['Email'], info['Phone']]
+        for heading, key in [('Education', 'education'), ('Work Experience', 'work_experience'),
+                             ('Skills', 'skills'), ('Projects', 'projects'), ('Certifications', 'certifications')]:
+            if sections[key]:
+                lines.append(heading)
+                lines.extend(sections[key])
+        return lines
+
+    def document_lines(self, index, line_count):
+        """At least line_count lines, padding the CV with extra roles"""
+        extra = 0
+        lines = self.lines(index)
+        while len(lines) < line_count:
+            extra = max(extra * 2, 8)
+            lines = self.lines(index, extra_roles=extra)
+        return lines[:line_count]
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)').encode('latin-1', 'replace')
+
+
+def write_text_pdf(path, lines, lines_per_page=50):
+    """Write a PDF with a real text layer, lines_per_page lines of Helvetica per page"""
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        stream = b"BT /F1 11 Tf 14 TL 50 750 Td " + b" ".join(b"(%s) '" % _pdf_escape(line) for line in page) + b" ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+    output = io.BytesIO(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = output.tell()
+    output.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    output.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    output.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    with open(path, 'wb') as f:
+        f.write(output.getvalue())
+
+
+def write_scanned_pdf(path, lines, lines_per_page=50, dpi=200):
+    """Write an image-only PDF (no text layer), like a scanned CV"""
+    from PIL import Image, ImageDraw, ImageFont
+    font = ImageFont.load_default()
+    width, height = int(8.5 * dpi), int(11 * dpi)
+    images = []
+    for start in range(0, max(len(lines), 1), lines_per_page):
+        image = Image.new('L', (width, height), 255)
+        draw = ImageDraw.Draw(image)
+        for row, line in enumerate(lines[start:start + lines_per_page]):
+            draw.text((dpi // 2, dpi // 2 + row * (height - dpi) // lines_per_page), line, fill=0, font=font)
+        images.append(image)
+    images[0].save(path, 'PDF', resolution=dpi, save_all=True, append_images=images[1:])
+
+
+def write_docx(path, lines, skills_table=False):
+    """Write a DOCX with one paragraph per line; skills_table puts the skills section in a table instead"""
+    import docx
+    document = docx.Document()
+    in_skills = False
+    for line in lines:
+        if skills_table and in_skills and line not in ('Projects', 'Certifications'):
+            table = document.add_table(rows=1, cols=1)
+            table.rows[0].cells[0].text = line
+            continue
+        in_skills = line == 'Skills'
+        document.add_paragraph(line)
+    document.save(path)
+
+
+WRITERS = {
+    'pdf': ('.pdf', write_text_pdf),
+    'scanned': ('_scanned.pdf', write_scanned_pdf),
+    'docx': ('.docx', write_docx),
+}
+
+
+def generate_files(directory, count, formats=('pdf', 'docx'), seed=42, line_count=None):
+    """Write count CVs per format into directory and return the paths"""
+    generator = CorpusGenerator(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(count):
+        lines = generator.document_lines(index, line_count) if line_count else generator.lines(index)
+        for fmt in formats:
+            suffix, writer = WRITERS[fmt]
+            path = os.path.join(directory, f"cv_{index:06d}{suffix}")
+            writer(path, lines)
+            paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic CV corpus")
+    parser.add_argument('directory')
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--formats', default='pdf,docx', help="Comma separated: " + ', '.join(WRITERS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--lines', type=int, help="Pad every CV to this many lines")
+    args = parser.parse_args(argv)
+    paths = generate_files(args.directory, args.count, args.formats.split(','), args.seed, args.lines)
+    print(f"Wrote {len(paths)} file(s) to {args.directory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""Run the benchmark suite and write JSON results, optionally comparing them to a baseline
+
+    python -m benchmarks.run --sizes 1000,10000,100000 --output results.json
+    python -m benchmarks.run --compare baseline.json --threshold 0.2
+
+With --compare the exit status is 1 when any benchmark's median got slower
+than the baseline by more than the threshold (0.2 = 20%).
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+CHATBOT_QUERIES = {
+    'skills': "skills",
+    'experience': "experience",
+    'education': "education",
+    'skill': "Find candidates with skill python",
+    'skill_all': "Find candidates with skills python and sql",
+    'experience_in': "Find candidates with experience in banking",
+    'job_requirements': "Identify matching candidates for job requirements: 5 years and python",
+    'job_description': "Find candidates for job description: ML engineer with python and kubernetes",
+    'compare_experience': "Compare their years of experience",
+    'compare_education': "Compare their education levels",
+    'follow_up': "What about their education",
+}
+
+
+def measure(func, repeat):
+    """Median/min/mean wall time of func over repeat runs, with the hot paths' debug prints discarded"""
+    timings = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def summarize(timings):
+    return {
+        'median': statistics.median(timings),
+        'min': min(timings),
+        'mean': statistics.fmean(timings),
+        'runs': len(timings),
+    }
+
+
+def bench_startup(results, repeat):
+    """Cold-start timings, each run in a fresh interpreter (see benchmarks.startup)"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for scenario, warm in [('import', False), ('chatbot', False), ('chatbot', True), ('upload', False), ('upload', True)]:
+        timings = []
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.startup', scenario] + (['--warm'] if warm else []),
+                cwd=root, capture_output=True, text=True, check=True,
+            ).stdout
+            # Only the last line is the timing; the rest is the app's own output
+            timings.append(float(output.strip().splitlines()[-1]))
+        name = 'import_views' if scenario == 'import' else f"first_{scenario}{'_warm' if warm else ''}"
+        results[f"startup.{name}"] = summarize(timings)
+
+
+def bench_extraction(results, generator, directory, repeat):
+    from benchmarks.corpus import write_docx, write_scanned_pdf, write_text_pdf
+    from cv_processing.cv_processor import CVProcessor
+    processor = CVProcessor()
+    for pages in (1, 10, 40):
+        lines = generator.document_lines(0, pages * 50)
+        pdf_path = os.path.join(directory, f"text_{pages}.pdf")
+        write_text_pdf(pdf_path, lines)
+        results[f"extract.pdf_text.{pages}_pages"] = measure(lambda: processor.extract_text(pdf_path), repeat)
+        docx_path = os.path.join(directory, f"doc_{pages}.docx")
+        write_docx(docx_path, lines, skills_table=True)
+        results[f"extract.docx.{pages}_pages"] = measure(lambda: processor.extract_text(docx_path), repeat)
+    # Many small Word CVs, as in a bulk import; per-file overhead dominates here
+    batch = []
+    for i in range(200):
+        batch.append(os.path.join(directory, f"batch_{i}.docx"))
+        write_docx(batch[-1], generator.lines(i), skills_table=True)
+    results["extract.docx_batch.200_files"] = measure(lambda: [processor.extract_text(path) for path in batch], repeat)
+    if shutil.which('tesseract') and shutil.which('pdftoppm'):
+        for pages in (1, 4):
+            scanned_path = os.path.join(directory, f"scanned_{pages}.pdf")
+            write_scanned_pdf(scanned_path, generator.document_lines(0, pages * 50))
+            results[f"extract.pdf_scanned.{pages}_pages"] = measure(lambda: processor.extract_text(scanned_path), 1)
+    else:
+        print("Skipping scanned PDF extraction: tesseract/pdftoppm not found", file=sys.stderr)
+
+
+def bench_ocr(results, repeat):
+    """Each available OCR backend over every page of the bundled sample CVs, rasterized once up front"""
+    from django.conf import settings
+    from pdf2image import convert_from_path
+    from cv_processing import ocr
+    if not shutil.which('pdftoppm'):
+        print("Skipping OCR backends: pdftoppm not found", file=sys.stderr)
+        return
+    sample_dir = os.path.join(settings.BASE_DIR, 'data', 'sample_cvs')
+    images = [
+        image
+        for name in sorted(os.listdir(sample_dir)) if name.endswith('.pdf')
+        for image in convert_from_path(os.path.join(sample_dir, name), dpi=settings.CV_OCR_DPI)
+    ]
+    backends = []
+    if shutil.which(settings.CV_TESSERACT_CMD or 'tesseract'):
+        backends.append(ocr.PytesseractBackend())
+    else:
+        print("Skipping the pytesseract backend: tesseract not found", file=sys.stderr)
+    if ocr.tesserocr is not None:
+        backends.append(ocr.TesserocrBackend())
+    else:
+        print("Skipping the tesserocr backend: tesserocr not installed", file=sys.stderr)
+    for backend in backends:
+        results[f"ocr.{backend.name}.sample_cvs_{len(images)}_pages"] = measure(
+            lambda: [backend.image_to_string(image) for image in images], repeat)
+
+
+def bench_parsing(results, generator, repeat):
+    from cv_processing.cv_processor import CVProcessor
+    processor = CVProcessor()
+    for line_count in (1000, 10000):
+        text = "\n".join(generator.document_lines(1, line_count))
+        results[f"parse.{line_count}_lines"] = measure(lambda: processor.parse_text(text), repeat)
+    texts = ["\n".join(generator.lines(index)) for index in range(100)]
+    results["parse.batch_100_docs"] = measure(lambda: processor.parse_many(texts), repeat)
+
+
+def populate(generator, start, stop, batch_size=2000):
+    from cv_processing.bulk import bulk_create_cvs
+    from cv_processing.models import CV
+    for batch_start in range(start, stop, batch_size):
+        bulk_create_cvs(
+            (CV(filename=f"cv_{index:06d}.pdf", file=''), generator.candidate(index), None, None)
+            for index in range(batch_start, min(batch_start + batch_size, stop))
+        )
+
+
+def bench_queries(results, size, repeat):
+    from django.test import Client
+    from cv_processing.candidates import load_snapshot
+    from cv_processing.llm_interface import LLMInterface
+    from cv_processing import vector_index
+    client = Client()
+    results[f"corpus.load_snapshot.{size}"] = measure(load_snapshot, 1)
+    # Built from the database the first time, appended to by later populate() calls
+    results[f"vector_index.ensure.{size}"] = measure(vector_index.get_index, 1)
+    results[f"vector_index.search.{size}"] = measure(
+        lambda: vector_index.search("backend developer with java and banking experience"), repeat)
+    for name, query in CHATBOT_QUERIES.items():
+        if name == 'follow_up':
+            measure(lambda: client.post('/chatbot/', {'query': CHATBOT_QUERIES['skill']}), 1)
+        results[f"chatbot.{name}.{size}"] = measure(lambda: client.post('/chatbot/', {'query': query}), repeat)
+
+    llm = LLMInterface()
+    _, database = load_snapshot()
+    cv_data = {'query': '', 'database': database}
+    results[f"local.calculate_experience.{size}"] = measure(lambda: llm._calculate_experience(cv_data), repeat)
+    results[f"local.compare_education.{size}"] = measure(lambda: llm._compare_education(cv_data), repeat)
+    results[f"local.compare_skills.{size}"] = measure(lambda: llm._compare_skills(cv_data), repeat)
+    results[f"prompt.build_payload.{size}"] = measure(
+        lambda: llm.build_payload(cv_data, "compare their years of experience in banking"), repeat)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison table and return the names of benchmarks that regressed"""
+    regressions = []
+    print(f"{'benchmark':<48} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name in sorted(set(results) & set(baseline)):
+        old, new = baseline[name]['median'], results[name]['median']
+        change = (new - old) / old if old else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<48} {old * 1000:>9.2f}ms {new * 1000:>9.2f}ms {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000', help="Comma separated candidate counts")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per benchmark (median is reported)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--only', choices=['startup', 'extraction', 'ocr', 'parsing', 'queries'], action='append',
+                        help="Run only these groups (repeatable)")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', metavar='BASELINE', help="Baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.core.management import call_command
+    from benchmarks.corpus import CorpusGenerator
+    call_command('migrate', verbosity=0)
+
+    groups = set(args.only or ['startup', 'extraction', 'ocr', 'parsing', 'queries'])
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+    generator = CorpusGenerator(args.seed)
+    results = {}
+    directory = tempfile.mkdtemp(dir=settings.BENCHMARK_DIR)
+    try:
+        if 'startup' in groups:
+            bench_startup(results, args.repeat)
+        if 'extraction' in groups:
+            bench_extraction(results, generator, directory, args.repeat)
+        if 'ocr' in groups:
+            bench_ocr(results, args.repeat)
+        if 'parsing' in groups:
+            bench_parsing(results, generator, args.repeat)
+        if 'queries' in groups:
+            loaded = 0
+            for size in sizes:
+                start = time.perf_counter()
+                populate(generator, loaded, size)
+                loaded = size
+                print(f"Loaded {size} candidates in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+                bench_queries(results, size, args.repeat)
+    finally:
+        shutil.rmtree(settings.BENCHMARK_DIR, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'sizes': sizes,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Wrote {len(results)} result(s) to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
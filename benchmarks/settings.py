@@ -0,0 +1,27 @@
+"""Django settings for benchmark runs: a throwaway database and no network access"""
+import os
+import tempfile
+
+os.environ.setdefault('SECRET_KEY', 'benchmark-only-secret-key')
+os.environ.setdefault('HUGGINGFACE_API_KEY', 'offline')
+
+from cv_analyzer.settings import *  # noqa: E402,F401,F403
+
+BENCHMARK_DIR = tempfile.mkdtemp(prefix='cv-benchmark-')
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BENCHMARK_DIR, 'db.sqlite3'),
+    }
+}
+MEDIA_ROOT = os.path.join(BENCHMARK_DIR, 'media')
+CV_VECTOR_INDEX_DIR = os.path.join(BENCHMARK_DIR, 'vector_index')
+ALLOWED_HOSTS = ['testserver']
+DEBUG = False
+
+# Nothing listens on the discard port, so the first LLM call fails fast and the
+# breaker then routes every query to the local fallback logic
+CV_LLM_API_URL = 'http://127.0.0.1:9/models/offline'
+CV_LLM_MAX_RETRIES = 0
+CV_LLM_BREAKER_THRESHOLD = 1
+CV_LLM_BREAKER_RESET = 24 * 3600.0
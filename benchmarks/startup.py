@@ -0,0 +1,66 @@
+"""Time one cold-start scenario in this fresh interpreter and print the seconds taken
+
+    python -m benchmarks.startup import
+    python -m benchmarks.startup chatbot [--warm]
+    python -m benchmarks.startup upload [--warm]
+
+'import' times Django setup plus importing the views, as a worker does on
+boot. The others time a new process's first chatbot query or first CV
+upload (extracted inline), after migrating a throwaway database and, with
+--warm, after cv_processing.warmup ran as it would before a fork. Run by
+benchmarks.run; each run needs its own process, since imports happen once.
+"""
+import os
+import shutil
+import sys
+import time
+
+SCENARIOS = ['import', 'chatbot', 'upload']
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    scenario, warm = argv[0], '--warm' in argv
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'benchmarks.settings'
+    os.environ['CV_INGEST_EAGER'] = '1'
+    start = time.perf_counter()
+    import django
+    django.setup()
+    from django.conf import settings
+    try:
+        if scenario == 'import':
+            import cv_processing.views  # noqa: F401
+            elapsed = time.perf_counter() - start
+        else:
+            elapsed = first_request(scenario, warm)
+    finally:
+        shutil.rmtree(settings.BENCHMARK_DIR, ignore_errors=True)
+    print(elapsed)
+
+
+def first_request(scenario, warm):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.core.management import call_command
+    from django.test import Client
+    from benchmarks.corpus import CorpusGenerator, write_docx
+    call_command('migrate', verbosity=0)
+    if scenario == 'upload':
+        from django.conf import settings
+        path = os.path.join(settings.BENCHMARK_DIR, 'cv.docx')
+        write_docx(path, CorpusGenerator().lines(0), skills_table=True)
+        with open(path, 'rb') as f:
+            content = f.read()
+    if warm:
+        from cv_processing.warmup import warmup
+        warmup()
+    client = Client()
+    start = time.perf_counter()
+    if scenario == 'upload':
+        client.post('/upload/', {'cv_files': [SimpleUploadedFile('cv.docx', content)]})
+    else:
+        client.post('/chatbot/', {'query': 'Find candidates with skill python'})
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main()
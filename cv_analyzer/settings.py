@@ -128,4 +128,122 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
\ No newline at end of file
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+# Background CV ingestion
+# Number of worker processes that extract uploaded CVs
+CV_INGEST_WORKERS = env.int('CV_INGEST_WORKERS', default=os.cpu_count() or 2)
+# Process uploads inline instead of in the worker pool (tests, debugging)
+CV_INGEST_EAGER = env.bool('CV_INGEST_EAGER', default=False)
+# Where ingest_cvs keeps its per-directory checkpoints, outside the (possibly read-only) archive
+CV_INGEST_CHECKPOINT_DIR = env('CV_INGEST_CHECKPOINT_DIR', default=os.path.join(BASE_DIR, 'ingest_checkpoints'))
+
+# OCR
+# Pages OCRed concurrently per PDF
+CV_OCR_WORKERS = env.int('CV_OCR_WORKERS', default=os.cpu_count() or 1)
+# Pages whose text layer is shorter than this are OCRed
+CV_OCR_MIN_PAGE_CHARS = env.int('CV_OCR_MIN_PAGE_CHARS', default=50)
+# Rasterization resolution for OCR; higher is more accurate but uses more memory
+CV_OCR_DPI = env.int('CV_OCR_DPI', default=200)
+# 'tesserocr' (in-process engines, optional dependency), 'pytesseract' (a tesseract process per page) or 'auto'
+CV_OCR_BACKEND = env('CV_OCR_BACKEND', default='auto')
+# tesseract binary run by the pytesseract backend; empty uses the one on PATH
+CV_TESSERACT_CMD = env('CV_TESSERACT_CMD', default='')
+# tessdata directory for the tesserocr backend; empty uses libtesseract's default
+CV_TESSDATA_PREFIX = env('CV_TESSDATA_PREFIX', default='')
+# Tesseract language(s), e.g. 'eng+deu'
+CV_OCR_LANG = env('CV_OCR_LANG', default='eng')
+
+# Extraction cache
+# Hash uploads while they stream in so repeat files can reuse earlier results
+FILE_UPLOAD_HANDLERS = [
+    'cv_processing.uploads.HashingMemoryFileUploadHandler',
+    'cv_processing.uploads.HashingTemporaryFileUploadHandler',
+]
+# Maximum cached parses kept; least recently used entries are evicted first
+CV_EXTRACTION_CACHE_SIZE = env.int('CV_EXTRACTION_CACHE_SIZE', default=10000)
+
+# Full-text search
+# Maximum ranked results returned for "experience in ..." queries
+CV_SEARCH_TOP_K = env.int('CV_SEARCH_TOP_K', default=100)
+
+# LLM answer cache
+# Cached answers per process; least recently used are evicted first
+CV_LLM_CACHE_SIZE = env.int('CV_LLM_CACHE_SIZE', default=1024)
+# Seconds an answer stays valid even if the corpus is unchanged
+CV_LLM_CACHE_TTL = env.int('CV_LLM_CACHE_TTL', default=3600)
+
+# LLM API client
+CV_LLM_API_URL = env('CV_LLM_API_URL', default='https://api-inference.huggingface.co/models/gpt2')
+CV_LLM_CONNECT_TIMEOUT = env.float('CV_LLM_CONNECT_TIMEOUT', default=3.0)
+CV_LLM_READ_TIMEOUT = env.float('CV_LLM_READ_TIMEOUT', default=20.0)
+# Retries after the first attempt, with exponential backoff starting at CV_LLM_RETRY_BACKOFF seconds
+CV_LLM_MAX_RETRIES = env.int('CV_LLM_MAX_RETRIES', default=2)
+CV_LLM_RETRY_BACKOFF = env.float('CV_LLM_RETRY_BACKOFF', default=0.5)
+# Consecutive failed calls that open the circuit, and seconds before the API is probed again
+CV_LLM_BREAKER_THRESHOLD = env.int('CV_LLM_BREAKER_THRESHOLD', default=3)
+CV_LLM_BREAKER_RESET = env.float('CV_LLM_BREAKER_RESET', default=30.0)
+# Ask the API for token-by-token server-sent events when the chatbot streams its answer
+CV_LLM_STREAM = env.bool('CV_LLM_STREAM', default=False)
+
+# LLM request batching
+# Seconds to gather different prompts into one upstream call with a list of inputs;
+# 0 disables it. Only for backends that accept batched inputs.
+CV_LLM_BATCH_WINDOW = env.float('CV_LLM_BATCH_WINDOW', default=0.0)
+# Prompts per batched call at most; a full batch is sent without waiting out the window
+CV_LLM_BATCH_SIZE = env.int('CV_LLM_BATCH_SIZE', default=8)
+
+# Instrumentation
+# Print full extracted text, parsed CVs and the data sent to the LLM (slow on large corpora)
+CV_DEBUG_DUMPS = env.bool('CV_DEBUG_DUMPS', default=False)
+
+# Section parsing
+# Extra heading phrases per section, added to cv_processing.sections.DEFAULT_HEADINGS,
+# e.g. {'skills': ['tech stack'], 'education': ['utbildning']}
+CV_SECTION_HEADINGS = {}
+# Lines with more words than this are never treated as section headings
+CV_SECTION_MAX_HEADING_WORDS = env.int('CV_SECTION_MAX_HEADING_WORDS', default=6)
+
+# Semantic search
+# Memory-mapped CV vector index; built from the database when missing
+CV_VECTOR_INDEX_DIR = env('CV_VECTOR_INDEX_DIR', default=os.path.join(BASE_DIR, 'vector_index'))
+# Hashed feature dimensions per CV; changing it rebuilds the index
+CV_VECTOR_DIMS = env.int('CV_VECTOR_DIMS', default=512)
+# Candidates listed for a free-text job description
+CV_VECTOR_TOP_K = env.int('CV_VECTOR_TOP_K', default=10)
+# Cosine similarity below which a CV is not considered a match
+CV_VECTOR_MIN_SCORE = env.float('CV_VECTOR_MIN_SCORE', default=0.05)
+# Share of cleared (updated or removed) rows at which the index files are rewritten without them
+CV_VECTOR_COMPACT_RATIO = env.float('CV_VECTOR_COMPACT_RATIO', default=0.25)
+
+# Job requirement matching
+# Best-scoring candidates listed, with per-requirement explanations
+CV_MATCH_TOP_K = env.int('CV_MATCH_TOP_K', default=10)
+
+# Chatbot result sets
+# Seconds a query's matched candidates stay available to follow-ups and paging
+CV_RESULT_SET_TTL = env.int('CV_RESULT_SET_TTL', default=3600)
+# Candidates per page of a listing
+CV_RESULT_PAGE_SIZE = env.int('CV_RESULT_PAGE_SIZE', default=20)
+# Values listed per facet, e.g. the most common skills
+CV_RESULT_FACET_SIZE = env.int('CV_RESULT_FACET_SIZE', default=10)
+
+# LLM prompt context
+# Estimated tokens of CV data packed into a prompt, most relevant candidates first
+CV_PROMPT_TOKEN_BUDGET = env.int('CV_PROMPT_TOKEN_BUDGET', default=1024)
+# Candidates included at most, however short their CVs
+CV_PROMPT_MAX_CANDIDATES = env.int('CV_PROMPT_MAX_CANDIDATES', default=10)
+
+# Startup
+# Preload views, extraction libraries and OCR models as the app loads, before a preforking server forks
+CV_WARMUP = env.bool('CV_WARMUP', default=False)
+
+# Chunked uploads
+# Largest chunk accepted per request; clients are told to send chunks of this size
+CV_UPLOAD_CHUNK_SIZE = env.int('CV_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024)
+# Largest file accepted
+CV_UPLOAD_MAX_FILE_SIZE = env.int('CV_UPLOAD_MAX_FILE_SIZE', default=100 * 1024 * 1024)
+# Seconds an upload can be resumed before its unfinished files are discarded
+CV_UPLOAD_TTL = env.int('CV_UPLOAD_TTL', default=24 * 3600)
+# Where partially received files are kept until they are finalized
+CV_UPLOAD_PARTS_DIR = env('CV_UPLOAD_PARTS_DIR', default=os.path.join(BASE_DIR, 'upload_parts'))
@@ -16,7 +16,8 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from cv_processing.views import upload_cv, chatbot
+from cv_processing.views import upload_cv, chatbot, chatbot_stream, job_status_view, result_set_view, metrics_view
+from cv_processing.views import upload_start_view, upload_status_view, upload_chunk_view, upload_finalize_view
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -24,6 +25,14 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('upload/', upload_cv, name='upload_cv'),
     path('chatbot/', chatbot, name='chatbot'),
+    path('chatbot/stream/', chatbot_stream, name='chatbot_stream'),
+    path('chatbot/results/<int:result_set_id>/', result_set_view, name='result_set'),
+    path('jobs/<int:job_id>/', job_status_view, name='job_status'),
+    path('uploads/', upload_start_view, name='upload_start'),
+    path('uploads/<uuid:upload_id>/', upload_status_view, name='upload_status'),
+    path('uploads/<uuid:upload_id>/files/<int:file_id>/', upload_chunk_view, name='upload_chunk'),
+    path('uploads/<uuid:upload_id>/files/<int:file_id>/finalize/', upload_finalize_view, name='upload_finalize'),
+    path('metrics', metrics_view, name='metrics'),
     
 ]
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CvProcessingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cv_processing'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from . import extraction_cache, search, skill_index, vector_index
+from .candidates import bump_corpus_version
+from .cv_processor import PARSER_VERSION
+from .metrics import STAGE_SECONDS
+from .models import CV, CVData, CVText, SkillIndex
+
+PARSED_FIELDS = ['personal_info', 'education', 'work_experience', 'skills', 'projects', 'certifications']
+FACT_FIELDS = ['experience_years', 'experience_intervals', 'experience_until', 'highest_degree']
+
+
+def bulk_create_cvs(entries):
+    """Insert (unsaved CV, cv_data dict, pages or None, extraction method) entries in one transaction
+
+    bulk_create skips save() and the model signals, so the derived CVData
+    facts, extracted text, extraction cache, skill, full-text and vector
+    indexes and the corpus version are all maintained here instead.
+    """
+    entries = list(entries)
+    if not entries:
+        return []
+    with STAGE_SECONDS.time(stage='db_write'), transaction.atomic():
+        cvs = CV.objects.bulk_create([cv for cv, _, _, _ in entries])
+        CVText.objects.bulk_create([
+            CVText(cv=cv, pages=pages, method=method)
+            for cv, (_, _, pages, method) in zip(cvs, entries) if pages is not None
+        ])
+        cv_datas = [CVData(cv=cv, parser_version=PARSER_VERSION, **cv_data) for cv, (_, cv_data, _, _) in zip(cvs, entries)]
+        for cv_data in cv_datas:
+            cv_data.update_facts()
+        cv_datas = CVData.objects.bulk_create(cv_datas)
+        extraction_cache.store_many(
+            (cv.content_hash, cv_data, CVText.join(pages)) for cv, cv_data, pages, _ in entries if pages is not None
+        )
+        skill_index.index_many(cv_datas)
+        for cv_data in cv_datas:
+            search.index_cv_data(cv_data)
+        transaction.on_commit(lambda: vector_index.index_cv_datas(cv_datas))
+        bump_corpus_version()
+    return cv_datas
+
+
+def bulk_update_parses(cv_datas):
+    """Save re-parsed CVData rows in one transaction, refreshing what bulk_create_cvs derives
+
+    Each row's parsed sections are expected to be set already; its facts
+    and parser_version are updated here.
+    """
+    cv_datas = list(cv_datas)
+    if not cv_datas:
+        return []
+    # Full-text indexing reads each row's CV and stored text; load them per batch, not per row
+    prefetch_related_objects(cv_datas, 'cv__text')
+    with STAGE_SECONDS.time(stage='db_write'), transaction.atomic():
+        for cv_data in cv_datas:
+            cv_data.update_facts()
+            cv_data.parser_version = PARSER_VERSION
+        CVData.objects.bulk_update(cv_datas, PARSED_FIELDS + FACT_FIELDS + ['parser_version'])
+        SkillIndex.objects.filter(cv_data__in=cv_datas).delete()
+        skill_index.index_many(cv_datas)
+        for cv_data in cv_datas:
+            search.index_cv_data(cv_data)
+        transaction.on_commit(lambda: vector_index.index_cv_datas(cv_datas))
+        bump_corpus_version()
+    return cv_datas
@@ -0,0 +1,141 @@
+import copy
+import threading
+import uuid
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from .models import CV, CVData, CorpusVersion
+from .cv_facts import compute_facts
+from .metrics import STAGE_SECONDS
+
+SECTIONS = ['personal_info', 'education', 'work_experience', 'skills', 'projects', 'certifications']
+# Precomputed CVData columns, exposed per candidate under 'facts'
+FACTS = ['experience_years', 'experience_intervals', 'highest_degree']
+# Ids per query when reading candidates by id, below SQLite's bound parameter limit
+ID_CHUNK = 500
+EMPTY_SECTIONS = {'personal_info': {}, 'education': [], 'work_experience': [], 'skills': [], 'projects': [], 'certifications': []}
+
+_snapshot = {'version': None, 'database': {}}
+_snapshot_lock = threading.Lock()
+# Year this process last recounted ongoing roles up to, see refresh_ongoing_experience
+_counted_year = None
+_counted_year_lock = threading.Lock()
+
+
+def refresh_ongoing_experience(year=None):
+    """Recount experience of CVs whose ongoing roles were counted up to an earlier year
+
+    Returns how many CVs changed; the corpus version is bumped if any did.
+    """
+    year = year or datetime.now().year
+    stale = list(
+        CVData.objects.filter(experience_until__lt=year)
+        .only('id', 'work_experience', 'education')
+    )
+    for cv_data in stale:
+        cv_data.update_facts()
+    if stale:
+        CVData.objects.bulk_update(stale, ['experience_years', 'experience_intervals', 'experience_until'], batch_size=ID_CHUNK)
+        bump_corpus_version()
+    return len(stale)
+
+
+def _refresh_if_new_year():
+    # Once per process per year, so the query never runs on the hot path
+    global _counted_year
+    year = datetime.now().year
+    if _counted_year == year:
+        return
+    with _counted_year_lock:
+        if _counted_year != year:
+            refresh_ongoing_experience(year)
+            _counted_year = year
+
+
+def corpus_version():
+    _refresh_if_new_year()
+    return CorpusVersion.objects.values_list('version', flat=True).first() or ''
+
+
+def bump_corpus_version():
+    CorpusVersion.objects.update_or_create(pk=1, defaults={'version': uuid.uuid4().hex})
+
+
+def _build_database():
+    database = {}
+    for cv_id, *values in _snapshot_rows():
+        key = str(cv_id)
+        if key not in database:
+            database[key] = _row_to_candidate(values)
+    return database
+
+
+def _row_to_candidate(values):
+    sections = dict(zip(SECTIONS, values))
+    if sections['personal_info'] is None:
+        return {**copy.deepcopy(EMPTY_SECTIONS), 'facts': compute_facts([], [])}
+    return {**sections, 'facts': dict(zip(FACTS, values[len(SECTIONS):]))}
+
+
+def _snapshot_rows():
+    # One LEFT JOIN over CV -> CVData; as before, the first CVData of each CV wins
+    fields = [f'cvdata__{section}' for section in SECTIONS + FACTS]
+    return CV.objects.order_by('id', 'cvdata__id').values_list('id', *fields)
+
+
+async def aload_snapshot():
+    """load_snapshot using the async ORM, for async views"""
+    if _counted_year != datetime.now().year:
+        await sync_to_async(_refresh_if_new_year)()
+    version = await CorpusVersion.objects.values_list('version', flat=True).afirst() or ''
+    with _snapshot_lock:
+        if _snapshot['version'] == version:
+            return version, _snapshot['database']
+    database = {}
+    with STAGE_SECONDS.time(stage='corpus_build'):
+        async for cv_id, *values in _snapshot_rows():
+            key = str(cv_id)
+            if key not in database:
+                database[key] = _row_to_candidate(values)
+    with _snapshot_lock:
+        _snapshot['version'] = version
+        _snapshot['database'] = database
+    return version, database
+
+
+def load_snapshot():
+    """(version, {cv_id: sections}) for all candidates, rebuilt only when the corpus version changed
+
+    The returned dict is shared between requests and must not be mutated.
+    """
+    version = corpus_version()
+    with _snapshot_lock:
+        if _snapshot['version'] == version:
+            return version, _snapshot['database']
+    with STAGE_SECONDS.time(stage='corpus_build'):
+        database = _build_database()
+    with _snapshot_lock:
+        _snapshot['version'] = version
+        _snapshot['database'] = database
+    return version, database
+
+
+def load_candidates(cv_ids):
+    """{cv_id: sections} for just these candidates, in the given order
+
+    Served from the snapshot when it is current; otherwise only these CVs
+    are read, so a follow-up on a few candidates never builds the full corpus.
+    """
+    version = corpus_version()
+    with _snapshot_lock:
+        if _snapshot['version'] == version:
+            database = _snapshot['database']
+            return {cv_id: database[cv_id] for cv_id in cv_ids if cv_id in database}
+    found = {}
+    for start in range(0, len(cv_ids), ID_CHUNK):
+        for cv_id, *values in _snapshot_rows().filter(id__in=cv_ids[start:start + ID_CHUNK]):
+            found.setdefault(str(cv_id), _row_to_candidate(values))
+    return {cv_id: found[cv_id] for cv_id in cv_ids if cv_id in found}
+
+
+def load_corpus():
+    return load_snapshot()[1]
@@ -0,0 +1,232 @@
+"""Resumable uploads of CV batches, sent a chunk at a time
+
+1. POST /uploads/ with {"files": [{"filename", "size", "sha256"}, ...]}
+   creates an Upload and its IngestJob.
+2. PUT each file's chunks to its chunk_url, in order, with an Upload-Offset
+   header giving where the chunk starts. A chunk that doesn't start where
+   the stored data ends is refused with the offset to resume from, and
+   GET /uploads/<id>/ reports every file's received bytes after a dropped
+   connection.
+3. POST to a file's finalize_url once all of it is sent. Its SHA-256 is
+   checked and its format told from its leading bytes, and it is stored as
+   a CV and queued on the upload's job right away, while the rest of the
+   batch is still arriving.
+
+Chunks are streamed straight into a part file under CV_UPLOAD_PARTS_DIR,
+so no request ever holds more than a read buffer in memory.
+
+The API is for scripted clients, which have no CSRF token, so its views
+are exempt from CSRF checks; a file can only be written through the
+random upload id returned by step 1.
+"""
+import fcntl
+import os
+import re
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from .models import CV, IngestJob, Upload, UploadFile
+from .jobs import submit_job
+from .uploads import detect_format, hash_file
+
+READ_SIZE = 64 * 1024
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(Exception):
+    """A refused upload request; body is the JSON error response and status its HTTP status"""
+
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.body = {'error': message, **extra}
+
+
+def part_path(upload_file):
+    return os.path.join(settings.CV_UPLOAD_PARTS_DIR, f"{upload_file.upload_id}-{upload_file.pk}.part")
+
+
+def _remove_part(upload_file):
+    try:
+        os.remove(part_path(upload_file))
+    except FileNotFoundError:
+        pass
+
+
+def purge_expired():
+    """Drop expired uploads and the parts of their unfinished files"""
+    expired = Upload.objects.filter(expires_at__lte=timezone.now())
+    for upload_file in UploadFile.objects.filter(upload__in=expired, state=UploadFile.UPLOADING):
+        _remove_part(upload_file)
+    expired.delete()
+
+
+def _file_spec(spec):
+    if not isinstance(spec, dict):
+        raise UploadError(400, "Each file needs a filename, size and sha256")
+    filename, size, sha256 = spec.get('filename'), spec.get('size'), spec.get('sha256')
+    if not isinstance(filename, str) or not filename.strip():
+        raise UploadError(400, "Each file needs a filename")
+    filename = os.path.basename(filename.strip())[:255]
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        raise UploadError(400, f"'{filename}' needs a positive size")
+    if size > settings.CV_UPLOAD_MAX_FILE_SIZE:
+        raise UploadError(413, f"'{filename}' is larger than {settings.CV_UPLOAD_MAX_FILE_SIZE} bytes")
+    if not isinstance(sha256, str) or not SHA256_PATTERN.match(sha256.lower()):
+        raise UploadError(400, f"'{filename}' needs its SHA-256 as 64 hex digits")
+    return UploadFile(filename=filename, size=size, sha256=sha256.lower())
+
+
+def create(files):
+    """Start an upload of the described files"""
+    purge_expired()
+    if not isinstance(files, list) or not files:
+        raise UploadError(400, "Expected a non-empty 'files' list")
+    upload_files = [_file_spec(spec) for spec in files]
+    with transaction.atomic():
+        upload = Upload.objects.create(
+            job=IngestJob.objects.create(),
+            expires_at=timezone.now() + timedelta(seconds=settings.CV_UPLOAD_TTL),
+        )
+        for upload_file in upload_files:
+            upload_file.upload = upload
+        UploadFile.objects.bulk_create(upload_files)
+    return upload
+
+
+def get(upload_id):
+    """The unexpired upload with this id, or None"""
+    return Upload.objects.filter(pk=upload_id, expires_at__gt=timezone.now()).first()
+
+
+def get_file(upload_id, file_id):
+    """The file of an unexpired upload, or None"""
+    return UploadFile.objects.select_related('upload').filter(
+        pk=file_id, upload_id=upload_id, upload__expires_at__gt=timezone.now()
+    ).first()
+
+
+def file_status(upload_file):
+    args = [upload_file.upload_id, upload_file.pk]
+    return {
+        'file_id': upload_file.pk,
+        'filename': upload_file.filename,
+        'size': upload_file.size,
+        'received': upload_file.received,
+        'state': upload_file.state,
+        'error': upload_file.error,
+        'cv_id': upload_file.cv_id,
+        'chunk_url': reverse('upload_chunk', args=args),
+        'finalize_url': reverse('upload_finalize', args=args),
+    }
+
+
+def status(upload):
+    return {
+        'upload_id': str(upload.pk),
+        'job_id': upload.job_id,
+        'status_url': reverse('job_status', args=[upload.job_id]),
+        'chunk_size': settings.CV_UPLOAD_CHUNK_SIZE,
+        'expires_at': upload.expires_at.isoformat(),
+        'files': [file_status(upload_file) for upload_file in upload.files.order_by('id')],
+    }
+
+
+def _locked_part(upload_file):
+    """Open the file's part for appending, holding its lock until closed
+
+    Chunks and finalize for one file may arrive on different workers; the
+    lock makes them take turns, and the state is re-read once it is held.
+    """
+    os.makedirs(settings.CV_UPLOAD_PARTS_DIR, exist_ok=True)
+    part = open(part_path(upload_file), 'ab')
+    fcntl.flock(part, fcntl.LOCK_EX)
+    upload_file.refresh_from_db(fields=['received', 'state', 'error', 'cv'])
+    return part
+
+
+def _check_uploading(upload_file):
+    if upload_file.state == UploadFile.COMPLETE:
+        raise UploadError(409, "File is already finalized", cv_id=upload_file.cv_id)
+    if upload_file.state == UploadFile.FAILED:
+        raise UploadError(409, upload_file.error)
+
+
+def write_chunk(upload_file, offset, stream, length):
+    """Store length bytes read from stream, which must start at offset: the end of the data so far
+
+    A chunk cut short by a dropped connection keeps the bytes that did
+    arrive; the client resumes from the new received offset.
+    """
+    _check_uploading(upload_file)
+    if length > settings.CV_UPLOAD_CHUNK_SIZE:
+        raise UploadError(413, f"Chunks can be at most {settings.CV_UPLOAD_CHUNK_SIZE} bytes")
+    with _locked_part(upload_file) as part:
+        _check_uploading(upload_file)
+        if offset != upload_file.received:
+            raise UploadError(409, f"Expected a chunk at offset {upload_file.received}", received=upload_file.received)
+        if offset + length > upload_file.size:
+            raise UploadError(400, f"Chunk goes past the file's declared {upload_file.size} bytes")
+        # Drop any tail left by a request that died before recording its bytes
+        part.truncate(offset)
+        remaining = length
+        while remaining:
+            data = stream.read(min(remaining, READ_SIZE))
+            if not data:
+                break
+            part.write(data)
+            remaining -= len(data)
+        part.flush()
+        upload_file.received = offset + length - remaining
+        upload_file.save(update_fields=['received'])
+    return upload_file
+
+
+def _fail(upload_file, status, message):
+    upload_file.state = UploadFile.FAILED
+    upload_file.error = message
+    upload_file.save(update_fields=['state', 'error'])
+    _remove_part(upload_file)
+    raise UploadError(status, message)
+
+
+def finalize(upload_file):
+    """Verify a fully received file, store it as a CV and queue it on the upload's job
+
+    Finalizing a file again returns it as it is.
+    """
+    if upload_file.state == UploadFile.COMPLETE:
+        return upload_file
+    _check_uploading(upload_file)
+    with _locked_part(upload_file) as part:
+        if upload_file.state == UploadFile.COMPLETE:
+            return upload_file
+        _check_uploading(upload_file)
+        if upload_file.received != upload_file.size:
+            raise UploadError(409, f"Only {upload_file.received} of {upload_file.size} bytes received",
+                              received=upload_file.received)
+        path = part_path(upload_file)
+        with open(path, 'rb') as f:
+            content_hash = hash_file(File(f))
+        if content_hash != upload_file.sha256:
+            # Which chunk went wrong is unknown, so the whole file is sent again
+            part.truncate(0)
+            upload_file.received = 0
+            upload_file.save(update_fields=['received'])
+            raise UploadError(422, "Checksum mismatch; upload the file again", received=0)
+        file_format = detect_format(path)
+        if file_format is None:
+            _fail(upload_file, 415, f"'{upload_file.filename}' is not a PDF or DOCX file")
+        # Extraction goes by extension, so the stored name follows the detected format
+        name = f"{os.path.splitext(upload_file.filename)[0]}.{file_format}"
+        with open(path, 'rb') as f:
+            cv = CV.objects.create(filename=upload_file.filename, file=File(f, name=name), content_hash=content_hash)
+        upload_file.cv = cv
+        upload_file.state = UploadFile.COMPLETE
+        upload_file.save(update_fields=['cv', 'state'])
+        _remove_part(upload_file)
+    submit_job([cv], job=upload_file.upload.job)
+    return upload_file
@@ -0,0 +1,93 @@
+import re
+from datetime import datetime
+
+YEAR_RANGE_PATTERN = re.compile(r'(\d{4})\s*-\s*(current|\d{4})', re.IGNORECASE)
+
+UNKNOWN_DEGREE, ASSOCIATE, BACHELOR, MASTER, DOCTORATE = range(5)
+DEGREE_CHOICES = [
+    (UNKNOWN_DEGREE, 'Unknown'),
+    (ASSOCIATE, 'Associate'),
+    (BACHELOR, 'Bachelor’s'),
+    (MASTER, 'Master’s'),
+    (DOCTORATE, 'Doctorate'),
+]
+DEGREE_NAMES = dict(DEGREE_CHOICES)
+# Bare MS/MA/BS/BA also mean "MS SQL", "BA" (business analyst) or a state
+# code, so anywhere in the text they only count dotted ("M.S.") or
+# followed by "in", "of" or "degree"
+SHORT_DEGREE = r'{0}\.\s?[sa]\b|{0}[sa](?=\s+(?:in|of|degree)\b)'
+# Checked from the highest level down
+DEGREE_PATTERNS = [
+    (DOCTORATE, re.compile(r'\b(ph\.?\s?d|doctor(ate)?|d\.?phil)\b', re.IGNORECASE)),
+    (MASTER, re.compile(rf'\b(master|m\.?sc|mba|m\.?tech|m\.?eng)\b|\b(?:{SHORT_DEGREE.format("m")})', re.IGNORECASE)),
+    (BACHELOR, re.compile(rf'\b(bachelor|b\.?sc|b\.?tech|b\.?eng)\b|\b(?:{SHORT_DEGREE.format("b")})', re.IGNORECASE)),
+    (ASSOCIATE, re.compile(r'\b(associate|diploma)\b', re.IGNORECASE)),
+]
+# An education entry may also start with the bare abbreviation ("BS Computer Science"), unless it names a product
+LEADING_SHORT_DEGREE = re.compile(
+    r'^\W*(?P<level>[mb])[sa]\b(?!\s+(?:sql|office|excel|word|access|project|teams|dynamics|azure|windows|visio|dos)\b)',
+    re.IGNORECASE,
+)
+
+
+def experience_intervals(work_experience, current_year=None):
+    """One {start, end, current, role} dict per work experience line with a year range"""
+    current_year = current_year or datetime.now().year
+    intervals = []
+    for exp in work_experience:
+        match = YEAR_RANGE_PATTERN.search(exp)
+        if match:
+            ongoing = match.group(2).lower() == 'current'
+            start = int(match.group(1))
+            end = current_year if ongoing else int(match.group(2))
+            intervals.append({'start': start, 'end': end, 'current': ongoing, 'role': exp})
+    return intervals
+
+
+def total_experience_years(intervals):
+    """Years covered by the intervals, counting overlapping roles once"""
+    total = 0
+    merged_start = merged_end = None
+    for interval in sorted(intervals, key=lambda i: i['start']):
+        start, end = interval['start'], max(interval['start'], interval['end'])
+        if merged_end is None or start > merged_end:
+            if merged_end is not None:
+                total += merged_end - merged_start
+            merged_start, merged_end = start, end
+        else:
+            merged_end = max(merged_end, end)
+    if merged_end is not None:
+        total += merged_end - merged_start
+    return total
+
+
+def degree_level(text, education=False):
+    """Highest degree named in text; education=True for an entry of the education section"""
+    for level, pattern in DEGREE_PATTERNS:
+        if pattern.search(text):
+            return level
+    if education:
+        match = LEADING_SHORT_DEGREE.match(text)
+        if match:
+            return MASTER if match.group('level').lower() == 'm' else BACHELOR
+    return UNKNOWN_DEGREE
+
+
+def highest_degree_level(education):
+    return max((degree_level(edu, education=True) for edu in education), default=UNKNOWN_DEGREE)
+
+
+def compute_facts(work_experience, education):
+    """Derived, queryable facts stored alongside each CVData
+
+    Years for ongoing ("current") roles are counted up to the year they are
+    computed, kept as experience_until so candidates.refresh_ongoing_experience
+    can recount them once that year has passed.
+    """
+    intervals = experience_intervals(work_experience)
+    return {
+        'experience_years': total_experience_years(intervals),
+        'experience_intervals': intervals,
+        'experience_until': max((i['end'] for i in intervals if i['current']), default=None),
+        'highest_degree': highest_degree_level(education),
+    }
@@ -1,100 +1,215 @@
-import PyPDF2
-import docx
-import pytesseract
-from PIL import Image
-import io
 import os
-from pdf2image import convert_from_path
-import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .metrics import STAGE_SECONDS, OCR_FALLBACKS, TimedIterator
+from .sections import SectionClassifier
+from .models import CVText
+
+# The extraction libraries (PyPDF2, pdf2image, lxml, the OCR backend) are
+# imported by the methods that use them, so processes that only parse or
+# serve the chatbot never load them. See preload().
+
+# Bump whenever parse_text (or the text extracted for it) changes so cached parses are redone
+PARSER_VERSION = 3
+
+_processor = None
+_processor_lock = threading.Lock()
+
+
+def get_processor():
+    """The process-wide CVProcessor with the configured settings, created on first use
+
+    A CVProcessor holds no per-document state, so threads can share it.
+    """
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            _processor = CVProcessor()
+        return _processor
+
 
 class CVProcessor:
-    def __init__(self):
-        pytesseract.pytesseract.tesseract_cmd = '/opt/homebrew/bin/tesseract'
+    def __init__(self, ocr_workers=None, min_page_chars=None, ocr_dpi=None, classifier=None, ocr_backend=None):
+        self.ocr_backend = ocr_backend
+        self.ocr_workers = ocr_workers or settings.CV_OCR_WORKERS
+        self.ocr_dpi = ocr_dpi or settings.CV_OCR_DPI
+        self.min_page_chars = min_page_chars if min_page_chars is not None else settings.CV_OCR_MIN_PAGE_CHARS
+        self.classifier = classifier or SectionClassifier()
+        # Parallel pages already use every core; stop each tesseract from also spawning OpenMP threads
+        os.environ.setdefault('OMP_THREAD_LIMIT', '1')
+
+    def preload(self):
+        """Import the extraction libraries and load the OCR models now rather than on the first document"""
+        import PyPDF2  # noqa: F401
+        import pdf2image  # noqa: F401
+        from . import docx_text  # noqa: F401
+        return self.ocr_backend or self._ocr_backend()
 
-    def read_pdf(self, file_path):
-        text = ""
-        # Try PyPDF2 first
+    def _ocr_backend(self):
+        from . import ocr
+        return ocr.get_backend()
+
+    def read_pdf(self, file_path, on_stage=None):
+        return "".join(page_text + "\n" for page_text in self.iter_pdf_pages(file_path, on_stage=on_stage) if page_text)
+
+    def iter_pdf_pages(self, file_path, on_stage=None):
+        """Yield the text of each page in order, OCRing pages that have no usable text layer
+
+        At most ocr_workers pages are rasterized at a time, so memory stays
+        bounded by that window rather than by the document length.
+        """
+        for page_text, _ in self._iter_pdf_pages(file_path, on_stage=on_stage):
+            yield page_text
+
+    def _iter_pdf_pages(self, file_path, on_stage=None):
+        # (text, whether it was OCRed) for each page; pending holds text-layer strings
+        # and (OCR future, the page's short text layer) pairs
+        pending = deque()
+        ocr_started = False
+        with ThreadPoolExecutor(max_workers=self.ocr_workers) as executor:
+            for number, page_text in enumerate(self._iter_text_layer(file_path)):
+                # Fallback to OCR only for pages with no or minimal text
+                if len(page_text.strip()) < self.min_page_chars:
+                    OCR_FALLBACKS.inc()
+                    if not ocr_started:
+                        print("Falling back to OCR with Tesseract")
+                        ocr_started = True
+                        if on_stage:
+                            on_stage('ocr')
+                    # pdftoppm and tesseract run as subprocesses, so threads are enough to use every core
+                    pending.append((executor.submit(self.ocr_page, file_path, number), page_text))
+                else:
+                    pending.append(page_text)
+                while pending and (isinstance(pending[0], str) or len(pending) > self.ocr_workers):
+                    yield self._page_result(pending.popleft())
+            while pending:
+                yield self._page_result(pending.popleft())
+
+    def _iter_text_layer(self, file_path):
+        import PyPDF2
+        from pdf2image import pdfinfo_from_path
+        # Try PyPDF2 first, one page at a time
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    extracted = page.extract_text()
-                    if extracted:
-                        text += extracted + "\n"
-            print("PyPDF2 Extracted Text:", text if text.strip() else "None")
-        except Exception as e:
+            file = open(file_path, 'rb')
+        except OSError as e:
             print(f"PyPDF2 Error: {e}")
-
-        # Fallback to OCR if no text or minimal
-        
-        if not text.strip() or len(text) < 50:
-            print("Falling back to OCR with Tesseract")
+            return
+        with file:
             try:
-                images = convert_from_path(file_path)
-                for image in images:
-                    ocr_text = pytesseract.image_to_string(image)
-                    text += ocr_text + "\n"
-                print("OCR Extracted Text:", text)
+                pages = PyPDF2.PdfReader(file).pages
+                page_count = len(pages)
             except Exception as e:
-                print(f"OCR Error: {e}. Check Poppler and Tesseract installation.")
-                return ""  
-        return text
+                print(f"PyPDF2 Error: {e}")
+                # No readable text layer at all, so every page needs OCR
+                try:
+                    page_count = pdfinfo_from_path(file_path)['Pages']
+                except Exception as e:
+                    print(f"OCR Error: {e}. Check Poppler and Tesseract installation.")
+                    return
+                yield from [""] * page_count
+                return
+            for page in pages:
+                try:
+                    with STAGE_SECONDS.time(stage='pdf_text'):
+                        page_text = page.extract_text() or ""
+                except Exception as e:
+                    print(f"PyPDF2 Error: {e}")
+                    page_text = ""
+                yield page_text
+
+    def _page_result(self, page):
+        """(text, whether it was OCRed) for a pending page
+
+        A short text layer is still text: it is kept when OCR fails or reads less.
+        """
+        if isinstance(page, str):
+            return page, False
+        future, text_layer = page
+        try:
+            ocr_text = future.result()
+        except Exception as e:
+            print(f"OCR Error: {e}. Check Poppler and Tesseract installation.")
+            return text_layer, False
+        if len(ocr_text.strip()) < len(text_layer.strip()):
+            return text_layer, False
+        return ocr_text, True
+
+    def ocr_page(self, file_path, page_number):
+        """Rasterize and OCR a single zero-based page"""
+        from pdf2image import convert_from_path
+        with STAGE_SECONDS.time(stage='rasterize'):
+            images = convert_from_path(file_path, dpi=self.ocr_dpi, first_page=page_number + 1, last_page=page_number + 1)
+        backend = self.ocr_backend or self._ocr_backend()
+        with STAGE_SECONDS.time(stage='ocr'):
+            return backend.image_to_string(images[0])
 
     def read_docx(self, file_path):
+        from .docx_text import read_docx_text
         try:
-            doc = docx.Document(file_path)
-            text = "\n".join([para.text for para in doc.paragraphs])
-            print("DOCX Extracted Text:", text)
+            with STAGE_SECONDS.time(stage='docx_text'):
+                # Streamed from the XML, including tables, headers, footers and text boxes
+                text = read_docx_text(file_path)
+            if settings.CV_DEBUG_DUMPS:
+                print("DOCX Extracted Text:", text)
             return text
         except Exception as e:
             print(f"DOCX Error: {e}")
             return ""
 
-    def process_file(self, file_path):
+    def iter_text(self, file_path, on_stage=None):
+        """Yield the document's text in chunks (one per page for PDFs)"""
+        if file_path.endswith('.pdf'):
+            yield from self.iter_pdf_pages(file_path, on_stage=on_stage)
+        elif file_path.endswith('.docx'):
+            yield self.read_docx(file_path)
+        else:
+            raise ValueError("Unsupported file format")
+
+    def extract_pages(self, file_path, on_stage=None):
+        """(text of each page, CVText extraction method); a DOCX is a single page"""
         if file_path.endswith('.pdf'):
-            text = self.read_pdf(file_path)
+            pages, ocred = [], 0
+            for page_text, was_ocred in self._iter_pdf_pages(file_path, on_stage=on_stage):
+                pages.append(page_text)
+                ocred += was_ocred
+            if not ocred:
+                method = CVText.PDF_TEXT
+            else:
+                method = CVText.OCR if ocred == len(pages) else CVText.PDF_MIXED
         elif file_path.endswith('.docx'):
-            text = self.read_docx(file_path)
+            pages, method = [self.read_docx(file_path)], CVText.DOCX
         else:
             raise ValueError("Unsupported file format")
+        if settings.CV_DEBUG_DUMPS:
+            print("Final Extracted Text:", CVText.join(pages))
+        return pages, method
+
+    def extract_text(self, file_path, on_stage=None):
+        return CVText.join(self.extract_pages(file_path, on_stage=on_stage)[0])
+
+    def process_file(self, file_path, on_stage=None):
+        # Lines are parsed as each page arrives; the full text is never assembled
+        chunks = TimedIterator(self.iter_text(file_path, on_stage=on_stage))
+        start = time.perf_counter()
+        cv_data = self.parse_lines(line for chunk in chunks for line in chunk.split('\n'))
+        # Time spent waiting on extraction is already recorded by its own stages
+        STAGE_SECONDS.observe(time.perf_counter() - start - chunks.elapsed, stage='parse')
+        return cv_data
+
+    def parse_text(self, text):
+        with STAGE_SECONDS.time(stage='parse'):
+            return self.parse_lines(text.split('\n'))
+
+    def parse_lines(self, lines):
+        cv_data = self.classifier.parse_lines(lines)
+        if settings.CV_DEBUG_DUMPS:
+            print("Parsed CV Data:", cv_data)
+        return cv_data
 
-        print("Final Extracted Text:", text)
-        lines = text.split('\n')
-        cv_data = {
-            'personal_info': {},
-            'education': [],
-            'work_experience': [],
-            'skills': [],
-            'projects': [],
-            'certifications': []
-        }
-        current_section = None
-
-        email_pattern = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
-        phone_pattern = re.compile(r'\(\d{3}\)\s*\d{3}-\d{4}')
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            if 'education' in line.lower():
-                current_section = 'education'
-            elif 'experience' in line.lower():
-                current_section = 'work_experience'
-            elif 'skills' in line.lower():
-                current_section = 'skills'
-            elif 'projects' in line.lower():
-                current_section = 'projects'
-            elif 'certifications' in line.lower():
-                current_section = 'certifications'
-            elif email_pattern.search(line):
-                cv_data['personal_info']['Email'] = line.split('$')[0].strip()
-            elif phone_pattern.search(line):
-                cv_data['personal_info']['Phone'] = line.split('$')[0].strip()
-            elif not current_section and len(line.split()) <= 3 and not any(c.isdigit() for c in line):
-                cv_data['personal_info']['Name'] = line
-            elif current_section:
-                cv_data[current_section].append(line)
-
-        print("Parsed CV Data:", cv_data)
-        return cv_data
\ No newline at end of file
+    def parse_many(self, texts):
+        """Parse a batch of extracted texts with one compiled classifier"""
+        with STAGE_SECONDS.time(stage='parse_batch'):
+            return [self.parse_lines(text.split('\n')) for text in texts]
@@ -0,0 +1,128 @@
+"""Stream the text of a .docx straight from its XML parts
+
+python-docx builds an object model of the whole package and only exposes
+body paragraphs, while many CVs keep skills and job history in tables or
+text boxes. This reads word/document.xml (and the header and footer parts)
+with lxml's iterparse, filtered in C to the handful of tags that matter,
+and emits one line per paragraph in document order. Elements are cleared as
+soon as they are read, so memory stays flat however long the document is.
+
+Tables: a row whose cells hold one paragraph each becomes one line with the
+cells joined by " | " ("Python | 5 years"); otherwise, as in a two-column
+layout table, each cell's paragraphs are emitted in turn. Text boxes are
+emitted where they are anchored; the VML fallback copy Word stores next to
+each modern text box is skipped.
+"""
+import re
+import zipfile
+from lxml import etree
+
+W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+P, T, TAB, BR, CR = W + 'p', W + 't', W + 'tab', W + 'br', W + 'cr'
+TBL, TR, TC, TXBX = W + 'tbl', W + 'tr', W + 'tc', W + 'txbxContent'
+TAGS = (P, T, TAB, BR, CR, TBL, TR, TC, TXBX, MC_FALLBACK)
+DOCUMENT_PART = 'word/document.xml'
+HEADER_PART = re.compile(r'word/header\d*\.xml$')
+FOOTER_PART = re.compile(r'word/footer\d*\.xml$')
+CELL_SEPARATOR = ' | '
+
+
+def _row_lines(cells):
+    if all(len(cell) <= 1 for cell in cells):
+        line = CELL_SEPARATOR.join(cell[0] for cell in cells if cell)
+        return [line] if line else []
+    return [line for cell in cells for line in cell]
+
+
+def iter_part_lines(stream):
+    """Yield the non-empty lines of one WordprocessingML part in reading order"""
+    paragraphs = []  # Text fragments of each open paragraph; text boxes nest inside paragraphs
+    containers = []  # Open table cells (lists of lines) and text boxes (None)
+    rows = []  # Cells of the open row of each open table
+    skipping = 0
+    pending = []
+
+    def emit(line):
+        if containers and containers[-1] is not None:
+            containers[-1].append(line)
+        else:
+            pending.append(line)
+
+    for event, element in etree.iterparse(stream, events=('start', 'end'), tag=TAGS, resolve_entities=False):
+        tag = element.tag
+        if event == 'start':
+            if tag == P:
+                paragraphs.append([])
+            elif tag == TC:
+                containers.append([])
+            elif tag == TXBX:
+                containers.append(None)
+            elif tag == TR:
+                rows.append([])
+            elif tag == MC_FALLBACK:
+                skipping += 1
+            continue
+
+        if tag == T:
+            if paragraphs and not skipping:
+                paragraphs[-1].append(element.text or '')
+        elif tag == TAB:
+            if paragraphs and not skipping:
+                paragraphs[-1].append('\t')
+        elif tag in (BR, CR):
+            if paragraphs and not skipping:
+                paragraphs[-1].append('\n')
+        elif tag == P:
+            fragments = paragraphs.pop()
+            if not skipping:
+                for line in ''.join(fragments).split('\n'):
+                    line = line.strip()
+                    if line:
+                        emit(line)
+            element.clear(keep_tail=True)
+        elif tag == TC:
+            cell = containers.pop()
+            rows[-1].append(cell)
+        elif tag == TXBX:
+            containers.pop()
+        elif tag == TR:
+            for line in _row_lines(rows.pop()):
+                emit(line)
+        elif tag == TBL:
+            element.clear(keep_tail=True)
+        elif tag == MC_FALLBACK:
+            skipping -= 1
+
+        if pending and not paragraphs:
+            yield from pending
+            pending.clear()
+        # Drop body-level elements already read, including their tails
+        if tag in (P, TBL) and len(paragraphs) == 0 and not containers:
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    yield from pending
+
+
+def iter_docx_lines(file_path):
+    """Lines of a .docx: its headers, the document body, then its footers"""
+    with zipfile.ZipFile(file_path) as package:
+        names = package.namelist()
+        if DOCUMENT_PART not in names:
+            raise ValueError(f"{file_path} has no {DOCUMENT_PART}")
+        headers = sorted(name for name in names if HEADER_PART.match(name))
+        footers = sorted(name for name in names if FOOTER_PART.match(name))
+        seen = set()
+        for name in headers + [DOCUMENT_PART] + footers:
+            with package.open(name) as stream:
+                for line in iter_part_lines(stream):
+                    # First-page and default headers usually repeat each other
+                    if name != DOCUMENT_PART:
+                        if line in seen:
+                            continue
+                        seen.add(line)
+                    yield line
+
+
+def read_docx_text(file_path):
+    return "\n".join(iter_docx_lines(file_path))
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .models import CVText, ExtractionCache
+from .cv_processor import PARSER_VERSION
+
+
+def lookup(content_hash):
+    """Return the cached parse for a file hash if it was made by the current parser"""
+    if not content_hash:
+        return None
+    entry = ExtractionCache.objects.filter(content_hash=content_hash, parser_version=PARSER_VERSION).first()
+    if entry:
+        # Touch last_used_at so eviction stays least-recently-used
+        ExtractionCache.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    return entry
+
+
+def store(content_hash, cv_data, raw_text):
+    if not content_hash or not raw_text.strip():
+        # Empty text usually means OCR was unavailable; don't pin that result
+        return
+    ExtractionCache.objects.update_or_create(
+        content_hash=content_hash,
+        defaults={'parser_version': PARSER_VERSION, 'cv_data': cv_data, 'raw_text': raw_text},
+    )
+    evict()
+
+
+def store_many(entries):
+    """Bulk store (content_hash, cv_data, raw_text) tuples; existing hashes are left alone"""
+    ExtractionCache.objects.bulk_create([
+        ExtractionCache(content_hash=content_hash, parser_version=PARSER_VERSION, cv_data=cv_data, raw_text=raw_text)
+        for content_hash, cv_data, raw_text in entries
+        if content_hash and raw_text.strip()
+    ], ignore_conflicts=True)
+    evict()
+
+
+def evict(max_entries=None):
+    """Drop least recently used entries beyond the configured size bound"""
+    max_entries = settings.CV_EXTRACTION_CACHE_SIZE if max_entries is None else max_entries
+    stale = ExtractionCache.objects.order_by('-last_used_at').values_list('pk', flat=True)[max_entries:]
+    stale_ids = list(stale)
+    if stale_ids:
+        ExtractionCache.objects.filter(pk__in=stale_ids).delete()
+
+
+def stored_pages(content_hash, raw_text=None):
+    """(pages, method) already extracted from a file with this hash, or None
+
+    Taken from another CV's CVText, else from raw_text (the cached text) as
+    a single page of unknown method.
+    """
+    if content_hash:
+        text = CVText.objects.filter(cv__content_hash=content_hash).values_list('pages', 'method').first()
+        if text:
+            return text
+    if raw_text:
+        return [raw_text], CVText.UNKNOWN
+    return None
+
+
+def stored_text(content_hash):
+    """(pages, method) kept from any earlier extraction of a file with this hash, or None
+
+    Files parsed by an older parser still have their raw text stored, so
+    only the parsing stage is redone for them; extraction and OCR are skipped.
+    """
+    stale = ExtractionCache.objects.filter(content_hash=content_hash).only('raw_text').first() if content_hash else None
+    return stored_pages(content_hash, stale.raw_text if stale else None)
@@ -0,0 +1,179 @@
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import CVData, CVText, IngestJob, IngestFile
+from .cv_processor import PARSER_VERSION, get_processor
+from . import extraction_cache, metrics, worker
+from .metrics import STAGE_SECONDS
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the shared ingestion pool, starting it on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned (not forked) workers never inherit the parent's DB connections
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.CV_INGEST_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=worker.init_worker,
+            )
+        return _executor
+
+
+def submit_job(cvs, job=None):
+    """Queue the given CV rows for extraction and return their IngestJob, a new one unless given"""
+    job = job or IngestJob.objects.create()
+    ids = []
+    for cv in cvs:
+        ingest_file = IngestFile.objects.create(job=job, cv=cv)
+        # Files seen before are resolved right away without touching the pool
+        entry = extraction_cache.lookup(cv.content_hash)
+        if entry:
+            with STAGE_SECONDS.time(stage='db_write'):
+                store_cv_data(cv, entry.cv_data, *extraction_cache.stored_pages(cv.content_hash, entry.raw_text))
+            ingest_file.cache_hit = True
+            ingest_file.save(update_fields=['cache_hit'])
+            _set_state(ingest_file, IngestFile.PARSED)
+        else:
+            ids.append(ingest_file.id)
+    # Workers run in other processes, so only hand over rows they can already see
+    transaction.on_commit(lambda: _dispatch(ids))
+    return job
+
+
+def store_cv_data(cv, cv_data, pages, method):
+    """Save a CV's extracted text and its parse by the current parser"""
+    # The text goes first, so the full-text index sees it when CVData is saved
+    CVText.objects.update_or_create(cv=cv, defaults={'pages': pages, 'method': method})
+    return CVData.objects.create(cv=cv, parser_version=PARSER_VERSION, **cv_data)
+
+
+def _dispatch(ingest_file_ids):
+    if not ingest_file_ids:
+        return
+    if settings.CV_INGEST_EAGER:
+        for ingest_file_id in ingest_file_ids:
+            process_ingest_file(ingest_file_id)
+        return
+    executor = get_executor()
+    for ingest_file in IngestFile.objects.select_related('cv').filter(pk__in=ingest_file_ids).order_by('id'):
+        stored = extraction_cache.stored_text(ingest_file.cv.content_hash)
+        future = executor.submit(worker.run_ingest_file, ingest_file.cv.file.path, stored)
+        future.add_done_callback(functools.partial(_finished, ingest_file.pk))
+
+
+def _finished(ingest_file_id, future):
+    """Store what a worker extracted; called in this process as each file completes
+
+    Workers never write to the database: SQLite takes one writer at a time,
+    and workers storing their own results failed files with "database is
+    locked". Their stage changes are recorded here too, with the times they
+    happened at.
+    """
+    if future.cancelled():
+        result = {'error': 'Cancelled before it was processed', 'stages': []}
+    else:
+        try:
+            result = future.result()
+        except Exception as e:
+            # The worker process died, e.g. the pool broke
+            result = {'error': str(e), 'stages': []}
+    metrics.merge(result.get('metrics'))
+    ingest_file = IngestFile.objects.select_related('cv').get(pk=ingest_file_id)
+    for state, at in result['stages']:
+        _set_state(ingest_file, state, at=at)
+    if 'error' in result:
+        _set_state(ingest_file, IngestFile.FAILED, error=result['error'])
+        return
+    try:
+        _store_result(ingest_file, result['cv_data'], result['pages'], result['method'])
+    except Exception as e:
+        _set_state(ingest_file, IngestFile.FAILED, error=str(e))
+        return
+    _set_state(ingest_file, IngestFile.PARSED)
+
+
+def _set_state(ingest_file, state, error='', at=None):
+    now = at or timezone.now()
+    ingest_file.state = state
+    ingest_file.timings[state] = round((now - ingest_file.queued_at).total_seconds(), 3)
+    fields = ['state', 'timings']
+    if state == IngestFile.EXTRACTING:
+        ingest_file.started_at = now
+        fields.append('started_at')
+    elif state in (IngestFile.PARSED, IngestFile.FAILED):
+        ingest_file.finished_at = now
+        ingest_file.error = error
+        fields += ['finished_at', 'error']
+    ingest_file.save(update_fields=fields)
+
+
+def extract_file(file_path, stored=None, on_stage=None):
+    """(cv_data, pages, method) for a file, parsed from its stored (pages, method) when given
+
+    Touches no database, so ingestion workers run it as is.
+    """
+    processor = get_processor()
+    pages, method = stored if stored else processor.extract_pages(file_path, on_stage=on_stage)
+    return processor.parse_text(CVText.join(pages)), pages, method
+
+
+def _store_result(ingest_file, cv_data, pages, method):
+    with STAGE_SECONDS.time(stage='db_write'):
+        extraction_cache.store(ingest_file.cv.content_hash, cv_data, CVText.join(pages))
+        store_cv_data(ingest_file.cv, cv_data, pages, method)
+
+
+def process_ingest_file(ingest_file_id):
+    """Extract one queued CV in this process and store its CVData, recording progress as it goes"""
+    ingest_file = IngestFile.objects.select_related('cv').get(pk=ingest_file_id)
+    _set_state(ingest_file, IngestFile.EXTRACTING)
+    try:
+        cv_data, pages, method = extract_file(
+            ingest_file.cv.file.path,
+            extraction_cache.stored_text(ingest_file.cv.content_hash),
+            on_stage=lambda state: _set_state(ingest_file, state),
+        )
+        _store_result(ingest_file, cv_data, pages, method)
+    except Exception as e:
+        _set_state(ingest_file, IngestFile.FAILED, error=str(e))
+        return
+    _set_state(ingest_file, IngestFile.PARSED)
+
+
+def job_status(job):
+    """Serialize an IngestJob and its per-file progress for the status endpoint"""
+    files = []
+    counts = {state: 0 for state, _ in IngestFile.STATE_CHOICES}
+    for ingest_file in job.files.select_related('cv').order_by('id'):
+        counts[ingest_file.state] += 1
+        elapsed = None
+        if ingest_file.started_at and ingest_file.finished_at:
+            elapsed = round((ingest_file.finished_at - ingest_file.started_at).total_seconds(), 3)
+        files.append({
+            'cv_id': ingest_file.cv_id,
+            'filename': ingest_file.cv.filename,
+            'state': ingest_file.state,
+            'cache_hit': ingest_file.cache_hit,
+            'error': ingest_file.error,
+            'queued_at': ingest_file.queued_at.isoformat(),
+            'started_at': ingest_file.started_at.isoformat() if ingest_file.started_at else None,
+            'finished_at': ingest_file.finished_at.isoformat() if ingest_file.finished_at else None,
+            'processing_seconds': elapsed,
+            'timings': ingest_file.timings,
+        })
+    return {
+        'job_id': job.id,
+        'created_at': job.created_at.isoformat(),
+        'done': counts[IngestFile.PARSED] + counts[IngestFile.FAILED] == len(files),
+        'counts': counts,
+        'files': files,
+    }
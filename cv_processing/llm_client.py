@@ -0,0 +1,334 @@
+import asyncio
+import json
+import threading
+import time
+import weakref
+import httpx
+from django.conf import settings
+from .metrics import STAGE_SECONDS, LLM_RETRIES, LLM_REQUESTS, LLM_BATCH_SIZE
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after repeated failures and probe it again after a cool-down
+
+    closed: calls go through; failure_threshold consecutive failures open it.
+    open: calls are rejected until reset_timeout seconds have passed.
+    half-open: a single trial call decides whether to close or re-open.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def acquire(self):
+        """'call', 'trial' for the half-open probe, or None if the call must be rejected"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return 'call'
+            if state == 'half-open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return 'trial'
+            return None
+
+    def allow(self):
+        return self.acquire() is not None
+
+    def release(self):
+        """Free the trial after it ended without a verdict, so the next call probes again"""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+
+class _Batch:
+    def __init__(self, params):
+        self.params = params
+        self.inputs = []
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Send prompts arriving within window seconds of each other as one call with a list of inputs
+
+    The first caller of a batch waits out the window (or until max_size
+    prompts have joined), makes the call and hands each caller its own
+    element of the returned list. Only payloads whose other parameters are
+    identical share a batch.
+    """
+
+    def __init__(self, send, window, max_size):
+        self.send = send
+        self.window = window
+        self.max_size = max_size
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def submit(self, payload):
+        params = {key: value for key, value in payload.items() if key != 'inputs'}
+        key = json.dumps(params, sort_keys=True)
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch(params)
+            index = len(batch.inputs)
+            batch.inputs.append(payload['inputs'])
+            if len(batch.inputs) >= self.max_size:
+                del self._open[key]
+                batch.full.set()
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            self._flush(batch)
+        else:
+            batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+        return batch.results[index]
+
+    def _flush(self, batch):
+        LLM_BATCH_SIZE.observe(len(batch.inputs))
+        try:
+            if len(batch.inputs) == 1:
+                batch.results = [self.send({**batch.params, 'inputs': batch.inputs[0]})]
+            else:
+                results = self.send({**batch.params, 'inputs': batch.inputs})
+                if not isinstance(results, list) or len(results) != len(batch.inputs):
+                    raise ValueError(f"Expected {len(batch.inputs)} results for a batch, got {str(results)[:200]}")
+                # One element per prompt, shaped like the response to that prompt alone
+                batch.results = [result if isinstance(result, list) else [result] for result in results]
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+
+class LLMClient:
+    """Keep-alive HTTP client for the inference API with timeouts, bounded retries and a circuit breaker
+
+    The sync and async paths share one breaker. Each event loop gets its own
+    AsyncClient because httpx connections can't be shared between loops.
+    With a batch window, post_json and apost_json calls are micro-batched;
+    the backend must accept a list of inputs.
+    """
+
+    def __init__(self, api_url=None, headers=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, retry_backoff=None, breaker=None, batch_window=None, batch_size=None):
+        self.api_url = api_url or settings.CV_LLM_API_URL
+        self.headers = headers or {}
+        self.timeout = httpx.Timeout(
+            read_timeout or settings.CV_LLM_READ_TIMEOUT,
+            connect=connect_timeout or settings.CV_LLM_CONNECT_TIMEOUT,
+        )
+        self.max_retries = settings.CV_LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = settings.CV_LLM_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+        self.breaker = breaker or CircuitBreaker(settings.CV_LLM_BREAKER_THRESHOLD, settings.CV_LLM_BREAKER_RESET)
+        self.retries = 0
+        batch_window = settings.CV_LLM_BATCH_WINDOW if batch_window is None else batch_window
+        self.batcher = MicroBatcher(
+            self._post_json, batch_window, batch_size or settings.CV_LLM_BATCH_SIZE
+        ) if batch_window > 0 else None
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(headers=self.headers, timeout=self.timeout)
+            return self._client
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(headers=self.headers, timeout=self.timeout)
+                self._async_clients[loop] = client
+            return client
+
+    def _backoff(self, attempt):
+        return min(self.retry_backoff * (2 ** attempt), 5.0)
+
+    @staticmethod
+    def _should_retry(error):
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRY_STATUSES
+        return isinstance(error, httpx.TransportError)
+
+    def _check_breaker(self):
+        """Admit a call past the breaker; True if it is the half-open trial"""
+        admitted = self.breaker.acquire()
+        if admitted is None:
+            LLM_REQUESTS.inc(outcome='rejected')
+            raise CircuitOpenError(f"{self.api_url} is unhealthy, skipping call")
+        return admitted == 'trial'
+
+    def _retrying(self):
+        self.retries += 1
+        LLM_RETRIES.inc()
+
+    def _failed(self):
+        self.breaker.record_failure()
+        LLM_REQUESTS.inc(outcome='error')
+
+    def _succeeded(self):
+        self.breaker.record_success()
+        LLM_REQUESTS.inc(outcome='ok')
+
+    def _abandoned(self, trial):
+        # Cancelled or closed by the caller: no verdict on the upstream, but a trial mustn't stay in flight
+        if trial:
+            self.breaker.release()
+
+    def post_json(self, payload):
+        """POST payload and return the decoded JSON response"""
+        if self.batcher is not None:
+            return self.batcher.submit(payload)
+        return self._post_json(payload)
+
+    def _post_json(self, payload):
+        trial = self._check_breaker()
+        try:
+            with STAGE_SECONDS.time(stage='llm_call'):
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        response = self.client.post(self.api_url, json=payload)
+                        response.raise_for_status()
+                        result = response.json()
+                    except (httpx.HTTPError, ValueError) as e:
+                        if attempt < self.max_retries and self._should_retry(e):
+                            self._retrying()
+                            time.sleep(self._backoff(attempt))
+                            continue
+                        raise
+                    self._succeeded()
+                    return result
+        except Exception:
+            self._failed()
+            raise
+        except BaseException:
+            self._abandoned(trial)
+            raise
+
+    async def apost_json(self, payload):
+        """Async post_json; retries wait without blocking the event loop"""
+        if self.batcher is not None:
+            # Batches are gathered by threads, so sync and async callers can share them
+            return await asyncio.to_thread(self.batcher.submit, payload)
+        trial = self._check_breaker()
+        try:
+            client = self.async_client()
+            with STAGE_SECONDS.time(stage='llm_call'):
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        response = await client.post(self.api_url, json=payload)
+                        response.raise_for_status()
+                        result = response.json()
+                    except (httpx.HTTPError, ValueError) as e:
+                        if attempt < self.max_retries and self._should_retry(e):
+                            self._retrying()
+                            await asyncio.sleep(self._backoff(attempt))
+                            continue
+                        raise
+                    self._succeeded()
+                    return result
+        except Exception:
+            self._failed()
+            raise
+        except BaseException:
+            self._abandoned(trial)
+            raise
+
+    async def astream_tokens(self, payload):
+        """Yield generated text chunks from a server-sent-event streaming endpoint
+
+        Only the connection is retried; once tokens are flowing a failure is
+        raised to the caller, which has already forwarded part of the output.
+        Callers should close the generator when they stop early (aclosing), so
+        the breaker hears how the call ended.
+        """
+        trial = self._check_breaker()
+        streamed = False
+        try:
+            client = self.async_client()
+            with STAGE_SECONDS.time(stage='llm_call'):
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        async with client.stream('POST', self.api_url, json={**payload, 'stream': True}) as response:
+                            response.raise_for_status()
+                            async for line in response.aiter_lines():
+                                if not line.startswith('data:'):
+                                    continue
+                                data = line[len('data:'):].strip()
+                                if data == '[DONE]':
+                                    break
+                                token = json.loads(data).get('token') or {}
+                                if token.get('text') and not token.get('special'):
+                                    streamed = True
+                                    yield token['text']
+                    except (httpx.HTTPError, ValueError) as e:
+                        if not streamed and attempt < self.max_retries and self._should_retry(e):
+                            self._retrying()
+                            await asyncio.sleep(self._backoff(attempt))
+                            continue
+                        raise
+                    self._succeeded()
+                    return
+        except Exception:
+            self._failed()
+            raise
+        except BaseException:
+            # Closed by the caller (an SSE client went away) or cancelled; tokens had come, so the upstream is up
+            if streamed:
+                self._succeeded()
+            else:
+                self._abandoned(trial)
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
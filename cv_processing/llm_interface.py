@@ -1,58 +1,97 @@
-import requests
 import json
-import time
-import re
+import hashlib
+import threading
+from contextlib import aclosing
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from cv_analyzer.settings import HUGGINGFACE_API_KEY
-from datetime import datetime
+from .cv_facts import DEGREE_NAMES, compute_facts
+from .response_cache import ResponseCache
+from .llm_client import LLMClient, CircuitOpenError
+from .metrics import STAGE_SECONDS, PROMPT_TOKENS
+from .prompt_context import build_context
+from .single_flight import SingleFlight
+
+# Shared by every LLMInterface in the process
+llm_cache = ResponseCache(settings.CV_LLM_CACHE_SIZE, settings.CV_LLM_CACHE_TTL)
+# Concurrent identical analyses (same query and candidate set) share one API call
+llm_flights = SingleFlight()
+_llm_client = None
+_llm_client_lock = threading.Lock()
+_llm_interface = None
+_llm_interface_lock = threading.Lock()
+
+
+def get_llm_client():
+    """The process-wide keep-alive client for the Hugging Face API"""
+    global _llm_client
+    with _llm_client_lock:
+        if _llm_client is None:
+            _llm_client = LLMClient(headers={"Authorization": f"Bearer {HUGGINGFACE_API_KEY}"})
+        return _llm_client
+
+
+def get_llm_interface():
+    """The process-wide LLMInterface; it keeps no per-call state, so requests share it"""
+    global _llm_interface
+    with _llm_interface_lock:
+        if _llm_interface is None:
+            _llm_interface = LLMInterface()
+        return _llm_interface
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split()).rstrip('?.! ')
+
+
+def cv_set_key(cv_data, corpus_version):
+    """Identify the exact candidate set in cv_data; None when the corpus version is unknown"""
+    if corpus_version is None:
+        return None
+    ids = ','.join(cv_data['database'].keys())
+    return corpus_version, hashlib.sha1(ids.encode()).hexdigest()
 
 class LLMInterface:
-    def __init__(self):
-        # Hugging Face API setup 
-        self.api_url = "https://api-inference.huggingface.co/models/gpt2"
-        self.headers = {"Authorization": f"Bearer {HUGGINGFACE_API_KEY}"}
-        self.max_retries = 5
-        self.initial_delay = 2
-
-    def calculate_experience(self, cv_data):
+    def __init__(self, client=None):
+        # Hugging Face API setup; the pooled client is shared unless one is given
+        self.client = client or get_llm_client()
+
+    def calculate_experience(self, cv_data, cv_set=None):
         """Local calculation of years of experience"""
+        return self._cached('experience', cv_set, lambda: self._calculate_experience(cv_data))
+
+    def _calculate_experience(self, cv_data):
         experience_summary = {}
-        current_year = datetime.now().year
         
         for cv_id, data in cv_data['database'].items():
             name = data['personal_info'].get('Name', f'Candidate {cv_id}')
-            years = 0
-            details = []
-            for exp in data['work_experience']:
-                match = re.search(r'(\d{4})\s*-\s*(current|\d{4})', exp, re.IGNORECASE)
-                if match:
-                    start = int(match.group(1))
-                    end = current_year if match.group(2).lower() == 'current' else int(match.group(2))
-                    years += end - start
-                    details.append(exp)
-            experience_summary[name] = {"years": years, "details": details}
+            facts = data.get('facts') or compute_facts(data['work_experience'], data['education'])
+            details = [interval['role'] for interval in facts['experience_intervals']]
+            experience_summary[name] = {"years": facts['experience_years'], "details": details}
         
         return experience_summary
 
-    def compare_education(self, cv_data):
+    def compare_education(self, cv_data, cv_set=None):
         """Local comparison of education levels"""
+        return self._cached('education', cv_set, lambda: self._compare_education(cv_data))
+
+    def _compare_education(self, cv_data):
         education_summary = {}
         
         for cv_id, data in cv_data['database'].items():
             name = data['personal_info'].get('Name', f'Candidate {cv_id}')
-            highest_degree = "Unknown"
-            details = []
-            for edu in data['education']:
-                if "master" in edu.lower():
-                    highest_degree = "Master’s"
-                elif "bachelor" in edu.lower() and highest_degree != "Master’s":
-                    highest_degree = "Bachelor’s"
-                details.append(edu)
-            education_summary[name] = {"highest_degree": highest_degree, "details": details}
+            facts = data.get('facts') or compute_facts(data['work_experience'], data['education'])
+            highest_degree = DEGREE_NAMES[facts['highest_degree']]
+            education_summary[name] = {"highest_degree": highest_degree, "details": list(data['education'])}
         
         return education_summary
 
-    def compare_skills(self, cv_data):
+    def compare_skills(self, cv_data, cv_set=None):
         """Local comparison of skills"""
+        return self._cached('skills', cv_set, lambda: self._compare_skills(cv_data))
+
+    def _compare_skills(self, cv_data):
         skills_summary = {}
         
         for cv_id, data in cv_data['database'].items():
@@ -62,55 +101,143 @@ class LLMInterface:
         
         return skills_summary
 
-    def analyze_cv(self, cv_data):
+    def _cached(self, name, cv_set, compute):
+        if cv_set is None:
+            return compute()
+        return llm_cache.get_or_compute((name, cv_set), compute)
+
+    def analyze_cv(self, cv_data, corpus_version=None):
         query = cv_data.get('query', '').lower()
-        cv_data_str = json.dumps(cv_data, indent=2)[:2000]  
+        cv_set = cv_set_key(cv_data, corpus_version)
+        cache_key = ('analysis', normalize_query(query), cv_set) if cv_set else None
+        if cache_key:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if cache_key:
+            analysis = llm_flights.do(cache_key, lambda: self._fetch_analysis(cv_data, query, cache_key))
+        else:
+            analysis = self.query_api(cv_data, query)
+        if analysis:
+            return analysis
+
+        # Local fallback if API fails or returns invalid response
+        print("API unavailable or invalid response. Using local logic.")
+        with STAGE_SECONDS.time(stage='fallback'):
+            return self.local_analysis(cv_data, query, cv_set)
+
+    def _fetch_analysis(self, cv_data, query, cache_key):
+        # A call that finished just before this one started has already filled the cache
+        analysis = llm_cache.get(cache_key)
+        if analysis is None:
+            analysis = self.query_api(cv_data, query)
+            if analysis:
+                llm_cache.set(cache_key, analysis)
+        return analysis
+
+    async def _afetch_analysis(self, cv_data, query, cache_key):
+        analysis = llm_cache.get(cache_key)
+        if analysis is None:
+            analysis = await self.aquery_api(cv_data, query)
+            if analysis:
+                llm_cache.set(cache_key, analysis)
+        return analysis
+
+    def build_context(self, cv_data, query):
+        """The candidates most relevant to the query, packed into the prompt token budget"""
+        context = build_context(query, cv_data['database'])
+        PROMPT_TOKENS.observe(context.tokens)
+        if settings.CV_DEBUG_DUMPS:
+            print(f"Prompt context: {len(context.cv_ids)} of {len(cv_data['database'])} CVs, ~{context.tokens} tokens:\n{context.text}")
+        return context
+
+    def build_payload(self, cv_data, query, context=None):
+        context = context or self.build_context(cv_data, query)
         prompt = f"""
-        Given this CV data, analyze and {query}. Return a JSON object with 'summary', 'strengths', and 'recommendations' sections:\n{cv_data_str}
+        Given these CVs ({len(context.cv_ids)} of {len(cv_data['database'])} candidates, most relevant first), analyze and {query}. Return a JSON object with 'summary', 'strengths', and 'recommendations' sections:\n{context.text}
         """
-        payload = {"inputs": prompt, "max_length": 400}
-        
-        retries = 0
-        delay = self.initial_delay
-        
-        # Try Hugging Face API
-        while retries < self.max_retries:
+        return {"inputs": prompt, "max_length": 400}
+
+    @staticmethod
+    def with_context(analysis, context):
+        """Record on an API analysis which CVs its prompt included"""
+        if analysis:
+            analysis['cv_ids'] = context.cv_ids
+        return analysis
+
+    def parse_generation(self, result):
+        if isinstance(result, list) and result and "generated_text" in result[0]:
+            text = result[0]["generated_text"].strip()
+            
             try:
-                print("Request URL:", self.api_url)
-                print("Request Headers:", self.headers)
-                print("Request Payload (sample):", prompt[:200])
-                response = requests.post(self.api_url, headers=self.headers, json=payload)
-                print("Response Status:", response.status_code)
-                print("Response Text:", response.text)
-                response.raise_for_status()
-                result = response.json()
-                if isinstance(result, list) and "generated_text" in result[0]:
-                    text = result[0]["generated_text"].strip()
-                    
-                    try:
-                        parsed = json.loads(text)
-                        if all(key in parsed for key in ["summary", "strengths", "recommendations"]):
-                            return parsed
-                    except json.JSONDecodeError:
-                       
-                        if any(keyword in text.lower() for keyword in ["years", "education", "skills"]):
-                            return {
-                                "summary": text,
-                                "strengths": "Extracted from LLM response",
-                                "recommendations": "Further analysis may refine results"
-                            }
-                break  # Exit on success
-            except requests.exceptions.RequestException as e:
-                print(f"API Error: {e}. Retrying in {delay}s...")
-                time.sleep(delay)
-                retries += 1
-                delay *= 2
-        
-        # Local fallback if API fails or returns invalid response
-        print(f"Max retries ({self.max_retries}) reached or invalid response. Using local logic.")
-        
+                parsed = json.loads(text)
+                if isinstance(parsed, dict) and all(key in parsed for key in ["summary", "strengths", "recommendations"]):
+                    return parsed
+            except json.JSONDecodeError:
+               
+                if any(keyword in text.lower() for keyword in ["years", "education", "skills"]):
+                    return {
+                        "summary": text,
+                        "strengths": "Extracted from LLM response",
+                        "recommendations": "Further analysis may refine results"
+                    }
+        return None
+
+    async def astream_analysis(self, cv_data, corpus_version=None):
+        """Async analyze_cv yielding ('token', ...) and ('section', ...) events, then ('analysis', dict)"""
+        query = cv_data.get('query', '').lower()
+        cv_set = cv_set_key(cv_data, corpus_version)
+        cache_key = ('analysis', normalize_query(query), cv_set) if cv_set else None
+        analysis = llm_cache.get(cache_key) if cache_key else None
+
+        if analysis is None and settings.CV_LLM_STREAM:
+            chunks = []
+            context = await sync_to_async(self.build_context)(cv_data, query)
+            try:
+                async with aclosing(self.client.astream_tokens(self.build_payload(cv_data, query, context))) as tokens:
+                    async for text in tokens:
+                        chunks.append(text)
+                        yield 'token', {'text': text}
+                analysis = self.with_context(self.parse_generation([{"generated_text": "".join(chunks)}]), context)
+            except (CircuitOpenError, httpx.HTTPError, ValueError) as e:
+                print(f"API Error: {e}")
+        elif analysis is None and cache_key:
+            analysis = await llm_flights.ado(cache_key, lambda: self._afetch_analysis(cv_data, query, cache_key))
+        elif analysis is None:
+            analysis = await self.aquery_api(cv_data, query)
+        if analysis and cache_key:
+            llm_cache.set(cache_key, analysis)
+
+        if analysis is None:
+            print("API unavailable or invalid response. Using local logic.")
+            with STAGE_SECONDS.time(stage='fallback'):
+                analysis = self.local_analysis(cv_data, query, cv_set)
+            for name in ["summary", "strengths", "recommendations"]:
+                yield 'section', {'name': name, 'text': analysis[name]}
+        yield 'analysis', analysis
+
+    def query_api(self, cv_data, query):
+        """Ask the Hugging Face API; returns None when it fails or gives an unusable answer"""
+        context = self.build_context(cv_data, query)
+        try:
+            return self.with_context(self.parse_generation(self.client.post_json(self.build_payload(cv_data, query, context))), context)
+        except (CircuitOpenError, httpx.HTTPError, ValueError) as e:
+            print(f"API Error: {e}")
+        return None
+
+    async def aquery_api(self, cv_data, query):
+        """Async query_api for the ASGI chatbot"""
+        context = await sync_to_async(self.build_context)(cv_data, query)
+        try:
+            return self.with_context(self.parse_generation(await self.client.apost_json(self.build_payload(cv_data, query, context))), context)
+        except (CircuitOpenError, httpx.HTTPError, ValueError) as e:
+            print(f"API Error: {e}")
+        return None
+
+    def local_analysis(self, cv_data, query, cv_set=None):
         if "compare their years of experience" in query:
-            exp_summary = self.calculate_experience(cv_data)
+            exp_summary = self.calculate_experience(cv_data, cv_set)
             names = list(exp_summary.keys())
             if len(names) >= 2:
                 cand1 = exp_summary[names[0]]
@@ -136,7 +263,7 @@ class LLMInterface:
                 }
         
         elif "compare their education levels" in query or "compare education" in query:
-            edu_summary = self.compare_education(cv_data)
+            edu_summary = self.compare_education(cv_data, cv_set)
             names = list(edu_summary.keys())
             if len(names) >= 2:
                 cand1 = edu_summary[names[0]]
@@ -166,7 +293,7 @@ class LLMInterface:
                 }
         
         elif "compare their skills" in query:
-            skills_summary = self.compare_skills(cv_data)
+            skills_summary = self.compare_skills(cv_data, cv_set)
             names = list(skills_summary.keys())
             if len(names) >= 2:
                 cand1 = skills_summary[names[0]]
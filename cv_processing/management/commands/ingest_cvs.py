@@ -0,0 +1,135 @@
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from tqdm import tqdm
+from cv_processing import worker
+from cv_processing.bulk import bulk_create_cvs
+from cv_processing.models import CV
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx')
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load every PDF/DOCX under a directory. Files are extracted in a process pool and "
+        "written in batches; a checkpoint file lets an interrupted run resume where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Extraction processes; 0 extracts in this process")
+        parser.add_argument('--batch-size', type=int, default=200, help="Rows written per transaction")
+        parser.add_argument('--checkpoint',
+                            help="Checkpoint file (default: one per directory under CV_INGEST_CHECKPOINT_DIR)")
+        parser.add_argument('--retry-failed', action='store_true', help="Retry files that failed in an earlier run")
+
+    def handle(self, *args, **options):
+        directory = os.path.abspath(options['directory'])
+        if not os.path.isdir(directory):
+            raise CommandError(f"{directory} is not a directory")
+        checkpoint_path = options['checkpoint'] or self.default_checkpoint(directory)
+        done = self.read_checkpoint(checkpoint_path, options['retry_failed'])
+        paths = [path for path in self.walk(directory) if os.path.relpath(path, directory) not in done]
+        self.stdout.write(f"{len(paths)} file(s) to ingest, {len(done)} already done according to {checkpoint_path}")
+
+        self.directory = directory
+        self.batch_size = options['batch_size']
+        self.ingested = 0
+        self.failed = 0
+        with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+                tqdm(total=len(paths), unit='file', disable=options['verbosity'] == 0) as progress:
+            self.checkpoint = checkpoint
+            self.progress = progress
+            batch = []
+            for result in self.extract(paths, options['workers']):
+                batch.append(result)
+                if len(batch) >= self.batch_size:
+                    self.write_batch(batch)
+                    batch = []
+            if batch:
+                self.write_batch(batch)
+        self.stdout.write(self.style.SUCCESS(f"Ingested {self.ingested} CV(s), {self.failed} failed"))
+
+    def default_checkpoint(self, directory):
+        os.makedirs(settings.CV_INGEST_CHECKPOINT_DIR, exist_ok=True)
+        key = hashlib.sha256(directory.encode()).hexdigest()[:16]
+        return os.path.join(settings.CV_INGEST_CHECKPOINT_DIR, f"{os.path.basename(directory)}-{key}")
+
+    def walk(self, directory):
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    yield os.path.join(root, name)
+
+    def read_checkpoint(self, checkpoint_path, retry_failed):
+        done = set()
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, encoding='utf-8') as checkpoint:
+                for line in checkpoint:
+                    status, _, path = line.rstrip('\n').partition('\t')
+                    if path and not (retry_failed and status == 'failed'):
+                        done.add(path)
+        return done
+
+    def extract(self, paths, workers):
+        """Yield extraction results as they complete, keeping a bounded number of files in flight"""
+        if workers <= 0:
+            for path in paths:
+                yield worker.extract_path(path)
+            return
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=worker.init_worker) as executor:
+            pending = set()
+            paths = iter(paths)
+            while True:
+                for path in paths:
+                    pending.add(executor.submit(worker.extract_path, path))
+                    if len(pending) >= workers * 4:
+                        break
+                if not pending:
+                    return
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+
+    def write_batch(self, batch):
+        failures = [result for result in batch if 'error' in result]
+        results = [result for result in batch if 'error' not in result]
+        for result in failures:
+            self.stderr.write(f"Error processing '{result['path']}': {result['error']}")
+
+        # A crash between commit and checkpoint write replays the batch; skip what is already stored
+        existing = set(CV.objects.filter(content_hash__in=[r['content_hash'] for r in results])
+                       .values_list('content_hash', 'filename'))
+        results = [r for r in results if (r['content_hash'], os.path.basename(r['path'])) not in existing]
+
+        entries = []
+        try:
+            for result in results:
+                with open(result['path'], 'rb') as f:
+                    name = default_storage.save(f"cvs/{os.path.basename(result['path'])}", File(f))
+                cv = CV(filename=os.path.basename(result['path']), file=name, content_hash=result['content_hash'])
+                entries.append((cv, result['cv_data'], result['pages'], result['method']))
+            bulk_create_cvs(entries)
+        except BaseException:
+            # Nothing of the batch was committed, so the files stored for it belong to no CV
+            for cv, _, _, _ in entries:
+                default_storage.delete(cv.file.name)
+            raise
+
+        for result in batch:
+            status = 'failed' if 'error' in result else 'done'
+            self.checkpoint.write(f"{status}\t{os.path.relpath(result['path'], self.directory)}\n")
+        self.checkpoint.flush()
+        os.fsync(self.checkpoint.fileno())
+        self.ingested += len(results)
+        self.failed += len(failures)
+        self.progress.update(len(batch))
+        self.progress.set_postfix(ingested=self.ingested, failed=self.failed)
@@ -0,0 +1,15 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from cv_processing import vector_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the on-disk CV vector index from the database"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        index = vector_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(index)} CV(s) into {settings.CV_VECTOR_INDEX_DIR} in {time.perf_counter() - start:.1f}s"
+        ))
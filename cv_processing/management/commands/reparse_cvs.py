@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+from cv_processing import worker
+from cv_processing.bulk import PARSED_FIELDS, bulk_update_parses
+from cv_processing.cv_processor import PARSER_VERSION
+from cv_processing.models import CV, CVData, CVText, ExtractionCache
+
+HASH_CHUNK = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-parse CVs whose parse is older than the current parser, from their stored text. "
+        "Nothing is extracted or OCRed again; batches are parsed in a process pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Parsing processes; 0 parses in this process")
+        parser.add_argument('--batch-size', type=int, default=200, help="Rows parsed and written per batch")
+
+    def handle(self, *args, **options):
+        backfilled = self.backfill_text()
+        stale = CVData.objects.filter(parser_version__lt=PARSER_VERSION)
+        ids = list(stale.filter(cv__text__isnull=False).order_by('id').values_list('id', flat=True))
+        untexted = stale.filter(cv__text__isnull=True).count()
+        self.stdout.write(
+            f"{len(ids)} CV(s) to re-parse with parser version {PARSER_VERSION}"
+            + (f", {backfilled} with text recovered from the extraction cache" if backfilled else "")
+        )
+        if untexted:
+            self.stderr.write(f"{untexted} stale CV(s) have no stored text; upload or ingest them again to re-parse")
+
+        batch_size = options['batch_size']
+        batches = [ids[start:start + batch_size] for start in range(0, len(ids), batch_size)]
+        reparsed = 0
+        with tqdm(total=len(ids), unit='cv', disable=options['verbosity'] == 0) as progress:
+            for batch, parsed_ids, parses in self.parse(batches, options['workers']):
+                # Rows deleted since their text was read are skipped
+                cv_datas = CVData.objects.select_related('cv__text').in_bulk(parsed_ids)
+                for cv_data_id, parsed in zip(parsed_ids, parses):
+                    if cv_data_id in cv_datas:
+                        for field in PARSED_FIELDS:
+                            setattr(cv_datas[cv_data_id], field, parsed[field])
+                bulk_update_parses(cv_datas.values())
+                reparsed += len(cv_datas)
+                progress.update(len(batch))
+        skipped = len(ids) - reparsed
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-parsed {reparsed} CV(s)" + (f", skipped {skipped} deleted during the run" if skipped else "")
+        ))
+
+    def backfill_text(self):
+        """Store text for stale CVs saved before it was kept, where the extraction cache still has it"""
+        hashes = list(
+            CV.objects.filter(text__isnull=True, cvdata__parser_version__lt=PARSER_VERSION)
+            .exclude(content_hash='').values_list('content_hash', flat=True).distinct()
+        )
+        created = 0
+        for start in range(0, len(hashes), HASH_CHUNK):
+            raw_texts = dict(ExtractionCache.objects.filter(content_hash__in=hashes[start:start + HASH_CHUNK])
+                             .values_list('content_hash', 'raw_text'))
+            texts = [
+                CVText(cv_id=cv_id, pages=[raw_texts[content_hash]], method=CVText.UNKNOWN)
+                for cv_id, content_hash in CV.objects.filter(text__isnull=True, content_hash__in=raw_texts)
+                .values_list('id', 'content_hash')
+            ]
+            created += len(CVText.objects.bulk_create(texts))
+        return created
+
+    def texts(self, batch):
+        """(CVData ids, texts) for the rows of batch that still exist and have stored text"""
+        pages = dict(CVData.objects.filter(id__in=batch, cv__text__isnull=False).values_list('id', 'cv__text__pages'))
+        ids = [cv_data_id for cv_data_id in batch if cv_data_id in pages]
+        return ids, [CVText.join(pages[cv_data_id]) for cv_data_id in ids]
+
+    def parse(self, batches, workers):
+        """Yield (batch, parsed CVData ids, parsed sections) per batch as they complete, a bounded number in flight"""
+        if workers <= 0:
+            for batch in batches:
+                ids, texts = self.texts(batch)
+                yield batch, ids, worker.parse_texts(texts)
+            return
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=worker.init_worker) as executor:
+            pending = {}
+            batches = iter(batches)
+            while True:
+                for batch in batches:
+                    ids, texts = self.texts(batch)
+                    pending[executor.submit(worker.parse_texts, texts)] = batch, ids
+                    if len(pending) >= workers * 2:
+                        break
+                if not pending:
+                    return
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield *pending.pop(future), future.result()
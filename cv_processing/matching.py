@@ -0,0 +1,164 @@
+import re
+import threading
+from collections import namedtuple
+import numpy as np
+from django.conf import settings
+from .models import CVData, SkillIndex
+from .candidates import corpus_version
+from .cv_facts import degree_level, UNKNOWN_DEGREE, DEGREE_NAMES
+from .skill_index import canonical_skill
+
+# kind is 'skill', 'years' or 'degree'; value is a canonical skill, a year count or a degree level
+Criterion = namedtuple('Criterion', ['kind', 'value', 'must', 'weight'])
+
+# Points for a fully met criterion
+MUST_WEIGHTS = {'skill': 3.0, 'years': 2.0, 'degree': 2.0}
+NICE_WEIGHT = 1.0
+# Experience beyond the minimum earns up to this multiple of the years weight
+YEARS_CREDIT_CAP = 1.5
+
+NICE_MARKER = re.compile(r'^(?:nice[\s-]to[\s-]have|preferred|bonus|ideally|plus)\b\s*:?\s*', re.IGNORECASE)
+MUST_MARKER = re.compile(r'^(?:must[\s-]have|required|requires?)\b\s*:?\s*', re.IGNORECASE)
+YEARS_PATTERN = re.compile(r'(\d+)\s*\+?\s*years?', re.IGNORECASE)
+
+_features = {'version': None}
+_features_lock = threading.Lock()
+
+
+def parse_criteria(text):
+    """Split "5 years and python, nice to have docker and kubernetes" into Criterion tuples
+
+    Requirements are separated by "and", commas or semicolons. Everything is
+    a must-have until a "nice to have" (or "preferred", "bonus") marker,
+    which applies to the requirements after it until a "must have" marker.
+    """
+    criteria = []
+    must = True
+    for requirement in re.split(r'\s+and\s+|[,;]', text, flags=re.IGNORECASE):
+        requirement = requirement.strip()
+        if NICE_MARKER.match(requirement):
+            must, requirement = False, NICE_MARKER.sub('', requirement)
+        elif MUST_MARKER.match(requirement):
+            must, requirement = True, MUST_MARKER.sub('', requirement)
+        if not requirement:
+            continue
+        years = YEARS_PATTERN.search(requirement)
+        level = degree_level(requirement)
+        if years:
+            kind, value = 'years', int(years.group(1))
+        elif level != UNKNOWN_DEGREE:
+            kind, value = 'degree', level
+        else:
+            kind, value = 'skill', canonical_skill(requirement)
+        if value:
+            criteria.append(Criterion(kind, value, must, MUST_WEIGHTS[kind] if must else NICE_WEIGHT))
+    return criteria
+
+
+def _load_features():
+    """Per-CV arrays of the precomputed facts, rebuilt only when the corpus version changes
+
+    Rows follow CVData ids; as in the candidate snapshot, the first CVData
+    of each CV is the one that counts. A rebuild swaps in a new dict, so
+    callers still ranking against the previous one are left untouched.
+    """
+    global _features
+    version = corpus_version()
+    with _features_lock:
+        if _features['version'] == version:
+            return _features
+    rows = list(CVData.objects.order_by('id').values_list('id', 'cv_id', 'experience_years', 'highest_degree'))
+    columns = np.array(rows, dtype=np.int64).reshape(-1, 4)
+    _, first = np.unique(columns[:, 1], return_index=True)
+    columns = columns[np.sort(first)]
+    features = {
+        'version': version,
+        'cv_data_ids': columns[:, 0],
+        'cv_ids': columns[:, 1],
+        'years': columns[:, 2].astype(np.float32),
+        'degrees': columns[:, 3].astype(np.int8),
+    }
+    with _features_lock:
+        _features = features
+    return features
+
+
+def _skill_rows(features, skills):
+    """{skill: row indices of CVs listing it}, from the skill index"""
+    rows = {skill: [] for skill in skills}
+    for token, cv_data_id in SkillIndex.objects.filter(token__in=skills).values_list('token', 'cv_data_id'):
+        rows[token].append(cv_data_id)
+    ids = features['cv_data_ids']
+    for skill, cv_data_ids in rows.items():
+        wanted = np.array(cv_data_ids, dtype=np.int64)
+        positions = np.searchsorted(ids, wanted)
+        # Rows of later CVData for the same CV were dropped, so check the lookup hit
+        found = positions < len(ids)
+        found[found] = ids[positions[found]] == wanted[found]
+        rows[skill] = positions[found]
+    return rows
+
+
+def _satisfaction(criterion, features, skill_rows):
+    """Fraction of the criterion each CV meets, as one array over all CVs"""
+    if criterion.kind == 'skill':
+        met = np.zeros(len(features['cv_ids']), dtype=np.float32)
+        met[skill_rows[criterion.value]] = 1.0
+        return met
+    if not criterion.value:
+        # "0 years" asks for nothing, and dividing by it would score every CV NaN
+        return np.ones(len(features['cv_ids']), dtype=np.float32)
+    if criterion.kind == 'years':
+        return np.minimum(features['years'] / criterion.value, YEARS_CREDIT_CAP)
+    met = features['degrees'] >= criterion.value
+    if criterion.must:
+        return met.astype(np.float32)
+    return np.where(met, 1.0, features['degrees'] / criterion.value).astype(np.float32)
+
+
+def _explain(criterion, features, skill_rows, row):
+    if criterion.kind == 'skill':
+        met = row in skill_rows[criterion.value]
+        label = criterion.value
+    elif criterion.kind == 'years':
+        met = features['years'][row] >= criterion.value
+        label = f"{features['years'][row]:g}/{criterion.value} years"
+    else:
+        met = features['degrees'][row] >= criterion.value
+        label = f"{DEGREE_NAMES[int(features['degrees'][row])]} (needs {DEGREE_NAMES[criterion.value]})"
+    return f"{label} {'✓' if met else '✗'}{'' if criterion.must else ' (nice to have)'}"
+
+
+def rank_candidates(criteria, k=None, cv_ids=None):
+    """(number of CVs meeting every must-have, [(cv_id, score, explanations)] for the best k)
+
+    All CVs are scored at once over the feature arrays: each criterion adds
+    its weight times how far it is met. Only the top k are selected and
+    sorted, via argpartition, so large corpora never need a full sort.
+    cv_ids, when given, restricts matching to those CV ids.
+    """
+    k = k or settings.CV_MATCH_TOP_K
+    features = _load_features()
+    skill_rows = _skill_rows(features, {c.value for c in criteria if c.kind == 'skill'})
+    scores = np.zeros(len(features['cv_ids']), dtype=np.float32)
+    eligible = np.ones(len(features['cv_ids']), dtype=bool)
+    if cv_ids is not None:
+        eligible &= np.isin(features['cv_ids'], np.fromiter((int(cv_id) for cv_id in cv_ids), dtype=np.int64))
+    for criterion in criteria:
+        met = _satisfaction(criterion, features, skill_rows)
+        if criterion.must:
+            eligible &= met >= 1.0
+        scores += criterion.weight * met
+
+    rows = np.flatnonzero(eligible)
+    if len(rows) > k:
+        rows = rows[np.argpartition(-scores[rows], k - 1)[:k]]
+    # Best score first; ties keep upload order
+    rows = rows[np.lexsort((features['cv_ids'][rows], -scores[rows]))]
+    skill_rows = {skill: set(positions.tolist()) for skill, positions in skill_rows.items()}
+    top = [
+        (str(features['cv_ids'][row]), round(float(scores[row]), 2),
+         [_explain(criterion, features, skill_rows, row) for criterion in criteria])
+        for row in rows
+    ]
+    return int(eligible.sum()), top
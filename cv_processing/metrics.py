@@ -0,0 +1,224 @@
+"""In-process counters and histograms, rendered in the Prometheus text format at /metrics
+
+Each process keeps its own values. Ingestion workers in the spawn pool send
+theirs back with every finished file (see collect and merge), so the web
+process that serves /metrics also reports extraction work done elsewhere.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans a cached lookup up to a slow OCR page or LLM call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            values = {key: self._copy(value) for key, value in self._values.items()}
+            if reset:
+                self._values.clear()
+        return values
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        values = self.snapshot()
+        if not values and not self.labelnames:
+            # An unlabelled series is reported from the start, not after its first sample
+            values = {(): self._empty()}
+        for key, value in sorted(values.items()):
+            lines.extend(self._samples(key, value))
+        return lines
+
+
+class Counter(Metric):
+    """A monotonically increasing count"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def merge(self, values):
+        with self._lock:
+            for key, amount in values.items():
+                self._values[key] = self._values.get(key, 0) + amount
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def _empty(self):
+        return 0
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Histogram(Metric):
+    """Observed durations in cumulative buckets, with their sum and count"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or self._empty()
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            value = self._values.get(self._key(labels))
+        return sum(value[0]) if value else 0
+
+    def merge(self, values):
+        with self._lock:
+            for key, (counts, total) in values.items():
+                own_counts, own_total = self._values.get(key) or self._empty()
+                self._values[key] = ([a + b for a, b in zip(own_counts, counts)], own_total + total)
+
+    @staticmethod
+    def _copy(value):
+        return list(value[0]), value[1]
+
+    def _empty(self):
+        return [0] * (len(self.buckets) + 1), 0.0
+
+    def _samples(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class TimedIterator:
+    """Wrap an iterator and add up the time spent producing its items in .elapsed
+
+    Lets a consumer subtract upstream work (e.g. extraction feeding the
+    parser) from its own wall time.
+    """
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+
+def render():
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda metric: metric.name)
+    return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+def collect():
+    """Take this process's values and reset them, for handing to another process's merge()"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {metric.name: metric.snapshot(reset=True) for metric in metrics}
+
+
+def merge(collected):
+    with _registry_lock:
+        metrics = dict(_registry)
+    for name, values in (collected or {}).items():
+        if name in metrics:
+            metrics[name].merge(values)
+
+
+STAGE_SECONDS = Histogram(
+    'cv_stage_seconds',
+    "Time spent in each processing stage (pdf_text and ocr/rasterize are per page).",
+    ['stage'],
+)
+OCR_FALLBACKS = Counter('cv_ocr_fallbacks_total', "PDF pages whose text layer was too short and were OCRed.")
+LLM_RETRIES = Counter('cv_llm_retries_total', "LLM API attempts retried after a transient error.")
+LLM_COALESCED = Counter(
+    'cv_llm_coalesced_total',
+    "LLM analyses answered by joining an identical call already in flight.",
+)
+LLM_BATCH_SIZE = Histogram(
+    'cv_llm_batch_size',
+    "Prompts sent per upstream LLM call when micro-batching is on.",
+    buckets=(1, 2, 4, 8, 16, 32),
+)
+PROMPT_TOKENS = Histogram(
+    'cv_prompt_tokens',
+    "Estimated tokens of CV context packed into each LLM prompt.",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+LLM_REQUESTS = Counter(
+    'cv_llm_requests_total',
+    "LLM API calls by outcome (ok, error, or rejected while the circuit breaker is open).",
+    ['outcome'],
+)
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.11 on 2026-10-18 05:37
+
+import re
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Frozen copy of skill_index.skill_tokens as of this migration
+SKILL_SEPARATORS = re.compile(r'[,;|•/]')
+SKILL_STRIP = ' \t-*·.()[]'
+
+
+def canonical_skill(skill):
+    skill = skill.split(':')[-1]
+    return ' '.join(skill.lower().strip(SKILL_STRIP).split())
+
+
+def skill_tokens(skills):
+    tokens = set()
+    for line in skills:
+        for part in SKILL_SEPARATORS.split(line):
+            phrase = canonical_skill(part)
+            if phrase:
+                tokens.add(phrase)
+                words = phrase.split()
+                if len(words) > 1:
+                    tokens.update(word.strip(SKILL_STRIP) for word in words if word.strip(SKILL_STRIP))
+    return {token[:255] for token in tokens}
+
+
+def build_skill_index(apps, schema_editor):
+    CVData = apps.get_model('cv_processing', 'CVData')
+    SkillIndex = apps.get_model('cv_processing', 'SkillIndex')
+    for cv_data in CVData.objects.only('id', 'cv_id', 'skills').iterator():
+        SkillIndex.objects.bulk_create([
+            SkillIndex(token=token, cv_id=cv_data.cv_id, cv_data_id=cv_data.id)
+            for token in skill_tokens(cv_data.skills)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv_processing', '0004_extraction_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=255)),
+                ('cv', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cv_processing.cv')),
+                ('cv_data', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cv_processing.cvdata')),
+            ],
+            options={
+                'unique_together': {('token', 'cv_data')},
+            },
+        ),
+        migrations.RunPython(build_skill_index, migrations.RunPython.noop),
+    ]
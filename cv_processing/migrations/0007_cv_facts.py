@@ -0,0 +1,93 @@
+# Generated by Django 4.2.11 on 2026-10-18 05:39
+
+import re
+from datetime import datetime
+from django.db import migrations, models
+
+# Frozen copy of cv_facts.compute_facts as of this migration
+YEAR_RANGE_PATTERN = re.compile(r'(\d{4})\s*-\s*(current|\d{4})', re.IGNORECASE)
+DEGREE_PATTERNS = [
+    (4, re.compile(r'\b(ph\.?\s?d|doctor(ate)?|d\.?phil)\b', re.IGNORECASE)),
+    (3, re.compile(r'\b(master|m\.?sc|m\.?s|m\.?a|mba|m\.?tech|m\.?eng)\b', re.IGNORECASE)),
+    (2, re.compile(r'\b(bachelor|b\.?sc|b\.?s|b\.?a|b\.?tech|b\.?eng)\b', re.IGNORECASE)),
+    (1, re.compile(r'\b(associate|diploma)\b', re.IGNORECASE)),
+]
+
+
+def experience_intervals(work_experience):
+    current_year = datetime.now().year
+    intervals = []
+    for exp in work_experience:
+        match = YEAR_RANGE_PATTERN.search(exp)
+        if match:
+            ongoing = match.group(2).lower() == 'current'
+            start = int(match.group(1))
+            end = current_year if ongoing else int(match.group(2))
+            intervals.append({'start': start, 'end': end, 'current': ongoing, 'role': exp})
+    return intervals
+
+
+def total_experience_years(intervals):
+    total = 0
+    merged_start = merged_end = None
+    for interval in sorted(intervals, key=lambda i: i['start']):
+        start, end = interval['start'], max(interval['start'], interval['end'])
+        if merged_end is None or start > merged_end:
+            if merged_end is not None:
+                total += merged_end - merged_start
+            merged_start, merged_end = start, end
+        else:
+            merged_end = max(merged_end, end)
+    if merged_end is not None:
+        total += merged_end - merged_start
+    return total
+
+
+def degree_level(text):
+    for level, pattern in DEGREE_PATTERNS:
+        if pattern.search(text):
+            return level
+    return 0
+
+
+def compute_facts(work_experience, education):
+    intervals = experience_intervals(work_experience)
+    return {
+        'experience_years': total_experience_years(intervals),
+        'experience_intervals': intervals,
+        'highest_degree': max((degree_level(edu) for edu in education), default=0),
+    }
+
+
+def compute_cv_facts(apps, schema_editor):
+    CVData = apps.get_model('cv_processing', 'CVData')
+    for cv_data in CVData.objects.iterator():
+        for field, value in compute_facts(cv_data.work_experience, cv_data.education).items():
+            setattr(cv_data, field, value)
+        cv_data.save(update_fields=['experience_years', 'experience_intervals', 'highest_degree'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv_processing', '0006_corpus_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cvdata',
+            name='experience_intervals',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='cvdata',
+            name='experience_years',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='cvdata',
+            name='highest_degree',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Associate'), (2, 'Bachelor’s'), (3, 'Master’s'), (4, 'Doctorate')], db_index=True, default=0),
+        ),
+        migrations.RunPython(compute_cv_facts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# Frozen copy of the search table definition as of this migration
+FTS_TABLE = 'cv_processing_cvsearch'
+FTS_COLUMNS = ['work_experience', 'projects', 'certifications', 'raw_text']
+CREATE_FTS_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"cv_id UNINDEXED, {', '.join(FTS_COLUMNS)}, tokenize='porter unicode61')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_FTS_TABLE)
+    CVData = apps.get_model('cv_processing', 'CVData')
+    ExtractionCache = apps.get_model('cv_processing', 'ExtractionCache')
+    for cv_data in CVData.objects.select_related('cv').iterator():
+        raw_text = ''
+        if cv_data.cv.content_hash:
+            raw_text = ExtractionCache.objects.filter(content_hash=cv_data.cv.content_hash).values_list('raw_text', flat=True).first() or ''
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, cv_id, {', '.join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s, %s, %s)",
+            [cv_data.pk, cv_data.cv_id, '\n'.join(cv_data.work_experience), '\n'.join(cv_data.projects),
+             '\n'.join(cv_data.certifications), raw_text],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv_processing', '0007_cv_facts'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
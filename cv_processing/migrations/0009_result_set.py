@@ -0,0 +1,26 @@
+# Generated by Django 4.2.11 on 2026-10-18 14:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv_processing', '0008_cv_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultSet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(db_index=True, max_length=40)),
+                ('name', models.CharField(max_length=50)),
+                ('query', models.TextField()),
+                ('cv_ids', models.JSONField(default=list)),
+                ('facets', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
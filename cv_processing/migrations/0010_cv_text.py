@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-18 06:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv_processing', '0009_result_set'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cvdata',
+            name='parser_version',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.CreateModel(
+            name='CVText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pages', models.JSONField(default=list)),
+                ('method', models.CharField(choices=[('pdf_text', 'PDF text layer'), ('ocr', 'OCR'), ('pdf_mixed', 'PDF text layer and OCR'), ('docx', 'DOCX'), ('unknown', 'Unknown')], default='unknown', max_length=20)),
+                ('extracted_at', models.DateTimeField(auto_now=True)),
+                ('cv', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='text', to='cv_processing.cv')),
+            ],
+        ),
+    ]
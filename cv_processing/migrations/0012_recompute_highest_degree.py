@@ -0,0 +1,50 @@
+# Generated by Django 4.2.11 on 2026-10-18 09:12
+
+import re
+from django.db import migrations
+
+# Frozen copy of cv_facts.highest_degree_level as of this migration
+SHORT_DEGREE = r'{0}\.\s?[sa]\b|{0}[sa](?=\s+(?:in|of|degree)\b)'
+DEGREE_PATTERNS = [
+    (4, re.compile(r'\b(ph\.?\s?d|doctor(ate)?|d\.?phil)\b', re.IGNORECASE)),
+    (3, re.compile(rf'\b(master|m\.?sc|mba|m\.?tech|m\.?eng)\b|\b(?:{SHORT_DEGREE.format("m")})', re.IGNORECASE)),
+    (2, re.compile(rf'\b(bachelor|b\.?sc|b\.?tech|b\.?eng)\b|\b(?:{SHORT_DEGREE.format("b")})', re.IGNORECASE)),
+    (1, re.compile(r'\b(associate|diploma)\b', re.IGNORECASE)),
+]
+LEADING_SHORT_DEGREE = re.compile(
+    r'^\W*(?P<level>[mb])[sa]\b(?!\s+(?:sql|office|excel|word|access|project|teams|dynamics|azure|windows|visio|dos)\b)',
+    re.IGNORECASE,
+)
+
+
+def degree_level(text):
+    for level, pattern in DEGREE_PATTERNS:
+        if pattern.search(text):
+            return level
+    match = LEADING_SHORT_DEGREE.match(text)
+    if match:
+        return 3 if match.group('level').lower() == 'm' else 2
+    return 0
+
+
+def highest_degree_level(education):
+    return max((degree_level(edu) for edu in education), default=0)
+
+
+def recompute_highest_degree(apps, schema_editor):
+    # Bare "MS"/"BA" no longer count as degrees
+    CVData = apps.get_model('cv_processing', 'CVData')
+    for cv_data in CVData.objects.only('id', 'education').iterator():
+        level = highest_degree_level(cv_data.education)
+        CVData.objects.filter(pk=cv_data.pk).exclude(highest_degree=level).update(highest_degree=level)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv_processing', '0011_chunked_upload'),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_highest_degree, migrations.RunPython.noop),
+    ]
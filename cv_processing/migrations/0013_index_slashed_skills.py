@@ -0,0 +1,50 @@
+# Generated by Django 4.2.11 on 2026-10-18 11:05
+
+import re
+from django.db import migrations
+
+# Frozen copy of skill_index.skill_tokens as of this migration
+SKILL_SEPARATORS = re.compile(r'[,;|•]')
+SKILL_STRIP = ' \t-*·.()[]'
+
+
+def canonical_skill(skill):
+    skill = skill.split(':')[-1]
+    return ' '.join(skill.lower().strip(SKILL_STRIP).split())
+
+
+def skill_tokens(skills):
+    tokens = set()
+    for line in skills:
+        for part in SKILL_SEPARATORS.split(line):
+            phrase = canonical_skill(part)
+            phrases = [phrase] + [canonical_skill(sub) for sub in phrase.split('/')] if '/' in phrase else [phrase]
+            for phrase in filter(None, phrases):
+                tokens.add(phrase)
+                words = phrase.split()
+                if len(words) > 1:
+                    tokens.update(word.strip(SKILL_STRIP) for word in words if word.strip(SKILL_STRIP))
+    return {token[:255] for token in tokens}
+
+
+def index_slashed_skills(apps, schema_editor):
+    # Slashed skills ("CI/CD") used to be indexed only split at the slash
+    CVData = apps.get_model('cv_processing', 'CVData')
+    SkillIndex = apps.get_model('cv_processing', 'SkillIndex')
+    for cv_data in CVData.objects.only('id', 'cv_id', 'skills').iterator():
+        if any('/' in line for line in cv_data.skills or []):
+            SkillIndex.objects.bulk_create([
+                SkillIndex(token=token, cv_id=cv_data.cv_id, cv_data_id=cv_data.id)
+                for token in skill_tokens(cv_data.skills)
+            ], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv_processing', '0012_recompute_highest_degree'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_slashed_skills, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:20
+
+from django.db import migrations, models
+
+
+def set_experience_until(apps, schema_editor):
+    # Year the stored ongoing intervals were counted up to; rows counted in an
+    # earlier year are then recounted by candidates.refresh_ongoing_experience
+    CVData = apps.get_model('cv_processing', 'CVData')
+    for cv_data in CVData.objects.only('id', 'experience_intervals').iterator():
+        until = max((i['end'] for i in cv_data.experience_intervals if i.get('current')), default=None)
+        if until is not None:
+            CVData.objects.filter(pk=cv_data.pk).update(experience_until=until)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cv_processing', '0013_index_slashed_skills'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cvdata',
+            name='experience_until',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(set_experience_until, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
+import uuid
 from django.db import models
+from .cv_facts import DEGREE_CHOICES, UNKNOWN_DEGREE, compute_facts
 
 class CV(models.Model):
     filename = models.CharField(max_length=255)  # Store the original filename, not unique
     uploaded_at = models.DateTimeField(auto_now_add=True)
     file = models.FileField(upload_to='cvs/')
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256 of the uploaded file
 
     def __str__(self):
         return f"CV {self.id} - {self.filename}"
@@ -16,6 +19,164 @@ class CVData(models.Model):
     skills = models.JSONField(default=list)
     projects = models.JSONField(default=list)
     certifications = models.JSONField(default=list)
+    # Derived from the sections above on every save, see cv_facts.compute_facts
+    experience_years = models.PositiveIntegerField(default=0, db_index=True)
+    experience_intervals = models.JSONField(default=list)
+    # Year ongoing roles were counted up to; null without an ongoing role
+    experience_until = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    highest_degree = models.PositiveSmallIntegerField(choices=DEGREE_CHOICES, default=UNKNOWN_DEGREE, db_index=True)
+    # cv_processor.PARSER_VERSION that produced the sections; 0 if unknown. See the reparse_cvs command.
+    parser_version = models.PositiveIntegerField(default=0, db_index=True)
+
+    def update_facts(self):
+        for field, value in compute_facts(self.work_experience, self.education).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        self.update_facts()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Data for CV {self.cv.id}"
+
+class CVText(models.Model):
+    """Raw extracted text of a CV, kept so a new parser can re-parse it without extracting (or OCRing) again"""
+    PDF_TEXT = 'pdf_text'
+    OCR = 'ocr'
+    PDF_MIXED = 'pdf_mixed'
+    DOCX = 'docx'
+    UNKNOWN = 'unknown'
+    METHOD_CHOICES = [
+        (PDF_TEXT, 'PDF text layer'),
+        (OCR, 'OCR'),
+        (PDF_MIXED, 'PDF text layer and OCR'),
+        (DOCX, 'DOCX'),
+        (UNKNOWN, 'Unknown'),
+    ]
+
+    cv = models.OneToOneField(CV, on_delete=models.CASCADE, related_name='text')
+    pages = models.JSONField(default=list)  # Text of each PDF page; a DOCX is a single page
+    method = models.CharField(max_length=20, choices=METHOD_CHOICES, default=UNKNOWN)
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    @staticmethod
+    def join(pages):
+        """The text the parser sees: non-empty pages, each ending in a newline"""
+        return "".join(page + "\n" for page in pages if page)
+
+    @property
+    def text(self):
+        return self.join(self.pages)
+
+    def __str__(self):
+        return f"Text of CV {self.cv_id} ({self.method}, {len(self.pages)} pages)"
+
+class IngestJob(models.Model):
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Ingest job {self.id}"
+
+class IngestFile(models.Model):
+    QUEUED = 'queued'
+    EXTRACTING = 'extracting'
+    OCR = 'ocr'
+    PARSED = 'parsed'
+    FAILED = 'failed'
+    STATE_CHOICES = [
+        (QUEUED, 'Queued'),
+        (EXTRACTING, 'Extracting'),
+        (OCR, 'OCR'),
+        (PARSED, 'Parsed'),
+        (FAILED, 'Failed'),
+    ]
+
+    job = models.ForeignKey(IngestJob, on_delete=models.CASCADE, related_name='files')
+    cv = models.ForeignKey(CV, on_delete=models.CASCADE)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=QUEUED)
+    error = models.TextField(blank=True)
+    queued_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Seconds since queued_at at which each state was entered
+    timings = models.JSONField(default=dict)
+    cache_hit = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.cv.filename} ({self.state})"
+
+class ExtractionCache(models.Model):
+    content_hash = models.CharField(max_length=64, unique=True)
+    parser_version = models.PositiveIntegerField()
+    cv_data = models.JSONField(default=dict)
+    raw_text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True, db_index=True)
+    hits = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Extraction cache {self.content_hash[:12]}"
+
+class SkillIndex(models.Model):
+    token = models.CharField(max_length=255, db_index=True)  # Canonical skill, see skill_index.skill_tokens
+    cv = models.ForeignKey(CV, on_delete=models.CASCADE)
+    cv_data = models.ForeignKey(CVData, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = [('token', 'cv_data')]
+
+    def __str__(self):
+        return f"{self.token} -> CV {self.cv_id}"
+
+class CorpusVersion(models.Model):
+    """Single row re-stamped on every CV/CVData change, so any process can tell its cached corpus is stale"""
+    # A random token rather than a counter, so a rolled back bump can't be reused for different data
+    version = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"Corpus version {self.version}"
+
+class ResultSet(models.Model):
+    """Candidate ids matched by a chatbot query, kept server-side for follow-ups and paging"""
+    session_key = models.CharField(max_length=40, db_index=True)
+    name = models.CharField(max_length=50)  # Kind of query that produced it, e.g. 'skill' or 'job_requirements'
+    query = models.TextField()
+    cv_ids = models.JSONField(default=list)  # In result order
+    facets = models.JSONField(null=True, blank=True)  # Computed on first use, see result_sets.facets
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Result set {self.id} ({self.name}, {len(self.cv_ids)} candidates)"
+
+class Upload(models.Model):
+    """A batch of CVs sent in chunks, see chunked_uploads; files join the job as each is finalized"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job = models.ForeignKey(IngestJob, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Upload {self.id}"
+
+class UploadFile(models.Model):
+    UPLOADING = 'uploading'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+    STATE_CHOICES = [
+        (UPLOADING, 'Uploading'),
+        (COMPLETE, 'Complete'),
+        (FAILED, 'Failed'),
+    ]
+
+    upload = models.ForeignKey(Upload, on_delete=models.CASCADE, related_name='files')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)  # Declared by the client, checked on finalize
+    received = models.PositiveBigIntegerField(default=0)  # Bytes stored so far; the next chunk starts here
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default=UPLOADING)
+    error = models.TextField(blank=True)
+    cv = models.ForeignKey(CV, null=True, blank=True, on_delete=models.SET_NULL)
 
     def __str__(self):
-        return f"Data for CV {self.cv.id}"
\ No newline at end of file
+        return f"{self.filename} ({self.received}/{self.size} bytes, {self.state})"
@@ -0,0 +1,93 @@
+"""OCR backends: turn one rasterized page (a PIL image) into text
+
+tesserocr drives libtesseract in-process. Engines load their models once
+and are kept for the life of the process, one per page OCRed at a time, and
+images are handed to them in memory. pytesseract, the fallback, runs the
+tesseract binary for every page and passes each image through a temp file.
+CV_OCR_BACKEND picks one; 'auto' prefers tesserocr when it is installed.
+"""
+import queue
+import threading
+import pytesseract
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import tesserocr
+except ImportError:  # Optional; pytesseract is used instead
+    tesserocr = None
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class PytesseractBackend:
+    name = 'pytesseract'
+
+    def __init__(self, cmd=None, lang=None):
+        cmd = cmd or settings.CV_TESSERACT_CMD
+        # Unset, pytesseract runs whichever tesseract is on PATH
+        if cmd:
+            pytesseract.pytesseract.tesseract_cmd = cmd
+        self.lang = lang or settings.CV_OCR_LANG
+
+    def image_to_string(self, image):
+        return pytesseract.image_to_string(image, lang=self.lang)
+
+
+class TesserocrBackend:
+    name = 'tesserocr'
+
+    def __init__(self, tessdata=None, lang=None):
+        if tesserocr is None:
+            raise ImproperlyConfigured("CV_OCR_BACKEND is 'tesserocr' but tesserocr is not installed")
+        self.tessdata = tessdata or settings.CV_TESSDATA_PREFIX
+        self.lang = lang or settings.CV_OCR_LANG
+        # An engine serves one page at a time, so concurrent pages each take an idle one
+        self._idle = queue.SimpleQueue()
+        # Load the models now, so a broken install fails here rather than on the first scanned page
+        self._idle.put(self._new_engine())
+
+    def _new_engine(self):
+        kwargs = {'lang': self.lang}
+        if self.tessdata:
+            kwargs['path'] = self.tessdata
+        return tesserocr.PyTessBaseAPI(**kwargs)
+
+    def image_to_string(self, image):
+        try:
+            engine = self._idle.get_nowait()
+        except queue.Empty:
+            engine = self._new_engine()
+        try:
+            engine.SetImage(image)
+            return engine.GetUTF8Text()
+        finally:
+            engine.Clear()
+            self._idle.put(engine)
+
+
+BACKENDS = {backend.name: backend for backend in (TesserocrBackend, PytesseractBackend)}
+
+
+def make_backend(name=None):
+    name = name or settings.CV_OCR_BACKEND
+    if name == 'auto':
+        if tesserocr is not None:
+            try:
+                return TesserocrBackend()
+            except Exception as e:
+                print(f"OCR Error: {e}. Falling back to pytesseract.")
+        return PytesseractBackend()
+    if name not in BACKENDS:
+        raise ImproperlyConfigured(f"Unknown CV_OCR_BACKEND {name!r}; expected 'auto' or one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+def get_backend():
+    """The process-wide OCR backend, created on first use"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = make_backend()
+        return _backend
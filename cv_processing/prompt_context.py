@@ -0,0 +1,108 @@
+"""Compact, token-budgeted CV context for LLM prompts
+
+Candidates are ranked by vector similarity to the query and packed one
+line each, the sections the query asks about first, until
+CV_PROMPT_TOKEN_BUDGET is spent. Only the selected candidates are ever
+serialized, however large the corpus.
+"""
+from collections import namedtuple
+from django.conf import settings
+from .cv_facts import DEGREE_NAMES, UNKNOWN_DEGREE, compute_facts
+from . import vector_index
+
+# Rough characters per token of English text, enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+# Packing order of the sections the query doesn't mention
+SECTION_ORDER = ['skills', 'work_experience', 'education', 'projects', 'certifications']
+SECTION_LABELS = {
+    'skills': 'Skills',
+    'work_experience': 'Experience',
+    'education': 'Education',
+    'projects': 'Projects',
+    'certifications': 'Certifications',
+}
+# Query word stems that move a section to the front
+SECTION_KEYWORDS = {
+    'skills': ('skill', 'technolog', 'tool', 'language'),
+    'work_experience': ('experience', 'year', 'role', 'job', 'work', 'career', 'employ'),
+    'education': ('education', 'degree', 'stud', 'universit', 'qualification'),
+    'projects': ('project',),
+    'certifications': ('certif', 'licen'),
+}
+# Larger candidate sets are searched unrestricted and filtered afterwards,
+# rather than handing every id to the search as an allow-list
+RESTRICTED_SEARCH_LIMIT = 1000
+# A section is only started if at least this many characters of it fit
+MIN_SECTION_CHARS = 24
+
+# text is one line per candidate; cv_ids are the candidates included, in rank order
+PromptContext = namedtuple('PromptContext', ['text', 'cv_ids', 'tokens'])
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def section_order(query):
+    mentioned = [section for section in SECTION_ORDER if any(word in query for word in SECTION_KEYWORDS[section])]
+    return mentioned + [section for section in SECTION_ORDER if section not in mentioned]
+
+
+def ranked_ids(query, database, k):
+    """Ids of database, the (up to k) most similar to the query first, then the rest in order"""
+    cv_ids = database.keys() if len(database) <= RESTRICTED_SEARCH_LIMIT else None
+    ranked = [cv_id for cv_id, _ in vector_index.search(query, k=k, cv_ids=cv_ids) if cv_id in database]
+    yield from ranked
+    ranked = set(ranked)
+    for cv_id in database:
+        if cv_id not in ranked:
+            yield cv_id
+
+
+def candidate_line(cv_id, data, sections, max_tokens):
+    """One line for a candidate, with whole entries of each section until max_tokens"""
+    # Less one for the newline after it
+    max_chars = max_tokens * CHARS_PER_TOKEN - 1
+    name = data['personal_info'].get('Name', f'Candidate {cv_id}')
+    facts = data.get('facts') or compute_facts(data.get('work_experience') or [], data.get('education') or [])
+    line = f"[{cv_id}] {name}: {facts['experience_years']} years"
+    if facts['highest_degree'] != UNKNOWN_DEGREE:
+        line += f", {DEGREE_NAMES[facts['highest_degree']]}"
+    line += "."
+    for section in sections:
+        entries = [entry for entry in (' '.join(str(entry).split()) for entry in data.get(section) or []) if entry]
+        if not entries:
+            continue
+        text = f" {SECTION_LABELS[section]}: " + "; ".join(entries) + "."
+        room = max_chars - len(line)
+        if len(text) <= room:
+            line += text
+        elif room >= MIN_SECTION_CHARS:
+            # Cut the last section that fits in part, and stop
+            line += text[:room - 1] + "…"
+            break
+        else:
+            break
+    return line
+
+
+def build_context(query, database, budget=None, max_candidates=None):
+    """PromptContext for the most relevant candidates of database that fit in budget tokens"""
+    budget = budget or settings.CV_PROMPT_TOKEN_BUDGET
+    max_candidates = max_candidates or settings.CV_PROMPT_MAX_CANDIDATES
+    slots = min(len(database), max_candidates)
+    sections = section_order(query)
+    lines, cv_ids, used = [], [], 0
+    for cv_id in ranked_ids(query, database, max_candidates):
+        if len(cv_ids) == slots:
+            break
+        # An equal share of what is left, so short lines leave more room for later candidates
+        share = (budget - used) // (slots - len(cv_ids))
+        line = candidate_line(cv_id, database[cv_id], sections, share)
+        tokens = estimate_tokens(line + "\n")
+        if used + tokens > budget:
+            break
+        lines.append(line)
+        cv_ids.append(cv_id)
+        used += tokens
+    return PromptContext("\n".join(lines), cv_ids, used)
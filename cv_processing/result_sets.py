@@ -0,0 +1,122 @@
+"""Candidates matched by a chatbot query, stored server-side per session
+
+The session only holds the id of its latest result set. Follow-up queries
+load just those candidates, and listings are served a page at a time with
+signed cursors and facet counts instead of one long string.
+"""
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from .models import ResultSet
+from .candidates import load_candidates
+from .cv_facts import DEGREE_CHOICES
+from .skill_index import skill_phrases
+
+FOLLOW_UP_PHRASES = ["what about", "their experience", "their skills", "their education"]
+CURSOR_SALT = 'cv_processing.result_sets.cursor'
+# (label, most years) buckets of the experience facet
+EXPERIENCE_BUCKETS = [('0-2', 2), ('3-5', 5), ('6-10', 10), ('11+', None)]
+
+
+def is_follow_up(query):
+    return any(phrase in query for phrase in FOLLOW_UP_PHRASES)
+
+
+def save(session, name, query, cv_ids):
+    """Store cv_ids as the session's latest result set, dropping expired ones"""
+    now = timezone.now()
+    ResultSet.objects.filter(expires_at__lte=now).delete()
+    if session.session_key is None:
+        session.save()
+    result_set = ResultSet.objects.create(
+        session_key=session.session_key,
+        name=name,
+        query=query,
+        cv_ids=list(cv_ids),
+        expires_at=now + timedelta(seconds=settings.CV_RESULT_SET_TTL),
+    )
+    session['result_set'] = result_set.pk
+    return result_set
+
+
+def get(session, result_set_id):
+    """The session's unexpired result set with this id, or None"""
+    if result_set_id is None or session.session_key is None:
+        return None
+    return ResultSet.objects.filter(
+        pk=result_set_id, session_key=session.session_key, expires_at__gt=timezone.now()
+    ).first()
+
+
+def follow_up(query, session):
+    """The non-empty result set a follow-up query refers to, or None"""
+    if not is_follow_up(query):
+        return None
+    result_set = get(session, session.get('result_set'))
+    return result_set if result_set and result_set.cv_ids else None
+
+
+def _experience_bucket(years):
+    for label, most in EXPERIENCE_BUCKETS:
+        if most is None or years <= most:
+            return label
+
+
+def facets(result_set, candidates=None):
+    """Counts over the result set: top skills, degrees and experience ranges
+
+    Computed once per result set and stored with it. candidates may pass
+    the already loaded {cv_id: sections} of exactly these ids.
+    """
+    if result_set.facets is None:
+        if candidates is None:
+            candidates = load_candidates(result_set.cv_ids)
+        skills, degrees, experience = Counter(), Counter(), Counter()
+        for data in candidates.values():
+            skills.update(set(skill_phrases(data['skills'])))
+            degrees[data['facts']['highest_degree']] += 1
+            experience[_experience_bucket(data['facts']['experience_years'])] += 1
+        top_skills = sorted(skills.items(), key=lambda item: (-item[1], item[0]))[:settings.CV_RESULT_FACET_SIZE]
+        result_set.facets = {
+            'skills': [[skill, count] for skill, count in top_skills],
+            'degrees': {name: degrees[level] for level, name in reversed(DEGREE_CHOICES) if degrees[level]},
+            'experience_years': {label: experience[label] for label, _ in EXPERIENCE_BUCKETS if experience[label]},
+        }
+        result_set.save(update_fields=['facets'])
+    return result_set.facets
+
+
+def page(result_set, cursor=None, section=None, size=None):
+    """{'result_set', 'items', 'total', 'next_cursor'} for one page of candidates
+
+    Items carry each candidate's id and name, plus the given section.
+    Raises signing.BadSignature for a cursor not issued for this result set.
+    """
+    size = size or settings.CV_RESULT_PAGE_SIZE
+    offset = 0
+    if cursor:
+        position = signing.loads(cursor, salt=CURSOR_SALT)
+        if position['r'] != result_set.pk:
+            raise signing.BadSignature("Cursor belongs to another result set")
+        offset = position['o']
+    cv_ids = result_set.cv_ids[offset:offset + size]
+    # Candidates deleted since the query are skipped
+    candidates = load_candidates(cv_ids)
+    items = []
+    for cv_id in cv_ids:
+        if cv_id not in candidates:
+            continue
+        data = candidates[cv_id]
+        item = {'cv_id': cv_id, 'name': data['personal_info'].get('Name', f'Candidate {cv_id}')}
+        if section:
+            item[section] = data[section]
+        items.append(item)
+    end = offset + size
+    return {
+        'result_set': result_set.pk,
+        'items': items,
+        'total': len(result_set.cv_ids),
+        'next_cursor': signing.dumps({'r': result_set.pk, 'o': end}, salt=CURSOR_SALT) if end < len(result_set.cv_ids) else None,
+    }
@@ -0,0 +1,106 @@
+import re
+from django.conf import settings
+from django.db import connection
+from .models import CV, CVData, CVText, ExtractionCache
+
+FTS_TABLE = 'cv_processing_cvsearch'
+FTS_COLUMNS = ['work_experience', 'projects', 'certifications', 'raw_text']
+# bm25 weights per column, in FTS_COLUMNS order; work history matters most
+FTS_WEIGHTS = (4.0, 2.0, 1.0, 0.5)
+
+CREATE_FTS_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"cv_id UNINDEXED, {', '.join(FTS_COLUMNS)}, tokenize='porter unicode61')"
+)
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def _stored_pages(cv_data):
+    """Pages of the CV's stored text or None, from cv_data.cv.text when that is already loaded"""
+    if CVData.cv.is_cached(cv_data) and CV.text.is_cached(cv_data.cv):
+        text = CV.text.related.get_cached_value(cv_data.cv)
+        return text.pages if text is not None else None
+    return CVText.objects.filter(cv_id=cv_data.cv_id).values_list('pages', flat=True).first()
+
+
+def _document(cv_data):
+    pages = _stored_pages(cv_data)
+    raw_text = CVText.join(pages) if pages is not None else ''
+    # CVs stored before their text was kept may still have it in the extraction cache
+    if pages is None and cv_data.cv.content_hash:
+        raw_text = ExtractionCache.objects.filter(content_hash=cv_data.cv.content_hash).values_list('raw_text', flat=True).first() or ''
+    return [
+        '\n'.join(cv_data.work_experience),
+        '\n'.join(cv_data.projects),
+        '\n'.join(cv_data.certifications),
+        raw_text,
+    ]
+
+
+def index_cv_data(cv_data):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [cv_data.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, cv_id, {', '.join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s, %s, %s)",
+            [cv_data.pk, cv_data.cv_id, *_document(cv_data)],
+        )
+
+
+def remove_cv_data(cv_data_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [cv_data_id])
+
+
+def build_match_query(text):
+    """Turn user text into an FTS5 MATCH expression without exposing FTS syntax errors
+
+    Plain text is searched as one phrase. "Quoted phrases" and prefix* terms
+    can be combined, in which case every part must match.
+    """
+    parts = re.findall(r'"([^"]+)"|(\S+)', text)
+    if not any(phrase or word.endswith('*') for phrase, word in parts):
+        words = re.findall(r'\w+', text)
+        return '"' + ' '.join(words) + '"' if words else ''
+    terms = []
+    for phrase, word in parts:
+        if phrase:
+            words = re.findall(r'\w+', phrase)
+            if words:
+                terms.append('"' + ' '.join(words) + '"')
+        else:
+            words = re.findall(r'\w+', word)
+            if words:
+                terms.append('"' + ' '.join(words) + '"' + ('*' if word.endswith('*') else ''))
+    return ' '.join(terms)
+
+
+def search(text, limit=None):
+    """CV ids (as strings) best matching text, ranked by bm25"""
+    limit = limit or settings.CV_SEARCH_TOP_K
+    match_query = build_match_query(text)
+    if not match_query:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT cv_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, 0, {', '.join(map(str, FTS_WEIGHTS))}) LIMIT %s",
+            [match_query, limit],
+        )
+        return list(dict.fromkeys(str(cv_id) for cv_id, in cursor.fetchall()))
+
+
+def match_count(text):
+    """How many CVs match text in all, however many search() returns"""
+    match_query = build_match_query(text)
+    if not match_query:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(DISTINCT cv_id) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match_query])
+        return cursor.fetchone()[0]
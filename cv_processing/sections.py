@@ -0,0 +1,166 @@
+import re
+from django.conf import settings
+
+# Heading phrases per section, matched case-insensitively as whole words.
+# CV_SECTION_HEADINGS in settings adds phrases (e.g. other languages) to these.
+DEFAULT_HEADINGS = {
+    'education': [
+        'education', 'academic background', 'academic qualifications', 'qualifications',
+        'ausbildung', 'formation', 'formación', 'formación académica', 'educación',
+        'formação', 'formação académica', 'istruzione', 'opleiding',
+    ],
+    'work_experience': [
+        'experience', 'work experience', 'professional experience', 'employment history',
+        'work history', 'career history', 'employment',
+        'berufserfahrung', 'expérience', 'expérience professionnelle', 'experiencia',
+        'experiencia laboral', 'experiência profissional', 'esperienza lavorativa',
+        'esperienze professionali', 'werkervaring',
+    ],
+    'skills': [
+        'skills', 'technical skills', 'core competencies', 'competencies',
+        'kenntnisse', 'fähigkeiten', 'compétences', 'habilidades', 'competências',
+        'competenze', 'vaardigheden',
+    ],
+    'projects': ['projects', 'projekte', 'projets', 'proyectos', 'projetos', 'progetti', 'projecten'],
+    'certifications': [
+        'certifications', 'certificates', 'licenses and certifications',
+        'zertifikate', 'zertifizierungen', 'certificaciones', 'certificações',
+        'certificazioni', 'certificaten',
+    ],
+}
+
+# Words allowed in lower case inside an otherwise Title Case heading
+MINOR_WORDS = {'and', 'of', 'the', 'in', 'for', '&', 'und', 'et', 'y', 'e', 'de', 'en'}
+
+# Bullets and list numbering stripped from the start of a heading
+LEADING_MARKS = '0123456789.)•*·-–—>#| \t'
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+PHONE_PATTERN = re.compile(r'\(\d{3}\)\s*\d{3}-\d{4}')
+
+
+def heading_vocabulary(extra=None):
+    """DEFAULT_HEADINGS merged with extra {section: [phrases]}"""
+    vocabulary = {section: list(phrases) for section, phrases in DEFAULT_HEADINGS.items()}
+    for section, phrases in (extra or {}).items():
+        if section not in vocabulary:
+            raise ValueError(f"Unknown CV section '{section}' in heading vocabulary")
+        vocabulary[section].extend(phrases)
+    return vocabulary
+
+
+class SectionClassifier:
+    """Decide whether a line is a section heading, and for which section
+
+    A line is a heading when it is one of the phrases on its own (allowing a
+    bullet or number before and a colon after), or when it is short,
+    contains a phrase as a whole word, and is formatted like a heading:
+    ending in a colon, in capitals, or in Title Case. Sentences that merely
+    mention "experience" are not.
+
+    Every check is ordered cheapest first: a space count, then a set lookup
+    of the line's words against the vocabulary's, so the single compiled
+    alternation of all phrases only runs on the few short, heading-like
+    lines that share a word with it.
+    """
+
+    def __init__(self, headings=None, max_heading_words=None):
+        if headings is None:
+            headings = heading_vocabulary(settings.CV_SECTION_HEADINGS)
+        self.max_heading_words = max_heading_words or settings.CV_SECTION_MAX_HEADING_WORDS
+        self.sections = list(headings)
+        self.exact = {}
+        self.words = set()
+        alternatives = []
+        for index, section in enumerate(self.sections):
+            phrases = {self.normalize(phrase.lower()) for phrase in headings[section]}
+            for phrase in phrases:
+                self.exact.setdefault(phrase, section)
+                self.words.update(phrase.split())
+            # Longest phrases first so "work experience" wins over "experience"
+            ordered = sorted(phrases, key=len, reverse=True)
+            alternatives.append(f"(?P<s{index}>{'|'.join(re.escape(phrase) for phrase in ordered)})")
+        self.words -= MINOR_WORDS
+        self.keyword_pattern = re.compile(rf"(?<!\w)(?:{'|'.join(alternatives)})(?!\w)")
+
+    @staticmethod
+    def normalize(lowered):
+        """Drop a leading bullet or number and a trailing colon, and collapse whitespace"""
+        return ' '.join(lowered.lstrip(LEADING_MARKS).rstrip(': ').split())
+
+    def split_inline(self, line):
+        """(section, rest of line) for a "Heading: content" line, or (None, line)"""
+        head, colon, rest = line.partition(':')
+        rest = rest.strip()
+        if colon and rest:
+            section = self.exact.get(self.normalize(head.lower()))
+            if section:
+                return section, rest
+        return None, line
+
+    def classify(self, line):
+        """The section a stripped line is the heading of, or None"""
+        # Most lines are prose; counting spaces rejects them before anything else runs
+        if line.count(' ') >= self.max_heading_words:
+            return None
+        lowered = line.lower()
+        if self.words.isdisjoint(lowered.replace(':', ' ').replace(',', ' ').replace('/', ' ').split()):
+            return None
+        section = self.exact.get(self.normalize(lowered))
+        if section:
+            return section
+        if not self.looks_like_heading(line):
+            return None
+        match = self.keyword_pattern.search(lowered)
+        if match:
+            return self.sections[int(match.lastgroup[1:])]
+        return None
+
+    @staticmethod
+    def looks_like_heading(line):
+        if line.endswith(':') or line.isupper():
+            return True
+        return all(
+            not word[0].isalpha() or word[0].isupper() or word.lower() in MINOR_WORDS
+            for word in line.split()
+        )
+
+    def parse_lines(self, lines):
+        """Split lines into the CV sections in one pass"""
+        cv_data = {
+            'personal_info': {},
+            'education': [],
+            'work_experience': [],
+            'skills': [],
+            'projects': [],
+            'certifications': []
+        }
+        current_section = None
+        classify = self.classify
+        split_inline = self.split_inline
+        max_spaces = self.max_heading_words
+
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if ':' in line:
+                section, content = split_inline(line)
+                if section:
+                    current_section = section
+                    cv_data[section].append(content)
+                    continue
+            # The space count is repeated here to skip the call for long lines
+            section = classify(line) if line.count(' ') < max_spaces else None
+            if section:
+                current_section = section
+            # Cheap character checks keep the regexes off lines that can't match
+            elif '@' in line and EMAIL_PATTERN.search(line):
+                cv_data['personal_info']['Email'] = line.split('$')[0].strip()
+            elif '(' in line and PHONE_PATTERN.search(line):
+                cv_data['personal_info']['Phone'] = line.split('$')[0].strip()
+            elif not current_section and len(line.split()) <= 3 and not any(c.isdigit() for c in line):
+                cv_data['personal_info']['Name'] = line
+            elif current_section:
+                cv_data[current_section].append(line)
+
+        return cv_data
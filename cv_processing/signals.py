@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import CV, CVData
+from . import search, skill_index, vector_index
+from .candidates import bump_corpus_version
+
+
+@receiver(post_save, sender=CVData)
+def index_skills(sender, instance, **kwargs):
+    # Deleting a CVData cascades to its SkillIndex rows, so only saves need handling
+    skill_index.index_cv_data(instance)
+
+
+@receiver(post_save, sender=CVData)
+def index_search(sender, instance, **kwargs):
+    search.index_cv_data(instance)
+
+
+@receiver(post_delete, sender=CVData)
+def unindex_search(sender, instance, **kwargs):
+    search.remove_cv_data(instance.pk)
+
+
+# Other processes map the vector index files, so only committed rows are written to them
+@receiver(post_save, sender=CVData)
+def index_vectors(sender, instance, **kwargs):
+    transaction.on_commit(lambda: vector_index.index_cv_datas([instance]))
+
+
+@receiver(post_delete, sender=CVData)
+def unindex_vectors(sender, instance, **kwargs):
+    cv_data_id = instance.pk
+    transaction.on_commit(lambda: vector_index.remove_cv_data(cv_data_id))
+
+
+@receiver(post_save, sender=CV)
+@receiver(post_delete, sender=CV)
+@receiver(post_save, sender=CVData)
+@receiver(post_delete, sender=CVData)
+def invalidate_corpus(sender, **kwargs):
+    bump_corpus_version()
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import weakref
+from .metrics import LLM_COALESCED
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Flight:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; callers arriving meanwhile wait for and share its result
+
+    do() coalesces threads, ado() coroutines on the same event loop. Nothing
+    is kept once a call finishes, so results are only shared while in flight.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._flights = weakref.WeakKeyDictionary()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            LLM_COALESCED.inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    async def ado(self, key, fn):
+        """do() for a coroutine function fn
+
+        The call runs as a task of its own that every caller awaits through a
+        shield, so a caller that is cancelled, the first one included, leaves
+        it running for the rest. It is cancelled once no caller is left.
+        """
+        loop = asyncio.get_running_loop()
+        flights = self._flights.setdefault(loop, {})
+        flight = flights.get(key)
+        if flight is None:
+            flight = flights[key] = _Flight(loop.create_task(fn()))
+
+            def finished(task):
+                if flights.get(key) is flight:
+                    del flights[key]
+            flight.task.add_done_callback(finished)
+        else:
+            LLM_COALESCED.inc()
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
@@ -0,0 +1,78 @@
+import re
+from django.db.models import Count
+from .models import SkillIndex
+
+SKILL_SEPARATORS = re.compile(r'[,;|•]')
+SKILL_STRIP = ' \t-*·.()[]'
+
+
+def canonical_skill(skill):
+    """Lowercase a single skill and drop list labels ("Languages: Python"), bullets and extra spaces"""
+    skill = skill.split(':')[-1]
+    return ' '.join(skill.lower().strip(SKILL_STRIP).split())
+
+
+def skill_phrases(skills):
+    """Canonical whole skills listed in a CV's skills section
+
+    "Python/Django" lists two skills while "CI/CD" and "PL/SQL" are one, so a
+    slashed skill is given both whole and split at its slashes.
+    """
+    for line in skills:
+        for part in SKILL_SEPARATORS.split(line):
+            phrase = canonical_skill(part)
+            if phrase:
+                yield phrase
+            if '/' in phrase:
+                yield from (sub for sub in (canonical_skill(sub) for sub in phrase.split('/')) if sub)
+
+
+def skill_tokens(skills):
+    """Canonical tokens for a CV's skills section
+
+    Each listed skill is indexed as a whole phrase and, for multi-word skills,
+    word by word, so "machine learning" and "learning" both match
+    "Machine Learning" while "java" never matches "javascript".
+    """
+    tokens = set()
+    for phrase in skill_phrases(skills):
+        tokens.add(phrase)
+        words = phrase.split()
+        if len(words) > 1:
+            tokens.update(word.strip(SKILL_STRIP) for word in words if word.strip(SKILL_STRIP))
+    return {token[:255] for token in tokens}
+
+
+def index_cv_data(cv_data):
+    SkillIndex.objects.filter(cv_data=cv_data).delete()
+    SkillIndex.objects.bulk_create([
+        SkillIndex(token=token, cv_id=cv_data.cv_id, cv_data=cv_data)
+        for token in skill_tokens(cv_data.skills)
+    ])
+
+
+def index_many(cv_datas):
+    """Index freshly bulk-created CVData rows, which skip the post_save signal"""
+    SkillIndex.objects.bulk_create([
+        SkillIndex(token=token, cv_id=cv_data.cv_id, cv_data=cv_data)
+        for cv_data in cv_datas
+        for token in skill_tokens(cv_data.skills)
+    ], ignore_conflicts=True)
+
+
+def parse_skill_query(text):
+    """Split "python and sql" / "python or java" into canonical skills and whether all must match"""
+    match_all = not re.search(r'\s+or\s+', text, re.IGNORECASE)
+    parts = re.split(r'\s+(?:and|or)\s+|,', text, flags=re.IGNORECASE)
+    return [skill for skill in (canonical_skill(part) for part in parts) if skill], match_all
+
+
+def find_cvs(skills, match_all=True):
+    """Ids (as strings) of CVs having all (or any) of the given canonical skills"""
+    tokens = set(skills)
+    if not tokens:
+        return []
+    rows = SkillIndex.objects.filter(token__in=tokens).values('cv_id')
+    if match_all:
+        rows = rows.annotate(matched=Count('token', distinct=True)).filter(matched=len(tokens))
+    return sorted({str(row['cv_id']) for row in rows}, key=int)
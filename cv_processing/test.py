@@ -1,11 +1,124 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+import docx
+from lxml import etree
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import CV, CVData
-from .cv_processor import CVProcessor
+from .models import CV, CVData, CVText, IngestFile, ExtractionCache, ResultSet
+from .cv_processor import CVProcessor, PARSER_VERSION
+from .candidates import load_corpus, load_snapshot
+from .llm_interface import LLMInterface, llm_cache
+from .llm_client import LLMClient
+from .search import search
+from .single_flight import SingleFlight
+from .matching import Criterion, parse_criteria, rank_candidates
+from .cv_facts import BACHELOR, MASTER, UNKNOWN_DEGREE, degree_level
+from . import candidates, jobs, matching, metrics, ocr, vector_index, worker
+
+TEST_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+
+class StubInferenceServer:
+    """Local stand-in for the inference API; replies with the queued (status, body) pairs, then repeats the last"""
+
+    def __init__(self, *replies, delay=0):
+        self.replies = list(replies)
+        self.delay = delay
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                stub.requests.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+                status, body = stub.replies.pop(0) if len(stub.replies) > 1 else stub.replies[0]
+                time.sleep(stub.delay)
+                # String bodies are sent verbatim as a server-sent-event stream
+                content = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'text/event-stream' if isinstance(body, str) else 'application/json')
+                    self.send_header('Content-Length', str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client gave up on the call
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/models/stub"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_docx(lines):
+    document = docx.Document()
+    for line in lines:
+        document.add_paragraph(line)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_pdf(page_texts):
+    """Build a minimal PDF with one text line per page; empty strings give blank (scanned-like) pages"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode() if text else b""
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+    output = io.BytesIO(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = output.tell()
+    output.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    output.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    output.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return output.getvalue()
 
 class CVProcessingTests(TestCase):
     def setUp(self):
         self.processor = CVProcessor()
+        # Each test gets its own vector index, built from its own rows on first use
+        index_path = tempfile.mkdtemp(dir=TEST_MEDIA_ROOT)
+        self.addCleanup(shutil.rmtree, index_path, ignore_errors=True)
+        index_dir = override_settings(CV_VECTOR_INDEX_DIR=index_path)
+        index_dir.enable()
+        self.addCleanup(index_dir.disable)
+        # Ongoing roles were already recounted this year, so query counts hold in any test order
+        counted_year = mock.patch.object(candidates, '_counted_year', datetime.now().year)
+        counted_year.start()
+        self.addCleanup(counted_year.stop)
 
     def test_pdf_upload(self):
         pdf_content = b"Name: Test\nEducation\n- BS Computer Science\nExperience\n- Developer, 2020-2022"
@@ -30,4 +143,843 @@ class CVProcessingTests(TestCase):
         )
         response = self.client.post('/chatbot/', {'query': 'Find candidates with skill Python'})
         self.assertEqual(response.status_code, 200)
-        self.assertIn("Found 1 candidates with skill Python", response.json()['response'])
\ No newline at end of file
+        self.assertIn("Found 1 candidates with skill Python", response.json()['response'])
+
+    @override_settings(CV_INGEST_EAGER=True, MEDIA_ROOT=TEST_MEDIA_ROOT)
+    def test_upload_returns_job_with_file_states(self):
+        docx_file = SimpleUploadedFile("jane.docx", make_docx(["Jane Doe", "Skills", "Python"]))
+        broken_file = SimpleUploadedFile("notes.txt", b"plain text")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/upload/', {'cv_files': [docx_file, broken_file]})
+        job_id = response.json()['job_id']
+
+        status = self.client.get(f'/jobs/{job_id}/').json()
+        self.assertTrue(status['done'])
+        self.assertEqual(status['counts'][IngestFile.PARSED], 1)
+        self.assertEqual(status['counts'][IngestFile.FAILED], 1)
+        states = {f['filename']: f for f in status['files']}
+        self.assertIn('parsed', states['jane.docx']['timings'])
+        self.assertEqual(states['notes.txt']['error'], "Unsupported file format")
+        self.assertEqual(CVData.objects.get().skills, ["Python"])
+
+    @override_settings(CV_INGEST_EAGER=False, CV_INGEST_WORKERS=2, MEDIA_ROOT=TEST_MEDIA_ROOT)
+    def test_pooled_ingestion_stores_worker_results_from_this_process(self):
+        names = ["Ann Lee", "Bob Ray", "Cy Dee"]
+        files = [SimpleUploadedFile(f"{name.split()[0]}.docx", make_docx([name, "Skills", "Python"])) for name in names]
+        finished = []
+        # A fresh pool of spawned workers, which can't see this test's database; their results are
+        # held back and stored below, as the pool's callback would in this process
+        with mock.patch.object(jobs, '_executor', None), \
+                mock.patch.object(jobs, '_finished', side_effect=lambda *args: finished.append(args)):
+            with self.captureOnCommitCallbacks(execute=True):
+                job_id = self.client.post('/upload/', {'cv_files': files}).json()['job_id']
+            deadline = time.monotonic() + 60
+            while len(finished) < len(files) and time.monotonic() < deadline:
+                time.sleep(0.05)
+            jobs.get_executor().shutdown()
+        self.assertEqual(self.client.get(f'/jobs/{job_id}/').json()['counts'][IngestFile.QUEUED], 3)
+        for args in finished:
+            jobs._finished(*args)
+
+        status = self.client.get(f'/jobs/{job_id}/').json()
+        self.assertEqual(status['counts'][IngestFile.PARSED], 3)
+        self.assertEqual(set(status['files'][0]['timings']), {IngestFile.EXTRACTING, IngestFile.PARSED})
+        self.assertEqual(sorted(CVData.objects.values_list('personal_info__Name', flat=True)), names)
+        self.assertEqual(CVText.objects.count(), 3)
+
+    def test_pdf_ocr_only_runs_on_pages_without_text(self):
+        text_page = "Jane Doe has a text layer on this page with enough characters"
+        path = tempfile.mktemp(suffix=".pdf", dir=TEST_MEDIA_ROOT)
+        with open(path, 'wb') as f:
+            f.write(make_pdf([text_page, "", text_page, ""]))
+        processor = CVProcessor(ocr_workers=2)
+        with mock.patch.object(CVProcessor, 'ocr_page', side_effect=lambda path, n: f"ocr page {n}") as ocr_page:
+            text = processor.read_pdf(path)
+        self.assertEqual(sorted(call.args[1] for call in ocr_page.call_args_list), [1, 3])
+        self.assertEqual(text.splitlines(), [text_page, "ocr page 1", text_page, "ocr page 3"])
+
+        # A short text layer is kept when OCR fails or reads less of the page
+        with open(path, 'wb') as f:
+            f.write(make_pdf([text_page, "Skills Python SQL", "Skills Go"]))
+        ocr_results = {1: RuntimeError("tesseract is not installed"), 2: "Sk"}
+
+        def ocr(path, n):
+            if isinstance(ocr_results[n], Exception):
+                raise ocr_results[n]
+            return ocr_results[n]
+        with mock.patch.object(CVProcessor, 'ocr_page', side_effect=ocr):
+            self.assertEqual(processor.extract_pages(path), ([text_page, "Skills Python SQL", "Skills Go"], CVText.PDF_TEXT))
+
+    @override_settings(CV_INGEST_EAGER=True, MEDIA_ROOT=TEST_MEDIA_ROOT)
+    def test_repeat_upload_reuses_cached_extraction(self):
+        content = make_docx(["Jane Doe", "Skills", "Python"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/upload/', {'cv_files': [SimpleUploadedFile("jane.docx", content)]})
+        with mock.patch.object(CVProcessor, 'extract_pages') as extract_pages:
+            response = self.client.post('/upload/', {'cv_files': [SimpleUploadedFile("jane_again.docx", content)]})
+        extract_pages.assert_not_called()
+
+        status = self.client.get(f"/jobs/{response.json()['job_id']}/").json()
+        self.assertTrue(status['files'][0]['cache_hit'])
+        self.assertEqual([data.skills for data in CVData.objects.all()], [["Python"], ["Python"]])
+        self.assertEqual(ExtractionCache.objects.get().hits, 1)
+
+    def test_pdf_pages_are_streamed_with_bounded_ocr_window(self):
+        text_page = "Work Experience: Acme Corp, developer from 2018 to 2022 in Python"
+        path = tempfile.mktemp(suffix=".pdf", dir=TEST_MEDIA_ROOT)
+        with open(path, 'wb') as f:
+            f.write(make_pdf([text_page, "", "", "", text_page]))
+        processor = CVProcessor(ocr_workers=2)
+        with mock.patch.object(CVProcessor, 'ocr_page', side_effect=lambda path, n: f"ocr page {n}") as ocr_page:
+            pages = processor.iter_pdf_pages(path)
+            self.assertEqual(next(pages), text_page)
+            self.assertEqual(ocr_page.call_count, 0)
+            self.assertEqual(next(pages), "ocr page 1")
+            # Page 1 was released before page 4 was rasterized
+            self.assertLessEqual(ocr_page.call_count, 3)
+            self.assertEqual(list(pages), ["ocr page 2", "ocr page 3", text_page])
+            cv_data = processor.process_file(path)
+        # The first page opens the section; later pages are parsed into it as they arrive
+        self.assertEqual(cv_data['work_experience'][:4], [
+            "Acme Corp, developer from 2018 to 2022 in Python", "ocr page 1", "ocr page 2", "ocr page 3"])
+
+    @override_settings(CV_TESSERACT_CMD='/usr/local/bin/tesseract', CV_OCR_LANG='eng')
+    def test_ocr_backends_reuse_engines_and_fall_back_to_pytesseract(self):
+        engines = []
+
+        class FakeEngine:
+            def __init__(self, **kwargs):
+                engines.append(kwargs)
+
+            def SetImage(self, image):
+                self.image = image
+
+            def GetUTF8Text(self):
+                return f"text of {self.image}"
+
+            def Clear(self):
+                self.image = None
+
+        with mock.patch.object(ocr, 'tesserocr', mock.Mock(PyTessBaseAPI=FakeEngine)):
+            backend = ocr.make_backend('auto')
+            self.assertEqual(backend.name, 'tesserocr')
+            # Models are loaded once, when the backend is created, not per page
+            with mock.patch('pdf2image.convert_from_path', side_effect=lambda *a, **kw: [f"page {kw['first_page']}"]):
+                processor = CVProcessor(ocr_backend=backend)
+                self.assertEqual([processor.ocr_page("cv.pdf", n) for n in range(3)],
+                                 ["text of page 1", "text of page 2", "text of page 3"])
+            self.assertEqual(engines, [{'lang': 'eng'}])
+
+        with mock.patch.object(ocr, 'tesserocr', None), \
+                mock.patch.object(ocr.pytesseract.pytesseract, 'tesseract_cmd', 'tesseract'):
+            backend = ocr.make_backend('auto')
+            self.assertEqual(backend.name, 'pytesseract')
+            self.assertEqual(ocr.pytesseract.pytesseract.tesseract_cmd, '/usr/local/bin/tesseract')
+            with self.assertRaises(ImproperlyConfigured):
+                ocr.make_backend('tesserocr')
+
+    def test_views_import_without_extraction_stack_until_warmup(self):
+        code = (
+            "import django, json, sys; django.setup(); import cv_processing.views\n"
+            "heavy = lambda: sorted(m for m in ('PyPDF2', 'pdf2image', 'pytesseract', 'lxml.etree') if m in sys.modules)\n"
+            "print(json.dumps(heavy()))\n"
+            "from cv_processing.warmup import warmup; warmup()\n"
+            "from cv_processing.cv_processor import get_processor\n"
+            "from cv_processing.llm_interface import get_llm_interface\n"
+            "print(json.dumps([heavy(), get_processor() is get_processor(), get_llm_interface() is get_llm_interface()]))\n"
+        )
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'cv_analyzer.settings'}).stdout
+        before, after = [json.loads(line) for line in output.splitlines() if line.startswith('[')]
+        self.assertEqual(before, [])
+        self.assertEqual(after, [['PyPDF2', 'lxml.etree', 'pdf2image', 'pytesseract'], True, True])
+
+    def test_docx_text_includes_tables_headers_and_text_boxes_in_order(self):
+        document = docx.Document()
+        document.sections[0].header.paragraphs[0].text = "Jane Doe"
+        document.add_paragraph("Skills")
+        table = document.add_table(rows=2, cols=2)
+        table.cell(0, 0).text, table.cell(0, 1).text = "Python", "5 years"
+        table.cell(1, 0).text = "SQL"
+        layout = document.add_table(rows=1, cols=2)
+        layout.cell(0, 0).text = "Experience"
+        layout.cell(0, 0).add_paragraph("Engineer at Acme 2018-2022")
+        layout.cell(0, 1).text = "Education"
+        layout.cell(0, 1).add_paragraph("BSc Physics")
+        anchor = document.add_paragraph("Projects")
+        # A text box as Word writes it, with the VML copy for older readers
+        anchor._p.append(etree.fromstring(
+            '<w:r xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+            ' xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"><mc:AlternateContent>'
+            '<mc:Choice Requires="wps"><w:drawing><w:txbxContent><w:p><w:r><w:t>CV parser</w:t></w:r></w:p></w:txbxContent></w:drawing></mc:Choice>'
+            '<mc:Fallback><w:pict><w:txbxContent><w:p><w:r><w:t>CV parser</w:t></w:r></w:p></w:txbxContent></w:pict></mc:Fallback>'
+            '</mc:AlternateContent></w:r>'
+        ))
+        path = os.path.join(TEST_MEDIA_ROOT, "layout.docx")
+        document.save(path)
+
+        self.assertEqual(self.processor.read_docx(path).split("\n"), [
+            "Jane Doe", "Skills", "Python | 5 years", "SQL",
+            "Experience", "Engineer at Acme 2018-2022", "Education", "BSc Physics",
+            "CV parser", "Projects",
+        ])
+        cv_data = self.processor.process_file(path)
+        self.assertEqual(cv_data['personal_info']['Name'], "Jane Doe")
+        self.assertEqual(cv_data['skills'], ["Python | 5 years", "SQL"])
+        self.assertEqual(cv_data['work_experience'], ["Engineer at Acme 2018-2022"])
+
+    def test_section_headings_need_heading_form_and_can_be_localized(self):
+        text = "\n".join([
+            "Jane Doe",
+            "jane@example.com",
+            "PROFESSIONAL EXPERIENCE",
+            "Built skills assessments for 3 teams with experience in hiring",
+            "Skills: Python, SQL",
+            "Go",
+            "2. Ausbildung",
+            "MSc Informatik",
+            "Tech Stack",
+            "Kubernetes",
+        ])
+        cv_data = self.processor.parse_text(text)
+        self.assertEqual(cv_data['personal_info'], {"Name": "Jane Doe", "Email": "jane@example.com"})
+        self.assertEqual(cv_data['work_experience'], ["Built skills assessments for 3 teams with experience in hiring"])
+        self.assertEqual(cv_data['skills'], ["Python, SQL", "Go"])
+        self.assertEqual(cv_data['education'], ["MSc Informatik", "Tech Stack", "Kubernetes"])
+
+        with override_settings(CV_SECTION_HEADINGS={'skills': ['tech stack']}):
+            first, second = CVProcessor().parse_many([text, "Tech Stack:\nRust"])
+        self.assertEqual(first['education'], ["MSc Informatik"])
+        self.assertEqual(first['skills'], ["Python, SQL", "Go", "Kubernetes"])
+        self.assertEqual(second['skills'], ["Rust"])
+
+    def test_skill_query_uses_whole_skill_tokens(self):
+        for name, skills in [("Ann", ["Languages: Java, SQL"]), ("Bob", ["JavaScript", "SQL"]), ("Cy", ["Machine Learning"])]:
+            CVData.objects.create(cv=CV.objects.create(filename=f"{name}.pdf"), personal_info={"Name": name}, skills=skills)
+
+        response = self.client.post('/chatbot/', {'query': 'Find candidates with skill java'})
+        self.assertEqual(response.json()['response'], "Found 1 candidates with skill java")
+        response = self.client.post('/chatbot/', {'query': 'Find candidates with skills SQL and javascript'})
+        self.assertEqual(response.json()['response'], "Found 1 candidates with skill SQL and javascript")
+        response = self.client.post('/chatbot/', {'query': 'Find candidates with skill java or machine learning'})
+        self.assertEqual(len(ResultSet.objects.get(pk=self.client.session['result_set']).cv_ids), 2)
+
+        # Slashed skills match whole and by their parts
+        CVData.objects.create(cv=CV.objects.create(filename="dee.pdf"), personal_info={"Name": "Dee"},
+                              skills=["CI/CD, PL/SQL", "Python/Django"])
+        for query, found in [("CI/CD", 1), ("pl/sql", 1), ("django", 1), ("SQL", 3)]:
+            response = self.client.post('/chatbot/', {'query': f'Find candidates with skill {query}'})
+            self.assertEqual(response.json()['response'], f"Found {found} candidates with skill {query}")
+        CVData.objects.get(personal_info__Name="Dee").delete()
+
+        CVData.objects.get(personal_info__Name="Ann").delete()
+        response = self.client.post('/chatbot/', {'query': 'Find candidates with skill java'})
+        self.assertEqual(response.json()['response'], "Found 0 candidates with skill java")
+
+    def test_candidate_snapshot_is_one_query_and_invalidated_by_signals(self):
+        for name in ["Ann", "Bob", "Cy"]:
+            CVData.objects.create(cv=CV.objects.create(filename=f"{name}.pdf"), personal_info={"Name": name})
+        CV.objects.create(filename="pending.pdf")
+        with self.assertNumQueries(2):
+            database = load_corpus()
+        self.assertEqual(database[str(CV.objects.get(filename="pending.pdf").id)]['skills'], [])
+        with self.assertNumQueries(1):
+            self.assertIs(load_corpus(), database)
+
+        CVData.objects.filter(personal_info__Name="Bob").get().delete()
+        self.assertEqual(len([c for c in load_corpus().values() if c['personal_info']]), 2)
+
+    def test_degree_abbreviations_need_degree_context(self):
+        cv_data = CVData.objects.create(
+            cv=CV.objects.create(filename="dba.pdf"),
+            education=["MS SQL Server certification", "BS Computer Science, Boston University, Boston, MA"],
+        )
+        self.assertEqual(cv_data.highest_degree, BACHELOR)
+        self.assertEqual([degree_level(text) for text in ["MS Office", "BA at Acme", "M.S. in Physics", "MS in Data Science"]],
+                         [UNKNOWN_DEGREE, UNKNOWN_DEGREE, MASTER, MASTER])
+        self.assertEqual([c.kind for c in parse_criteria("5 years and MS SQL")], ['years', 'skill'])
+
+    def test_experience_and_degree_are_precomputed_and_matched_in_sql(self):
+        ann = CVData.objects.create(
+            cv=CV.objects.create(filename="ann.pdf"),
+            personal_info={"Name": "Ann"},
+            education=["BS Computer Science", "MSc Data Science"],
+            work_experience=["Engineer, 2010-2014", "Consultant, 2012-2016", "Lead, 2018-2020"],
+            skills=["Python"],
+        )
+        CVData.objects.create(
+            cv=CV.objects.create(filename="bob.pdf"),
+            personal_info={"Name": "Bob"},
+            education=["Bachelor of Arts"],
+            work_experience=["Engineer, 2015-2021"],
+            skills=["Python"],
+        )
+        # 2010-2016 overlaps are counted once, plus 2018-2020
+        self.assertEqual(ann.experience_years, 8)
+        self.assertEqual(CVData.objects.filter(highest_degree__gte=3).get(), ann)
+
+        response = self.client.post('/chatbot/', {'query': 'Identify matching candidates for job requirements: 7 years and python'})
+        self.assertEqual(response.json()['response'], "Matched 1 candidates: Ann (score 5.29: 8/7 years ✓, python ✓)")
+        response = self.client.post('/chatbot/', {'query': "Identify matching candidates for job requirements: 5 years and bachelor's degree"})
+        self.assertEqual(
+            response.json()['response'],
+            "Matched 2 candidates: Ann (score 5: 8/5 years ✓, Master’s (needs Bachelor’s) ✓); "
+            "Bob (score 4.4: 6/5 years ✓, Bachelor’s (needs Bachelor’s) ✓)"
+        )
+
+    def test_ongoing_roles_are_recounted_when_the_year_changes(self):
+        this_year = datetime.now().year
+        ann = CVData.objects.create(
+            cv=CV.objects.create(filename="ann.pdf"),
+            personal_info={"Name": "Ann"},
+            work_experience=["Engineer, 2015-2017", "Lead, 2016-current"],
+        )
+        self.assertEqual((ann.experience_years, ann.experience_until), (this_year - 2015, this_year))
+        # As if saved last year
+        stale = [dict(i, end=this_year - 1) if i['current'] else i for i in ann.experience_intervals]
+        CVData.objects.filter(pk=ann.pk).update(
+            experience_years=this_year - 2016, experience_intervals=stale, experience_until=this_year - 1,
+        )
+        version, database = load_snapshot()
+        self.assertEqual(database[str(ann.cv_id)]['facts']['experience_years'], this_year - 2016)
+
+        with mock.patch.object(candidates, '_counted_year', this_year - 1):
+            new_version, database = load_snapshot()
+        self.assertNotEqual(new_version, version)
+        self.assertEqual(database[str(ann.cv_id)]['facts']['experience_years'], this_year - 2015)
+        ann.refresh_from_db()
+        self.assertEqual((ann.experience_until, ann.experience_intervals[-1]['end']), (this_year, this_year))
+        self.assertEqual(candidates.refresh_ongoing_experience(), 0)
+
+    def test_job_requirements_are_weighted_must_and_nice_to_have(self):
+        def add(name, skills, years):
+            CVData.objects.create(
+                cv=CV.objects.create(filename=f"{name}.pdf"),
+                personal_info={"Name": name},
+                work_experience=[f"Engineer, {2020 - years}-2020"],
+                skills=skills,
+            )
+        add("Ann", ["Python"], 3)
+        add("Bob", ["Python", "Docker", "Kubernetes"], 2)
+        add("Cid", ["Docker", "Kubernetes"], 9)
+
+        criteria = parse_criteria("python and 2 years, nice to have docker and kubernetes")
+        self.assertEqual([(c.kind, c.must) for c in criteria], [
+            ('skill', True), ('years', True), ('skill', False), ('skill', False),
+        ])
+        # Cid lacks the must-have python; Bob's nice-to-haves outweigh Ann's extra year
+        total, top = rank_candidates(criteria)
+        self.assertEqual(total, 2)
+        self.assertEqual([score for _, score, _ in top], [7.0, 6.0])
+        self.assertEqual(top[0][2], ["python ✓", "2/2 years ✓", "docker ✓ (nice to have)", "kubernetes ✓ (nice to have)"])
+        self.assertEqual(len(rank_candidates(criteria, k=1)[1]), 1)
+
+        # "0 years" is dropped when parsed, and met by everyone when passed in directly
+        self.assertEqual(parse_criteria("0 years and python"), criteria[:1])
+        total, top = rank_candidates([Criterion('years', 0, True, 2.0)])
+        self.assertEqual((total, [score for _, score, _ in top]), (3, [2.0, 2.0, 2.0]))
+
+        # A reload after a corpus change leaves arrays handed out earlier intact
+        features = matching._load_features()
+        add("Dee", ["Python"], 4)
+        self.assertEqual(len(matching._load_features()['cv_ids']), 4)
+        self.assertEqual(len(features['cv_ids']), 3)
+
+    @override_settings(CV_RESULT_PAGE_SIZE=2)
+    def test_listings_are_paged_from_server_side_result_sets(self):
+        ids = {}
+        for name, skills, education in [("Ann", ["Python, SQL"], ["MSc Physics"]), ("Bob", ["Python"], ["BSc Maths"]), ("Cy", ["Go"], ["BSc Art"])]:
+            cv = CV.objects.create(filename=f"{name}.pdf")
+            CVData.objects.create(cv=cv, personal_info={"Name": name}, skills=skills, education=education)
+            ids[name] = str(cv.id)
+
+        body = self.client.post('/chatbot/', {'query': 'skills'}).json()
+        self.assertEqual(body['response'], "Skills: Python, SQL, Python (first 2 of 3 candidates)")
+        self.assertEqual(body['facets'], {
+            'skills': [['python', 2], ['go', 1], ['sql', 1]],
+            'degrees': {"Master’s": 1, "Bachelor’s": 2},
+            'experience_years': {'0-2': 3},
+        })
+        url = f"/chatbot/results/{body['result_set']}/"
+        page = self.client.get(url, {'cursor': body['next_cursor'], 'section': 'skills'}).json()
+        self.assertEqual(page['items'], [{'cv_id': ids["Cy"], 'name': "Cy", 'skills': ["Go"]}])
+        self.assertIsNone(page['next_cursor'])
+        self.assertEqual(self.client.get(url, {'cursor': 'forged'}).status_code, 400)
+        # Result sets belong to the session that made them
+        self.assertEqual(Client().get(url).status_code, 404)
+
+        # A follow-up reads only the last result set's candidates, not the snapshot
+        self.client.post('/chatbot/', {'query': 'Find candidates with skill go'})
+        with mock.patch('cv_processing.views.load_snapshot', side_effect=AssertionError), \
+                mock.patch.object(LLMInterface, 'analyze_cv', return_value={'summary': 'Cy'}) as analyze:
+            self.client.post('/chatbot/', {'query': 'What about their education'})
+            # Asking about their skills is a follow-up too, not a search for an empty skill
+            self.client.post('/chatbot/', {'query': 'What about their skills'})
+        self.assertEqual([list(call.args[0]['database']) for call in analyze.call_args_list], [[ids["Cy"]]] * 2)
+        result_set = self.client.session['result_set']
+        response = self.client.post('/chatbot/', {'query': 'Find candidates with skill'})
+        self.assertEqual(response.json()['response'], "Which skill? For example: Find candidates with skill python")
+        self.assertEqual(self.client.session['result_set'], result_set)
+
+        with override_settings(CV_RESULT_SET_TTL=0):
+            self.client.post('/chatbot/', {'query': 'Find candidates with skill python'})
+        self.assertEqual(self.client.get(f"/chatbot/results/{self.client.session['result_set']}/").status_code, 404)
+
+    def test_experience_in_search_is_ranked_full_text(self):
+        def add(name, work_experience, projects=()):
+            return CVData.objects.create(cv=CV.objects.create(filename=f"{name}.pdf"), personal_info={"Name": name},
+                                         work_experience=work_experience, projects=list(projects))
+        ann = add("Ann", ["Analyst at First Bank, retail banking 2015-2018", "Banking operations lead 2018-2022"])
+        bob = add("Bob", ["Developer at Shop 2019-2021"], projects=["Mobile banking app"])
+        add("Cy", ["Embanked river surveys 2010-2012"])
+
+        self.assertEqual(search("banking"), [str(ann.cv_id), str(bob.cv_id)])
+        self.assertEqual(search("retail bank*"), [str(ann.cv_id)])
+        response = self.client.post('/chatbot/', {'query': 'Find candidates with experience in banking'})
+        self.assertEqual(response.json()['response'], "Found 2 candidates with experience in banking")
+        with override_settings(CV_SEARCH_TOP_K=1):
+            response = self.client.post('/chatbot/', {'query': 'Find candidates with experience in banking'})
+        self.assertEqual(response.json()['response'], "Found 2 candidates with experience in banking, top 1")
+
+        ann.cv.delete()
+        self.assertEqual(search("banking"), [str(bob.cv_id)])
+
+    def test_job_description_ranks_by_vector_similarity_and_index_follows_writes(self):
+        def add(name, skills, work_experience):
+            return CVData.objects.create(cv=CV.objects.create(filename=f"{name}.pdf"), personal_info={"Name": name},
+                                         skills=skills, work_experience=work_experience)
+        ann = add("Ann", ["Machine learning", "Python", "PyTorch"], ["Data scientist at Acme 2018-2022"])
+        add("Bob", ["Java", "Spring"], ["Backend developer at Shop 2019-2021"])
+        add("Cy", ["Negotiation"], ["Sales manager at Globex 2010-2020"])
+
+        # The index is built from the database on first use; "ML" matches "machine learning"
+        response = self.client.post('/chatbot/', {'query': "Find candidates for job description: ML engineer, Python"})
+        self.assertTrue(response.json()['response'].startswith("Top 1 candidates for the job description: Ann ("))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dee = add("Dee", ["ML", "Python", "Kubernetes"], ["ML engineer at Initech 2020-2024"])
+        with self.captureOnCommitCallbacks(execute=True):
+            ann.delete()
+        ranked = vector_index.search("machine learning engineer python")
+        self.assertEqual(ranked[0][0], str(dee.cv_id))
+        self.assertNotIn(str(ann.cv_id), [cv_id for cv_id, _ in ranked])
+        self.assertEqual(len(vector_index.get_index()), 3)
+        # A quarter of the rows were cleared, so the files were rewritten without them
+        self.assertEqual(vector_index.get_index()._rows_on_disk(), 3)
+        with override_settings(CV_VECTOR_COMPACT_RATIO=0.5), self.captureOnCommitCallbacks(execute=True):
+            dee.save()
+        self.assertEqual(vector_index.get_index()._rows_on_disk(), 4)
+        index = vector_index.get_index()
+        generation, vectors, ids = index._map()
+        with self.captureOnCommitCallbacks(execute=True):
+            dee.save()
+        self.assertEqual(vector_index.get_index()._rows_on_disk(), 3)
+        # Compaction publishes a new generation; maps of the previous one stay whole
+        self.assertEqual(sorted(name for name in os.listdir(index.directory) if name.startswith('gen-')),
+                         sorted([generation, index._generation()]))
+        self.assertEqual((len(vectors), len(ids)), (4, 4))
+        self.assertEqual(len(index._map()[1]), 3)
+        self.assertEqual(vector_index.search("machine learning engineer python")[0][0], str(dee.cv_id))
+
+        # Appending and clearing rows gives the same ranking as a fresh build
+        self.assertEqual([cv_id for cv_id, _ in vector_index.rebuild().search("machine learning engineer python")],
+                         [cv_id for cv_id, _ in ranked])
+
+    def test_llm_answers_are_cached_per_query_and_corpus_version(self):
+        CVData.objects.create(cv=CV.objects.create(filename="ann.pdf"), personal_info={"Name": "Ann"}, skills=["Python"])
+        llm = LLMInterface()
+        answer = {"summary": "Ann knows Python", "strengths": "-", "recommendations": "-"}
+
+        def ask(query):
+            version, database = load_snapshot()
+            return llm.analyze_cv({"query": query, "database": database}, corpus_version=version)
+
+        with mock.patch.object(LLMInterface, 'query_api', return_value=answer) as query_api:
+            hits = llm_cache.stats()['hits']
+            self.assertEqual(ask("Who knows Python?"), answer)
+            self.assertEqual(ask("  who KNOWS python "), answer)
+            self.assertEqual(query_api.call_count, 1)
+            self.assertEqual(llm_cache.stats()['hits'], hits + 1)
+
+            CVData.objects.create(cv=CV.objects.create(filename="bob.pdf"), personal_info={"Name": "Bob"})
+            ask("Who knows Python?")
+            self.assertEqual(query_api.call_count, 2)
+
+    def test_llm_client_retries_then_circuit_breaker_skips_upstream(self):
+        generated = [{"generated_text": json.dumps({"summary": "ok", "strengths": "-", "recommendations": "-"})}]
+        stub = StubInferenceServer((503, {}), (200, generated), (500, {}))
+        self.addCleanup(stub.close)
+        client = LLMClient(api_url=stub.url, max_retries=1, retry_backoff=0, read_timeout=2)
+        client.breaker.failure_threshold = 2
+        llm = LLMInterface(client=client)
+        cv_data = {"query": "compare their skills", "database": {"1": {"personal_info": {"Name": "Ann"}, "skills": ["Python"]}}}
+
+        # The 503 is retried on the same pooled connection and the second attempt succeeds
+        self.assertEqual(llm.query_api(cv_data, "compare their skills")["summary"], "ok")
+        self.assertEqual(len(stub.requests), 2)
+
+        # Two failed calls (two attempts each) open the circuit; the next one never reaches the stub
+        self.assertIsNone(llm.query_api(cv_data, "compare their skills"))
+        self.assertIsNone(llm.query_api(cv_data, "compare their skills"))
+        self.assertEqual(client.breaker.state, 'open')
+        self.assertEqual(len(stub.requests), 6)
+        analysis = llm.analyze_cv(cv_data)
+        self.assertEqual(len(stub.requests), 6)
+        self.assertIn("Ann has 1 skills", analysis["summary"])
+
+    async def test_llm_client_half_open_trial_is_settled_however_it_ends(self):
+        stub = StubInferenceServer((200, [{"generated_text": "ok"}]), delay=0.3)
+        self.addCleanup(stub.close)
+        client = LLMClient(api_url=stub.url, max_retries=0, read_timeout=2)
+        # Opened a cool-down ago, so the next call is the half-open trial
+        client.breaker.opened_at = time.monotonic() - client.breaker.reset_timeout
+
+        trial = asyncio.create_task(client.apost_json({"inputs": "hi"}))
+        await asyncio.sleep(0.1)
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+        # A cancelled trial says nothing about the upstream; the next call probes it instead
+        self.assertEqual(client.breaker.state, 'half-open')
+        self.assertEqual(await client.apost_json({"inputs": "hi"}), [{"generated_text": "ok"}])
+        self.assertEqual(client.breaker.state, 'closed')
+
+        # An event that isn't an object fails the trial rather than leaving it in flight
+        stub = StubInferenceServer((200, "data: [1]\n\n"))
+        self.addCleanup(stub.close)
+        client = LLMClient(api_url=stub.url, max_retries=0, read_timeout=2)
+        client.breaker.opened_at = time.monotonic() - client.breaker.reset_timeout
+        with self.assertRaises(AttributeError):
+            async for _ in client.astream_tokens({"inputs": "hi"}):
+                pass
+        self.assertEqual(client.breaker.state, 'open')
+        self.assertFalse(client.breaker.trial_in_flight)
+
+    @override_settings(CV_PROMPT_TOKEN_BUDGET=200)
+    def test_llm_prompt_packs_most_relevant_candidates_into_token_budget(self):
+        for i in range(30):
+            CVData.objects.create(
+                cv=CV.objects.create(filename=f"dev{i}.pdf"),
+                personal_info={"Name": f"Dev {i}"},
+                skills=["Java, Spring"],
+                work_experience=[f"Backend developer at Shop {i}, 2015-2020, building payment services in Java"],
+            )
+        cv = CV.objects.create(filename="ops.pdf")
+        CVData.objects.create(cv=cv, personal_info={"Name": "Ops"}, skills=["Kubernetes, Terraform"], education=["BSc Physics"])
+        generated = [{"generated_text": json.dumps({"summary": "Ops", "strengths": "-", "recommendations": "-"})}]
+        stub = StubInferenceServer((200, generated))
+        self.addCleanup(stub.close)
+        llm = LLMInterface(client=LLMClient(api_url=stub.url, read_timeout=2))
+
+        query = "who has worked with kubernetes and terraform"
+        analysis = llm.query_api({"query": query, "database": load_corpus()}, query)
+        prompt = stub.requests[0]["inputs"]
+        self.assertIn(f"[{cv.id}] Ops: 0 years, Bachelor’s. Skills: Kubernetes, Terraform.\n", prompt)
+        # The best match comes first and the rest fill the budget, not the whole corpus
+        self.assertEqual(analysis["cv_ids"][0], str(cv.id))
+        self.assertEqual(len(analysis["cv_ids"]), 10)
+        self.assertIn("(10 of 31 candidates", prompt)
+        self.assertLessEqual(len(prompt.split(":\n", 1)[1].strip()), 200 * 4)
+
+    def test_concurrent_identical_llm_analyses_share_one_upstream_call(self):
+        generated = [{"generated_text": json.dumps({"summary": "Ann fits", "strengths": "-", "recommendations": "-"})}]
+        stub = StubInferenceServer((200, generated), delay=0.3)
+        self.addCleanup(stub.close)
+        llm = LLMInterface(client=LLMClient(api_url=stub.url, read_timeout=2))
+        cv_data = {"query": "who fits a data role", "database": {"1": {"personal_info": {"Name": "Ann"}, "skills": ["SQL"]}}}
+        # Built up front so the threads below only read index files, not the test database
+        vector_index.get_index()
+        coalesced = metrics.LLM_COALESCED.value()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(llm.analyze_cv(cv_data, corpus_version="flight")))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual([result["summary"] for result in results], ["Ann fits"] * 5)
+        self.assertEqual(metrics.LLM_COALESCED.value() - coalesced, 4)
+
+    async def test_cancelled_caller_leaves_the_shared_async_call_to_the_others(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(fetch)
+            await asyncio.sleep(0.1)
+            return "Ann fits"
+
+        first = asyncio.create_task(flights.ado("key", fetch))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flights.ado("key", fetch))
+        await asyncio.sleep(0.01)
+        # The first caller started the call, but cancelling it doesn't cancel the second
+        first.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        self.assertEqual(await second, "Ann fits")
+        self.assertEqual(len(calls), 1)
+
+        # With every caller gone, the call itself is cancelled
+        cancelled = asyncio.Event()
+
+        async def hang():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        only = asyncio.create_task(flights.ado("key", hang))
+        await asyncio.sleep(0.01)
+        only.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+    def test_llm_client_micro_batches_different_prompts(self):
+        outputs = [[{"generated_text": text}] for text in ["a", "b", "c"]]
+        stub = StubInferenceServer((200, outputs))
+        self.addCleanup(stub.close)
+        client = LLMClient(api_url=stub.url, read_timeout=2, batch_window=0.3, batch_size=3)
+
+        results = {}
+        threads = [threading.Thread(target=lambda prompt=prompt: results.update({prompt: client.post_json({"inputs": prompt, "max_length": 400})}))
+                   for prompt in ["first", "second", "third"]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # One upstream call; each caller gets the output for its own prompt
+        self.assertEqual(len(stub.requests), 1)
+        batched = stub.requests[0]["inputs"]
+        self.assertEqual(sorted(batched), ["first", "second", "third"])
+        self.assertEqual(stub.requests[0]["max_length"], 400)
+        for prompt, result in results.items():
+            self.assertEqual(result, outputs[batched.index(prompt)])
+
+    def test_metrics_endpoint_reports_stage_timings_and_counters(self):
+        stage_count = lambda stage: metrics.STAGE_SECONDS.count(stage=stage)
+        before = {stage: stage_count(stage) for stage in ['pdf_text', 'parse', 'llm_call']}
+        fallbacks, retries = metrics.OCR_FALLBACKS.value(), metrics.LLM_RETRIES.value()
+
+        path = tempfile.mktemp(suffix=".pdf", dir=TEST_MEDIA_ROOT)
+        with open(path, 'wb') as f:
+            f.write(make_pdf(["Jane Doe has a text layer on this page with enough characters", ""]))
+        with mock.patch.object(CVProcessor, 'ocr_page', return_value="Skills"):
+            CVProcessor(ocr_workers=1).process_file(path)
+        stub = StubInferenceServer((503, {}), (200, [{"generated_text": "no json"}]))
+        self.addCleanup(stub.close)
+        LLMClient(api_url=stub.url, max_retries=1, retry_backoff=0).post_json({})
+
+        self.assertEqual(stage_count('pdf_text'), before['pdf_text'] + 2)
+        self.assertEqual(stage_count('parse'), before['parse'] + 1)
+        self.assertEqual(stage_count('llm_call'), before['llm_call'] + 1)
+        self.assertEqual(metrics.OCR_FALLBACKS.value(), fallbacks + 1)
+        self.assertEqual(metrics.LLM_RETRIES.value(), retries + 1)
+
+        response = self.client.get('/metrics')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn("# TYPE cv_stage_seconds histogram", body)
+        self.assertIn(f'cv_stage_seconds_count{{stage="parse"}} {stage_count("parse")}', body)
+        self.assertIn(f'cv_stage_seconds_bucket{{stage="parse",le="+Inf"}} {stage_count("parse")}', body)
+        self.assertIn(f"cv_ocr_fallbacks_total {metrics.OCR_FALLBACKS.value()}", body)
+
+        # Values collected in a worker process are added to this one's
+        own = metrics.collect()
+        self.assertEqual(metrics.OCR_FALLBACKS.value(), 0)
+
+        def restore():
+            # The registry is process-wide; later tests see only this process's values again
+            metrics.collect()
+            metrics.merge(own)
+        self.addCleanup(restore)
+        metrics.merge(own)
+        metrics.merge({'cv_ocr_fallbacks_total': {(): 2}})
+        self.assertEqual(metrics.OCR_FALLBACKS.value(), fallbacks + 3)
+
+    async def read_events(self, response):
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        return [(block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+                for block in body.strip().split("\n\n")]
+
+    async def test_stream_chatbot_sends_fallback_sections_as_events(self):
+        for name, skills in [("Ann", ["Python"]), ("Bob", ["Go"])]:
+            cv = await CV.objects.acreate(filename=f"{name}.pdf")
+            await CVData.objects.acreate(cv=cv, personal_info={"Name": name}, skills=skills, education=["MSc Physics"])
+
+        async def api_down(*args):
+            return None
+
+        with mock.patch.object(LLMInterface, 'aquery_api', side_effect=api_down):
+            response = await self.async_client.post('/chatbot/stream/', {'query': 'Compare their education levels'})
+            events = await self.read_events(response)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            self.assertEqual(events[0], ('status', {'candidates': 2}))
+            self.assertEqual([payload['name'] for kind, payload in events if kind == 'section'], ["summary", "strengths", "recommendations"])
+            self.assertIn("Ann’s highest education is a Master’s", json.loads(events[-2][1]['response'])['summary'])
+            self.assertEqual(events[-1][0], 'done')
+
+            response = await self.async_client.post('/chatbot/stream/', {'query': 'Find candidates with skill go'})
+            events = await self.read_events(response)
+            self.assertEqual(events[1], ('answer', {'response': "Found 1 candidates with skill go"}))
+            # The matched ids were saved to the session, so a follow-up only sees Bob
+            response = await self.async_client.post('/chatbot/stream/', {'query': 'What about their education'})
+            events = await self.read_events(response)
+            self.assertEqual(events[0], ('status', {'candidates': 1}))
+
+    @override_settings(CV_LLM_STREAM=True)
+    async def test_stream_chatbot_forwards_llm_tokens(self):
+        cv = await CV.objects.acreate(filename="ann.pdf")
+        await CVData.objects.acreate(cv=cv, personal_info={"Name": "Ann"})
+        generated = json.dumps({"summary": "Ann fits", "strengths": "-", "recommendations": "-"})
+        tokens = [generated[:10], generated[10:]]
+        stub = StubInferenceServer((200, "".join(f"data: {json.dumps({'token': {'text': t}})}\n\n" for t in tokens)))
+        self.addCleanup(stub.close)
+
+        llm = LLMInterface(client=LLMClient(api_url=stub.url, read_timeout=2))
+        with mock.patch('cv_processing.views.get_llm_interface', return_value=llm):
+            response = await self.async_client.post('/chatbot/stream/', {'query': 'who fits best'})
+            events = await self.read_events(response)
+        self.assertEqual([payload['text'] for kind, payload in events if kind == 'token'], tokens)
+        self.assertEqual(json.loads(events[-2][1]['response'])['summary'], "Ann fits")
+        self.assertTrue(stub.requests[0]['stream'])
+
+    @override_settings(CV_LLM_STREAM=True)
+    async def test_stream_closed_by_a_disconnect_settles_the_breaker_trial(self):
+        tokens = ['{"summary": ', '"Ann fits"}']
+        stub = StubInferenceServer((200, "".join(f"data: {json.dumps({'token': {'text': t}})}\n\n" for t in tokens)))
+        self.addCleanup(stub.close)
+        client = LLMClient(api_url=stub.url, max_retries=0, read_timeout=2)
+        client.breaker.opened_at = time.monotonic() - client.breaker.reset_timeout
+        cv_data = {"query": "who fits best", "database": {"1": {"personal_info": {"Name": "Ann"}}}}
+
+        # The SSE view closes the analysis when its client goes away, after the first token
+        events = LLMInterface(client=client).astream_analysis(cv_data)
+        self.assertEqual(await events.__anext__(), ('token', {'text': tokens[0]}))
+        await events.aclose()
+        # Tokens came back, so the trial closes the breaker rather than staying in flight
+        self.assertEqual(client.breaker.state, 'closed')
+        self.assertFalse(client.breaker.trial_in_flight)
+
+    @override_settings(CV_INGEST_EAGER=True, MEDIA_ROOT=TEST_MEDIA_ROOT, CV_UPLOAD_CHUNK_SIZE=1024,
+                       CV_UPLOAD_PARTS_DIR=os.path.join(TEST_MEDIA_ROOT, 'upload_parts'))
+    def test_chunked_upload_resumes_verifies_and_queues_each_file_on_finalize(self):
+        # Scripted clients have no CSRF token
+        client = Client(enforce_csrf_checks=True)
+        content = make_docx(["Jane Doe", "Skills", "Python"])
+        notes = b"just some notes"
+        sha256 = lambda data: hashlib.sha256(data).hexdigest()
+        response = client.post('/uploads/', json.dumps({'files': [
+            {'filename': 'jane', 'size': len(content), 'sha256': sha256(content)},
+            {'filename': 'notes.pdf', 'size': len(notes), 'sha256': sha256(notes)},
+        ]}), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        upload = response.json()
+        jane, notes_file = upload['files']
+        put = lambda url, data, offset: client.put(
+            url, data, content_type='application/octet-stream', headers={'Upload-Offset': str(offset)})
+
+        self.assertEqual(put(jane['chunk_url'], content[:1024], 0).json()['received'], 1024)
+        # A chunk from the wrong offset, as after a lost response, is refused with where to resume
+        response = put(jane['chunk_url'], content[2048:3072], 2048)
+        self.assertEqual((response.status_code, response.json()['received']), (409, 1024))
+        received = client.get(f"/uploads/{upload['upload_id']}/").json()['files'][0]['received']
+        while received < len(content):
+            received = put(jane['chunk_url'], content[received:received + 1024], received).json()['received']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(jane['finalize_url'])
+        self.assertEqual(response.json()['state'], 'complete')
+        cv = CV.objects.get(pk=response.json()['cv_id'])
+        # Detected from its bytes, so extraction sees a .docx despite the bare name
+        self.assertEqual((cv.filename, os.path.splitext(cv.file.name)[1]), ("jane", ".docx"))
+        self.assertEqual(CVData.objects.get(cv=cv).skills, ["Python"])
+        self.assertEqual(client.get(upload['status_url']).json()['counts']['parsed'], 1)
+
+        self.assertEqual(client.post(notes_file['finalize_url']).status_code, 409)
+        put(notes_file['chunk_url'], b"x" * len(notes), 0)
+        response = client.post(notes_file['finalize_url'])
+        self.assertEqual((response.status_code, response.json()['received']), (422, 0))
+        put(notes_file['chunk_url'], notes, 0)
+        response = client.post(notes_file['finalize_url'])
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(CV.objects.count(), 1)
+        self.assertEqual(os.listdir(os.path.join(TEST_MEDIA_ROOT, 'upload_parts')), [])
+
+    @override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, CV_INGEST_CHECKPOINT_DIR=os.path.join(TEST_MEDIA_ROOT, 'checkpoints'))
+    def test_ingest_cvs_command_bulk_loads_and_resumes(self):
+        archive = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive)
+        os.makedirs(os.path.join(archive, "2023"))
+        for path, name in [("a.docx", "Ann Lee"), ("2023/b.docx", "Bob Ray"), ("2023/c.docx", "Cy Dee")]:
+            with open(os.path.join(archive, path), 'wb') as f:
+                f.write(make_docx([name, "Skills", "Python", "Experience", "Engineer 2015-2020"]))
+
+        call_command('ingest_cvs', archive, workers=0, batch_size=2, verbosity=0)
+        self.assertEqual(sorted(CVData.objects.values_list('personal_info__Name', flat=True)), ["Ann Lee", "Bob Ray", "Cy Dee"])
+        self.assertEqual(CVData.objects.filter(experience_years=5).count(), 3)
+        self.assertEqual(len(load_corpus()), 3)
+        response = self.client.post('/chatbot/', {'query': 'Find candidates with skill python'})
+        self.assertEqual(response.json()['response'], "Found 3 candidates with skill python")
+
+        with open(os.path.join(archive, "2023", "d.docx"), 'wb') as f:
+            f.write(make_docx(["Dee Fox", "Skills", "Go"]))
+        with mock.patch.object(CVProcessor, 'extract_pages', wraps=CVProcessor().extract_pages) as extract_pages:
+            call_command('ingest_cvs', archive, workers=0, verbosity=0)
+        self.assertEqual(extract_pages.call_count, 1)
+        self.assertEqual(CV.objects.count(), 4)
+        # The checkpoint is kept out of the archive, which may be mounted read-only
+        self.assertEqual(len(os.listdir(os.path.join(TEST_MEDIA_ROOT, 'checkpoints'))), 1)
+        self.assertFalse(os.path.exists(os.path.join(archive, '.ingest_checkpoint')))
+
+        # A batch whose transaction fails leaves no stored files behind
+        with open(os.path.join(archive, "e.docx"), 'wb') as f:
+            f.write(make_docx(["Eve Gray", "Skills", "Rust"]))
+        stored = sorted(os.listdir(os.path.join(TEST_MEDIA_ROOT, 'cvs')))
+        with mock.patch('cv_processing.management.commands.ingest_cvs.bulk_create_cvs', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            call_command('ingest_cvs', archive, workers=0, verbosity=0)
+        self.assertEqual(sorted(os.listdir(os.path.join(TEST_MEDIA_ROOT, 'cvs'))), stored)
+
+    @override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, CV_INGEST_CHECKPOINT_DIR=os.path.join(TEST_MEDIA_ROOT, 'checkpoints'))
+    def test_reparse_cvs_reparses_stale_rows_from_stored_text(self):
+        archive = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive)
+        for name in ["Ann Lee", "Bob Ray"]:
+            with open(os.path.join(archive, f"{name.split()[0].lower()}.docx"), 'wb') as f:
+                f.write(make_docx([name, "Skills", "Python", "Experience", "Engineer 2015-2020"]))
+        call_command('ingest_cvs', archive, workers=0, verbosity=0)
+        ann = CV.objects.get(filename="ann.docx")
+        self.assertEqual(ann.text.method, CVText.DOCX)
+        self.assertEqual(ann.text.pages, ["Ann Lee\nSkills\nPython\nExperience\nEngineer 2015-2020"])
+        self.assertEqual(set(CVData.objects.values_list('parser_version', flat=True)), {PARSER_VERSION})
+
+        # As if parsed by an older parser; Bob's row predates stored text and only the extraction cache has it
+        CVData.objects.update(parser_version=PARSER_VERSION - 1, skills=[], experience_years=0)
+        CVText.objects.filter(cv__filename="bob.docx").delete()
+        with mock.patch.object(CVProcessor, 'extract_pages') as extract_pages, \
+                mock.patch.object(CVProcessor, 'ocr_page') as ocr_page:
+            call_command('reparse_cvs', workers=0, batch_size=1, verbosity=0)
+        extract_pages.assert_not_called()
+        ocr_page.assert_not_called()
+
+        self.assertEqual(list(CVData.objects.values_list('skills', 'experience_years', 'parser_version')),
+                         [(["Python"], 5, PARSER_VERSION)] * 2)
+        self.assertEqual(CVText.objects.get(cv__filename="bob.docx").method, CVText.UNKNOWN)
+        response = self.client.post('/chatbot/', {'query': 'Find candidates with skill python'})
+        self.assertEqual(response.json()['response'], "Found 2 candidates with skill python")
+
+        # Rows deleted, or left without text, while the command runs are skipped
+        CVData.objects.update(parser_version=PARSER_VERSION - 1)
+        parse_texts = worker.parse_texts
+
+        def parse_then_delete(texts):
+            CV.objects.filter(filename="ann.docx").delete()
+            CVText.objects.filter(cv__filename="bob.docx").delete()
+            return parse_texts(texts)
+        with mock.patch.object(worker, 'parse_texts', side_effect=parse_then_delete):
+            call_command('reparse_cvs', workers=0, batch_size=1, verbosity=0)
+        self.assertEqual(list(CVData.objects.values_list('cv__filename', 'parser_version')),
+                         [("bob.docx", PARSER_VERSION - 1)])
@@ -0,0 +1,63 @@
+import hashlib
+import zipfile
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingMixin:
+    """Compute each uploaded file's SHA-256 while Django streams it in"""
+
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.content_hash = self.sha256.hexdigest()
+        return uploaded_file
+
+
+class HashingMemoryFileUploadHandler(HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def hash_file(file):
+    """SHA-256 of a File, reusing the digest computed during upload when there is one"""
+    content_hash = getattr(file, 'content_hash', None)
+    if content_hash:
+        return content_hash
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest()
+
+
+PDF_MAGIC = b'%PDF-'
+ZIP_MAGIC = b'PK\x03\x04'
+
+
+def detect_format(path):
+    """'pdf' or 'docx' from a file's leading bytes, whatever its name says; None for anything else"""
+    with open(path, 'rb') as f:
+        head = f.read(1024)
+    # Readers tolerate junk before the PDF header within the first kilobyte
+    if PDF_MAGIC in head:
+        return 'pdf'
+    if head.startswith(ZIP_MAGIC):
+        # Other Office formats are zip packages too; only Word has a document part
+        try:
+            with zipfile.ZipFile(path) as package:
+                if 'word/document.xml' in package.namelist():
+                    return 'docx'
+        except zipfile.BadZipFile:
+            pass
+    return None
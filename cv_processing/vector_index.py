@@ -0,0 +1,383 @@
+"""Offline semantic search over CVs with hashed n-gram vectors in a memory-mapped matrix
+
+Each CVData becomes one L2-normalized float32 row of log term frequencies,
+with words, word pairs and character trigrams hashed into CV_VECTOR_DIMS
+signed buckets. Common abbreviations are expanded first, so "ML engineer"
+and "machine learning engineer" share features. Queries are weighted by
+inverse document frequency per bucket, and a top-k search is a single
+matrix-vector product.
+
+The index lives in CV_VECTOR_INDEX_DIR as append-only raw files that every
+process maps read-only, in a generation directory named by the ``current``
+file:
+
+    gen-N/vectors.f32   rows x dims float32
+    gen-N/ids.i64       rows x 2 int64 (cv_data_id, cv_id); 0 marks a removed row
+    gen-N/df.f64        dims document frequencies, then the live row count
+    meta.json           {"dims": ...}
+
+Writers (any process saving CVData) hold an exclusive lock on the
+``lock`` file. Updates append a new row to the current generation and
+clear the old one. A rebuild, or a compaction once CV_VECTOR_COMPACT_RATIO
+of the rows are cleared, writes a new generation and swaps ``current``,
+so readers never pair the vectors of one generation with the ids of another.
+"""
+import fcntl
+import json
+import os
+import re
+import shutil
+import threading
+import zlib
+from contextlib import contextmanager
+import numpy as np
+from django.conf import settings
+
+# Expanded in both CVs and queries; the abbreviation itself is kept too
+ALIASES = {
+    'ml': 'machine learning',
+    'ai': 'artificial intelligence',
+    'dl': 'deep learning',
+    'nlp': 'natural language processing',
+    'llm': 'large language models',
+    'js': 'javascript',
+    'ts': 'typescript',
+    'k8s': 'kubernetes',
+    'gcp': 'google cloud platform',
+    'aws': 'amazon web services',
+    'sre': 'site reliability engineering',
+    'qa': 'quality assurance',
+    'ux': 'user experience',
+    'ui': 'user interface',
+    'bi': 'business intelligence',
+    'hr': 'human resources',
+    'db': 'database',
+    'ci': 'continuous integration',
+    'cd': 'continuous delivery',
+}
+TOKEN_PATTERN = re.compile(r'[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]')
+# Character trigrams make "engineer"/"engineering" overlap; words and pairs carry more weight
+WORD_WEIGHT, PAIR_WEIGHT, TRIGRAM_WEIGHT = 1.0, 1.0, 0.25
+# Rows copied at a time when compacting, bounding its memory use
+COMPACT_CHUNK_ROWS = 4096
+SECTIONS = ['skills', 'work_experience', 'projects', 'certifications', 'education']
+# File naming the published generation directory
+POINTER = 'current'
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def tokens(text):
+    words = []
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        words.append(word)
+        if word in ALIASES:
+            words.extend(ALIASES[word].split())
+    return words
+
+
+def features(text):
+    """{feature: weight} for the hashed vector of text"""
+    words = tokens(text)
+    weights = {}
+    for word in words:
+        weights['w:' + word] = weights.get('w:' + word, 0.0) + WORD_WEIGHT
+        padded = f'^{word}$'
+        for i in range(len(padded) - 2):
+            trigram = 'c:' + padded[i:i + 3]
+            weights[trigram] = weights.get(trigram, 0.0) + TRIGRAM_WEIGHT
+    for first, second in zip(words, words[1:]):
+        pair = f'p:{first} {second}'
+        weights[pair] = weights.get(pair, 0.0) + PAIR_WEIGHT
+    return weights
+
+
+def vectorize(text, dims):
+    """Signed feature hashing of text into an L2-normalized float32 vector"""
+    weighted = features(text)
+    if not weighted:
+        return np.zeros(dims, dtype=np.float32)
+    # crc32 is stable across processes, unlike hash()
+    hashes = np.fromiter((zlib.crc32(feature.encode()) for feature in weighted), dtype=np.uint32, count=len(weighted))
+    weights = np.log1p(np.fromiter(weighted.values(), dtype=np.float64, count=len(weighted)))
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+    vector = np.bincount(hashes % dims, weights=signs * weights, minlength=dims).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+def cv_text(sections):
+    return '\n'.join(' '.join(sections.get(name) or []) for name in SECTIONS)
+
+
+class VectorIndex:
+    def __init__(self, directory, dims):
+        self.directory = directory
+        self.dims = dims
+        self._mapped = None
+        self._vectors = None
+        self._ids = None
+        self._lock = threading.Lock()
+
+    def _path(self, name, generation=None):
+        if generation:
+            return os.path.join(self.directory, generation, name)
+        return os.path.join(self.directory, name)
+
+    def _generation(self):
+        """Name of the published generation directory, None before the first build"""
+        try:
+            with open(self._path(POINTER)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def exists(self):
+        if self._generation() is None:
+            return False
+        try:
+            with open(self._path('meta.json')) as f:
+                return json.load(f).get('dims') == self.dims
+        except (OSError, ValueError):
+            return False
+
+    @contextmanager
+    def _write_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path('lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _rows_on_disk(self, generation=None):
+        generation = generation or self._generation()
+        try:
+            return os.path.getsize(self._path('ids.i64', generation)) // 16 if generation else 0
+        except OSError:
+            return 0
+
+    def _map(self):
+        """(generation, vectors, ids) memory maps covering every row written so far"""
+        for attempt in range(2):
+            generation = self._generation()
+            try:
+                rows = os.path.getsize(self._path('ids.i64', generation)) // 16 if generation else 0
+                with self._lock:
+                    if (generation, rows) != self._mapped or self._vectors is None:
+                        if rows:
+                            self._vectors = np.memmap(self._path('vectors.f32', generation), dtype=np.float32, mode='r', shape=(rows, self.dims))
+                            self._ids = np.memmap(self._path('ids.i64', generation), dtype=np.int64, mode='r', shape=(rows, 2))
+                        else:
+                            self._vectors = np.zeros((0, self.dims), dtype=np.float32)
+                            self._ids = np.zeros((0, 2), dtype=np.int64)
+                        self._mapped = (generation, rows)
+                    return generation, self._vectors, self._ids
+            except FileNotFoundError:
+                # Pruned after two newer generations were published since reading the pointer
+                if attempt:
+                    raise
+
+    def __len__(self):
+        """Live (not removed) rows"""
+        return int(np.count_nonzero(self._map()[2][:, 1]))
+
+    def _document_frequencies(self, generation):
+        try:
+            df = np.fromfile(self._path('df.f64', generation), dtype=np.float64)
+        except OSError:
+            return np.zeros(self.dims), 0.0
+        if len(df) != self.dims + 1:
+            return np.zeros(self.dims), 0.0
+        return df[:-1], df[-1]
+
+    def _write_df(self, generation, df, count):
+        np.append(df, count).astype(np.float64).tofile(self._path('df.f64.tmp', generation))
+        os.replace(self._path('df.f64.tmp', generation), self._path('df.f64', generation))
+
+    def _append(self, generation, entries):
+        """Append (cv_data_id, cv_id, vector) rows; returns their summed document frequencies"""
+        df = np.zeros(self.dims)
+        id_rows = []
+        # Vectors are complete on disk before the ids that make readers see them
+        with open(self._path('vectors.f32', generation), 'ab') as vectors:
+            for cv_data_id, cv_id, vector in entries:
+                vectors.write(vector.tobytes())
+                id_rows.append((cv_data_id, cv_id))
+                df += vector != 0
+        with open(self._path('ids.i64', generation), 'ab') as ids:
+            ids.write(np.array(id_rows, dtype=np.int64).tobytes())
+        return df, len(id_rows)
+
+    def _new_generation(self, current):
+        name = f'gen-{int(current.split("-")[1]) + 1 if current else 1}'
+        # Left over from a write interrupted before it was published
+        shutil.rmtree(self._path(name), ignore_errors=True)
+        os.makedirs(self._path(name))
+        return name
+
+    def _publish(self, generation, previous):
+        """Point readers at generation with one rename
+
+        The previous generation is kept for readers that read the pointer
+        just before; older ones are removed. Maps already open stay valid.
+        """
+        with open(self._path(POINTER + '.tmp'), 'w') as f:
+            f.write(generation)
+        os.replace(self._path(POINTER + '.tmp'), self._path(POINTER))
+        for name in os.listdir(self.directory):
+            if name.startswith('gen-') and name not in (generation, previous):
+                shutil.rmtree(self._path(name), ignore_errors=True)
+
+    def rebuild(self, entries):
+        """Replace the index with (cv_data_id, cv_id, sections) entries"""
+        with self._write_lock():
+            previous = self._generation()
+            generation = self._new_generation(previous)
+            df, count = self._append(generation, (
+                (cv_data_id, cv_id, vectorize(cv_text(sections), self.dims)) for cv_data_id, cv_id, sections in entries
+            ))
+            self._write_df(generation, df, count)
+            with open(self._path('meta.json'), 'w') as f:
+                json.dump({'dims': self.dims}, f)
+            self._publish(generation, previous)
+
+    def add(self, entries):
+        """Add or replace (cv_data_id, cv_id, sections) entries"""
+        entries = [(cv_data_id, cv_id, vectorize(cv_text(sections), self.dims)) for cv_data_id, cv_id, sections in entries]
+        if not entries:
+            return
+        with self._write_lock():
+            generation = self._generation()
+            if generation is None:
+                return
+            df, count = self._document_frequencies(generation)
+            count -= self._clear_rows(generation, [cv_data_id for cv_data_id, _, _ in entries], df)
+            added_df, added = self._append(generation, entries)
+            self._write_df(generation, df + added_df, count + added)
+            self._compact(generation, count + added)
+
+    def remove(self, cv_data_ids):
+        with self._write_lock():
+            generation = self._generation()
+            if generation is None:
+                return
+            df, count = self._document_frequencies(generation)
+            count -= self._clear_rows(generation, cv_data_ids, df)
+            self._write_df(generation, df, count)
+            self._compact(generation, count)
+
+    def _compact(self, generation, live):
+        """Copy the live rows into a new generation once enough of them are cleared
+
+        Document frequencies already leave cleared rows out and are copied as is.
+        """
+        rows = self._rows_on_disk(generation)
+        if not rows or rows - live < rows * settings.CV_VECTOR_COMPACT_RATIO:
+            return
+        compacted = self._new_generation(generation)
+        ids = np.memmap(self._path('ids.i64', generation), dtype=np.int64, mode='r', shape=(rows, 2))
+        vectors = np.memmap(self._path('vectors.f32', generation), dtype=np.float32, mode='r', shape=(rows, self.dims))
+        with open(self._path('vectors.f32', compacted), 'wb') as vectors_out, open(self._path('ids.i64', compacted), 'wb') as ids_out:
+            for start in range(0, rows, COMPACT_CHUNK_ROWS):
+                chunk = slice(start, start + COMPACT_CHUNK_ROWS)
+                kept = ids[chunk, 0] != 0
+                vectors_out.write(np.ascontiguousarray(vectors[chunk][kept]).tobytes())
+                ids_out.write(np.ascontiguousarray(ids[chunk][kept]).tobytes())
+        del ids, vectors
+        shutil.copyfile(self._path('df.f64', generation), self._path('df.f64', compacted))
+        self._publish(compacted, generation)
+
+    def _clear_rows(self, generation, cv_data_ids, df):
+        rows = self._rows_on_disk(generation)
+        if not rows:
+            return 0
+        ids = np.memmap(self._path('ids.i64', generation), dtype=np.int64, mode='r+', shape=(rows, 2))
+        stale = np.flatnonzero(np.isin(ids[:, 0], np.asarray(list(cv_data_ids), dtype=np.int64)))
+        if not len(stale):
+            return 0
+        vectors = np.memmap(self._path('vectors.f32', generation), dtype=np.float32, mode='r+', shape=(rows, self.dims))
+        df -= (vectors[stale] != 0).sum(axis=0)
+        vectors[stale] = 0
+        ids[stale] = 0
+        vectors.flush()
+        ids.flush()
+        return len(stale)
+
+    def search(self, text, k=None, cv_ids=None, min_score=None):
+        """[(cv_id, score)] of the k CVs most similar to text, best first
+
+        cv_ids, when given, restricts results to those CV ids. Scores below
+        min_score are mostly shared character trigrams and hash collisions.
+        """
+        k = k or settings.CV_SEARCH_TOP_K
+        min_score = settings.CV_VECTOR_MIN_SCORE if min_score is None else min_score
+        generation, vectors, ids = self._map()
+        query = vectorize(text, self.dims)
+        if not len(vectors) or not query.any():
+            return []
+        df, count = self._document_frequencies(generation)
+        query *= (np.log((count + 1) / (df + 1)) + 1).astype(np.float32)
+        scores = vectors @ query
+        live = ids[:, 1] > 0
+        if cv_ids is not None:
+            live &= np.isin(ids[:, 1], np.fromiter((int(cv_id) for cv_id in cv_ids), dtype=np.int64))
+        scores = np.where(live & (scores > max(min_score, 0)), scores, 0)
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        results = {}
+        for row in candidates[np.argsort(-scores[candidates], kind='stable')]:
+            results.setdefault(str(ids[row, 1]), float(scores[row]))
+        return list(results.items())
+
+
+def configured_index():
+    key = (settings.CV_VECTOR_INDEX_DIR, settings.CV_VECTOR_DIMS)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = VectorIndex(*key)
+        return index
+
+
+def get_index():
+    """The process-wide index for the configured directory, built from the database on first use"""
+    index = configured_index()
+    if not index.exists():
+        rebuild(index)
+    return index
+
+
+def _entries(queryset):
+    for cv_data_id, cv_id, *values in queryset.values_list('id', 'cv_id', *SECTIONS).iterator():
+        yield cv_data_id, cv_id, dict(zip(SECTIONS, values))
+
+
+def rebuild(index=None):
+    from .models import CVData
+    index = index or configured_index()
+    index.rebuild(_entries(CVData.objects.order_by('id')))
+    return index
+
+
+# Until the index exists there is nothing to keep up to date; the first
+# search builds it from the database, including these rows
+def index_cv_datas(cv_datas):
+    index = configured_index()
+    if index.exists():
+        index.add((cv_data.pk, cv_data.cv_id, {name: getattr(cv_data, name) for name in SECTIONS}) for cv_data in cv_datas)
+
+
+def remove_cv_data(cv_data_id):
+    index = configured_index()
+    if index.exists():
+        index.remove([cv_data_id])
+
+
+def search(text, k=None, cv_ids=None, min_score=None):
+    return get_index().search(text, k=k, cv_ids=cv_ids, min_score=min_score)
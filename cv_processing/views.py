@@ -1,11 +1,23 @@
-from datetime import datetime
 import json
 import re
-from django.shortcuts import render
-from django.http import JsonResponse
-from .models import CV, CVData
-from .cv_processor import CVProcessor
-from .llm_interface import LLMInterface
+from contextlib import aclosing
+from django.shortcuts import render, get_object_or_404
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse, HttpResponseNotAllowed
+from django.core import signing
+from asgiref.sync import sync_to_async
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from .models import CV, CVData, IngestJob
+from .jobs import submit_job, job_status
+from .uploads import hash_file
+from .skill_index import find_cvs, parse_skill_query
+from .candidates import SECTIONS, corpus_version, load_snapshot, aload_snapshot, load_candidates
+from .matching import parse_criteria, rank_candidates
+from .search import fts_available, match_count, search
+from . import chunked_uploads, result_sets, vector_index
+from .llm_interface import get_llm_interface
+from . import metrics
 import os
 
 def upload_cv(request):
@@ -15,126 +27,269 @@ def upload_cv(request):
         if not cv_files:
             return JsonResponse({'message': 'Please select at least one CV to upload'})
         
-        processor = CVProcessor()
-        processed_count = 0
+        cvs = []
         errors = []
         
         for cv_file in cv_files:
             try:
-                cv = CV.objects.create(filename=cv_file.name, file=cv_file)
-                file_path = cv.file.path
-                cv_data = processor.process_file(file_path)
-                CVData.objects.create(cv=cv, **cv_data)
-                processed_count += 1
+                cvs.append(CV.objects.create(filename=cv_file.name, file=cv_file, content_hash=hash_file(cv_file)))
             except Exception as e:
-                errors.append(f"Error processing '{cv_file.name}': {str(e)}")
+                errors.append(f"Error saving '{cv_file.name}': {str(e)}")
         
-        if processed_count > 0 and not errors:
-            return JsonResponse({'message': f"{processed_count} CV(s) processed successfully"})
-        elif processed_count > 0:
-            return JsonResponse({'message': f"{processed_count} CV(s) processed successfully, but: {', '.join(errors)}"})
-        else:
+        if not cvs:
             return JsonResponse({'message': ', '.join(errors)})
+        
+        # Extraction runs in the background worker pool; the client polls the job
+        job = submit_job(cvs)
+        message = f"{len(cvs)} CV(s) uploaded successfully and queued for processing"
+        if errors:
+            message += f", but: {', '.join(errors)}"
+        return JsonResponse({
+            'message': message,
+            'job_id': job.id,
+            'status_url': reverse('job_status', args=[job.id]),
+        })
     return render(request, 'upload.html')
 
+def job_status_view(request, job_id):
+    job = get_object_or_404(IngestJob, pk=job_id)
+    return JsonResponse(job_status(job))
+
+@csrf_exempt
+def upload_start_view(request):
+    """Start a chunked upload; see chunked_uploads for the protocol"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        body = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Expected a JSON body'}, status=400)
+    try:
+        upload = chunked_uploads.create(body.get('files') if isinstance(body, dict) else None)
+    except chunked_uploads.UploadError as e:
+        return JsonResponse(e.body, status=e.status)
+    return JsonResponse(chunked_uploads.status(upload), status=201)
+
+def upload_status_view(request, upload_id):
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        raise Http404("Upload not found or expired")
+    return JsonResponse(chunked_uploads.status(upload))
+
+@csrf_exempt
+def upload_chunk_view(request, upload_id, file_id):
+    """Store one chunk, the raw request body, at the Upload-Offset header's position"""
+    if request.method != 'PUT':
+        return HttpResponseNotAllowed(['PUT'])
+    upload_file = chunked_uploads.get_file(upload_id, file_id)
+    if upload_file is None:
+        raise Http404("Upload not found or expired")
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Missing or invalid Upload-Offset header'}, status=400)
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    try:
+        # Read from the request as a stream; request.body would buffer the whole chunk
+        chunked_uploads.write_chunk(upload_file, offset, request, length)
+    except chunked_uploads.UploadError as e:
+        return JsonResponse(e.body, status=e.status)
+    return JsonResponse(chunked_uploads.file_status(upload_file))
+
+@csrf_exempt
+def upload_finalize_view(request, upload_id, file_id):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    upload_file = chunked_uploads.get_file(upload_id, file_id)
+    if upload_file is None:
+        raise Http404("Upload not found or expired")
+    try:
+        chunked_uploads.finalize(upload_file)
+    except chunked_uploads.UploadError as e:
+        return JsonResponse(e.body, status=e.status)
+    return JsonResponse(chunked_uploads.file_status(upload_file))
+
+# query: (label, section, separator) of the listings answered a page at a time
+LISTINGS = {
+    "skills": ("Skills", "skills", ", "),
+    "experience": ("Experience", "work_experience", "; "),
+    "education": ("Education", "education", "; "),
+}
+
+def select_cv_data(query, session):
+    """(corpus version, cv_data) for a query"""
+    # A follow-up loads only the candidates of the session's last result set
+    result_set = result_sets.follow_up(query, session)
+    if result_set is not None:
+        return corpus_version(), {"query": query, "database": load_candidates(result_set.cv_ids)}
+    # Full CV data comes from the cached candidate snapshot
+    version, database = load_snapshot()
+    return version, {"query": query, "database": database}
+
+async def aselect_cv_data(query, session):
+    if result_sets.is_follow_up(query):
+        # Session and result set lookups are synchronous
+        return await sync_to_async(select_cv_data)(query, session)
+    version, database = await aload_snapshot()
+    return version, {"query": query, "database": database}
+
+def listing(query, raw_query, cv_data, session):
+    """The first page of a listing with facet counts; later pages come from result_set_view"""
+    label, section, separator = LISTINGS[query]
+    result_set = result_sets.save(session, query, raw_query, cv_data['database'].keys())
+    first_page = result_sets.page(result_set, section=section)
+    response = f"{label}: " + separator.join(entry for item in first_page['items'] for entry in item[section])
+    if first_page['next_cursor']:
+        response += f" (first {len(first_page['items'])} of {first_page['total']} candidates)"
+    return {'response': response, **first_page, 'facets': result_sets.facets(result_set, cv_data['database'])}
+
+def direct_answer(query, raw_query, cv_data, session):
+    """Answer queries that don't need the LLM; returns None for those that do
+
+    Answers are a response string, or for listings the JSON body itself.
+    """
+    if query in LISTINGS:
+        return listing(query, raw_query, cv_data, session)
+    
+    elif "job description" in query:
+        # Free text is ranked by vector similarity, so "ML engineer" also finds "machine learning"
+        description = re.split(r'job description', raw_query, flags=re.IGNORECASE)[-1].strip(' :')
+        ranked = [
+            (cv_id, score) for cv_id, score in vector_index.search(description, k=settings.CV_VECTOR_TOP_K)
+            if cv_id in cv_data['database']
+        ]
+        result_sets.save(session, 'job_description', raw_query, [cv_id for cv_id, _ in ranked])
+        names = [
+            f"{cv_data['database'][cv_id]['personal_info'].get('Name', f'Candidate {cv_id}')} ({score:.2f})"
+            for cv_id, score in ranked
+        ]
+        return f"Top {len(ranked)} candidates for the job description: {', '.join(names)}"
+    
+    # "What about their skills" asks about the last result set, not for a skill search
+    elif "skill" in query and not result_sets.is_follow_up(query):
+        skill = re.split(r'skills?', raw_query, flags=re.IGNORECASE)[-1].strip(' :')
+        skills, match_all = parse_skill_query(skill)
+        if not skills:
+            # Nothing to search for; the session keeps its result set for follow-ups
+            return "Which skill? For example: Find candidates with skill python"
+        results = [cv_id for cv_id in find_cvs(skills, match_all) if cv_id in cv_data['database']]
+        result_sets.save(session, 'skill', raw_query, results)
+        return f"Found {len(results)} candidates with skill {skill}"
+    
+    elif "experience in" in query:
+        industry = query.split("experience in")[-1].strip()
+        if fts_available():
+            results = [cv_id for cv_id in search(industry) if cv_id in cv_data['database']]
+            total = max(match_count(industry), len(results))
+        else:
+            results = [cv_id for cv_id, data in cv_data['database'].items() if industry.lower() in str(data['work_experience']).lower()]
+            total = len(results)
+        result_sets.save(session, 'experience_in', raw_query, results)
+        shown = f", top {len(results)}" if len(results) < total else ""
+        return f"Found {total} candidates with experience in {industry}{shown}"
+    
+    elif "identify matching candidates for job requirements" in query:
+        criteria = parse_criteria(query.split("job requirements:")[-1].strip())
+        total, top = rank_candidates(criteria)
+        top = [match for match in top if match[0] in cv_data['database']]
+        result_sets.save(session, 'job_requirements', raw_query, [cv_id for cv_id, _, _ in top])
+        matches = [
+            f"{cv_data['database'][cv_id]['personal_info'].get('Name', f'Candidate {cv_id}')} "
+            f"(score {score:g}: {', '.join(explanations)})"
+            for cv_id, score, explanations in top
+        ]
+        shown = f", top {len(top)}" if len(top) < total else ""
+        return f"Matched {total} candidates{shown}: {'; '.join(matches)}"
+    
+    return None
+
 def chatbot(request):
     if request.method == 'POST':
-        if not CV.objects.exists():
-            return JsonResponse({'response': 'You should upload a CV'})
-        
-        query = request.POST.get('query').lower().strip()
-        llm = LLMInterface()
-        
-        # Initialize session context if not present
-        if 'cv_ids' not in request.session:
-            request.session['cv_ids'] = []
+        raw_query = request.POST.get('query').strip()
+        query = raw_query.lower()
+        llm = get_llm_interface()
         
-        # Build full CV data
-        full_cv_data = {
-            "query": query,
-            "database": {
-                str(cv.id): {
-                    "personal_info": cv.cvdata_set.first().personal_info if cv.cvdata_set.exists() else {},
-                    "education": cv.cvdata_set.first().education if cv.cvdata_set.exists() else [],
-                    "work_experience": cv.cvdata_set.first().work_experience if cv.cvdata_set.exists() else [],
-                    "skills": cv.cvdata_set.first().skills if cv.cvdata_set.exists() else [],
-                    "projects": cv.cvdata_set.first().projects if cv.cvdata_set.exists() else [],
-                    "certifications": cv.cvdata_set.first().certifications if cv.cvdata_set.exists() else []
-                } for cv in CV.objects.all()
-            }
-        }
-        
-        # Use context if cv_ids exist and query is a follow-up
-        if request.session['cv_ids'] and any(phrase in query for phrase in ["what about", "their experience", "their skills", "their education"]):
-            cv_data = {
-                "query": query,
-                "database": {
-                    cv_id: data for cv_id, data in full_cv_data['database'].items() 
-                    if cv_id in request.session['cv_ids']
-                }
-            }
-        else:
-            cv_data = full_cv_data  
+        version, cv_data = select_cv_data(query, request.session)
+        if not cv_data['database']:
+            return JsonResponse({'response': 'You should upload a CV'})
 
-        print("CV Data Sent to LLM:", json.dumps(cv_data, indent=2))  
+        if settings.CV_DEBUG_DUMPS:
+            print("CV Data Sent to LLM:", json.dumps(cv_data, indent=2))
         
         # Direct queries
-        if query == "skills":
-            all_skills = [data['skills'] for data in cv_data['database'].values()]
-            response = "Skills: " + ", ".join([skill for sublist in all_skills for skill in sublist])
-            request.session['cv_ids'] = list(cv_data['database'].keys())  
-            return JsonResponse({'response': response})
-        
-        elif query == "experience":
-            all_experience = [data['work_experience'] for data in cv_data['database'].values()]
-            response = "Experience: " + "; ".join([exp for sublist in all_experience for exp in sublist])
-            request.session['cv_ids'] = list(cv_data['database'].keys())  
-            return JsonResponse({'response': response})
-        
-        elif query == "education":
-            all_education = [data['education'] for data in cv_data['database'].values()]
-            response = "Education: " + "; ".join([edu for sublist in all_education for edu in sublist])
-            request.session['cv_ids'] = list(cv_data['database'].keys())  
-            return JsonResponse({'response': response})
-        
-        elif "skill" in query:
-            skill = query.split("skill")[-1].strip()
-            results = [cv_id for cv_id, data in cv_data['database'].items() if skill.lower() in str(data['skills']).lower()]
-            request.session['cv_ids'] = results  
-            return JsonResponse({'response': f"Found {len(results)} candidates with skill {skill}"})
-        
-        elif "experience in" in query:
-            industry = query.split("experience in")[-1].strip()
-            results = [cv_id for cv_id, data in cv_data['database'].items() if industry.lower() in str(data['work_experience']).lower()]
-            request.session['cv_ids'] = results  
-            return JsonResponse({'response': f"Found {len(results)} candidates with experience in {industry}"})
-        
-        elif "identify matching candidates for job requirements" in query:
-            requirements = query.split("job requirements:")[-1].strip().split(" and ")
-            matches = {}
-            current_year = datetime.now().year
-            for cv_id, data in cv_data['database'].items():
-                name = data['personal_info'].get('Name', f'Candidate {cv_id}')
-                skills_match = all(req.lower() in " ".join(data['skills']).lower() for req in requirements if "years" not in req.lower())
-                years_match = False
-                for exp in data['work_experience']:
-                    match = re.search(r'(\d{4})\s*-\s*(current|\d{4})', exp, re.IGNORECASE)
-                    if match:
-                        start = int(match.group(1))
-                        end = current_year if match.group(2).lower() == 'current' else int(match.group(2))
-                        years = end - start
-                        for req in requirements:
-                            if "years" in req.lower() and years >= int(re.search(r'\d+', req).group()):
-                                years_match = True
-                matches[name] = skills_match and years_match
-            matched_names = [name for name, match in matches.items() if match]
-            request.session['cv_ids'] = [cv_id for cv_id, data in cv_data['database'].items() if data['personal_info'].get('Name', f'Candidate {cv_id}') in matched_names]
-            return JsonResponse({'response': f"Matched {len(matched_names)} candidates: {', '.join(matched_names)}"})
+        response = direct_answer(query, raw_query, cv_data, request.session)
+        if response is not None:
+            return JsonResponse(answer_body(response))
         
         # LLM queries with context
-        else:
-            analysis = llm.analyze_cv(cv_data)
+        analysis = llm.analyze_cv(cv_data, corpus_version=version)
+        if analysis and 'summary' in analysis:
+            return JsonResponse({'response': json.dumps(analysis)})
+        return JsonResponse({'response': 'Could not process query due to service issues'})
+    return render(request, 'chatbot.html')
+
+def answer_body(response):
+    return response if isinstance(response, dict) else {'response': response}
+
+def result_set_view(request, result_set_id):
+    """A page of one of the session's result sets: ?cursor=<next_cursor>&section=skills"""
+    result_set = result_sets.get(request.session, result_set_id)
+    if result_set is None:
+        raise Http404("Result set not found or expired")
+    section = request.GET.get('section')
+    if section and section not in SECTIONS:
+        return JsonResponse({'error': f"Unknown section '{section}'"}, status=400)
+    try:
+        results = result_sets.page(result_set, request.GET.get('cursor'), section)
+    except signing.BadSignature:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    return JsonResponse({**results, 'facets': result_sets.facets(result_set)})
+
+def metrics_view(request):
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def chatbot_stream(request):
+    """Async chatbot that streams server-sent events as parts of the answer become ready
+
+    Events: 'status' (sent first), then either 'answer' for direct queries or
+    'token'/'section' events followed by 'answer' for LLM queries, then 'done'.
+    The 'answer' payload matches the JSON body of the /chatbot/ view.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    raw_query = request.POST.get('query', '').strip()
+    query = raw_query.lower()
+    version, cv_data = await aselect_cv_data(query, request.session)
+    if not cv_data['database']:
+        return JsonResponse({'response': 'You should upload a CV'})
+    # Direct answers are indexed lookups; run them before streaming starts so
+    # their session updates are saved by the session middleware
+    direct_response = await sync_to_async(direct_answer)(query, raw_query, cv_data, request.session)
+
+    async def events():
+        yield sse_event('status', {'candidates': len(cv_data['database'])})
+        response = direct_response
+        if response is None:
+            analysis = None
+            # Closed with the response, so a client that disconnects mid-stream also ends the upstream call
+            async with aclosing(get_llm_interface().astream_analysis(cv_data, corpus_version=version)) as analysis_events:
+                async for kind, payload in analysis_events:
+                    if kind == 'analysis':
+                        analysis = payload
+                    else:
+                        yield sse_event(kind, payload)
             if analysis and 'summary' in analysis:
-                return JsonResponse({'response': json.dumps(analysis)})
-            return JsonResponse({'response': 'Could not process query due to service issues'})
-    return render(request, 'chatbot.html')
\ No newline at end of file
+                response = json.dumps(analysis)
+            else:
+                response = 'Could not process query due to service issues'
+        yield sse_event('answer', answer_body(response))
+        yield sse_event('done', {})
+
+    return StreamingHttpResponse(
+        events(),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
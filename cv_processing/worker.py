@@ -0,0 +1,65 @@
+"""Entry points executed inside background ingestion worker processes.
+
+This module must stay importable before Django is configured, because the
+process pool unpickles ``init_worker`` in a freshly spawned interpreter.
+"""
+import os
+
+
+def init_worker():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cv_analyzer.settings')
+    import django
+    django.setup()
+    from django.conf import settings
+    if settings.CV_WARMUP:
+        from .warmup import warmup
+        warmup()
+
+
+def run_ingest_file(file_path, stored=None):
+    """Extract and parse one uploaded file without touching the database; never raises
+
+    Returns the result, or its error, with the stages it went through and
+    the metrics it recorded, for the parent to store and merge.
+    """
+    from django.utils import timezone
+    from .jobs import extract_file
+    from .models import IngestFile
+    from . import metrics
+    stages = [(IngestFile.EXTRACTING, timezone.now())]
+    try:
+        cv_data, pages, method = extract_file(
+            file_path, stored, on_stage=lambda state: stages.append((state, timezone.now())))
+        result = {'cv_data': cv_data, 'pages': pages, 'method': method}
+    except Exception as e:
+        result = {'error': str(e)}
+    return {**result, 'stages': stages, 'metrics': metrics.collect()}
+
+
+def extract_path(path):
+    """Hash, extract and parse one file from disk for bulk ingestion; never raises"""
+    from django.core.files import File
+    from .uploads import hash_file
+    from .cv_processor import get_processor
+    from .models import CVText
+    from . import extraction_cache
+    try:
+        with open(path, 'rb') as f:
+            content_hash = hash_file(File(f))
+        entry = extraction_cache.lookup(content_hash)
+        if entry:
+            pages, method = extraction_cache.stored_pages(content_hash, entry.raw_text)
+            cv_data = entry.cv_data
+        else:
+            processor = get_processor()
+            pages, method = processor.extract_pages(path)
+            cv_data = processor.parse_text(CVText.join(pages))
+        return {'path': path, 'content_hash': content_hash, 'cv_data': cv_data, 'pages': pages, 'method': method}
+    except Exception as e:
+        return {'path': path, 'error': str(e)}
+
+
+def parse_texts(texts):
+    """Parse a batch of stored CV texts with the current parser, for reparse_cvs"""
+    from .cv_processor import get_processor
+    return get_processor().parse_many(texts)